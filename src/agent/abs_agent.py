@@ -5,13 +5,14 @@ from abc import ABC, abstractmethod
 from datetime import datetime
 from enum import Enum
 from pyexpat.errors import messages
-from typing import Any, Dict, Coroutine, Optional
+from typing import Any, Dict, Coroutine, List, Optional
 
 from global_statics import logger
 from src.context import context_maker
 from src.context.augmenters import ScheduleAugmenter
 from src.context.context import Context
 from src.context.manager import get_context_manager
+from src.di.services.impl.memory_ingest_queue import get_memory_ingest_queue
 from src.domain.agent_data_models import AgentRequest
 from src.infrastructure.clients.llm_clients.llm_client_manager import static_llmClientManager
 from src.infrastructure.utils.pipe import ProcessPipe
@@ -62,95 +63,108 @@ async def run_llm_with_tools(llm_client, context: Context, pipe: ProcessPipe | N
             memory_content = str(context.memory)
     if memory_content:
         messages.append({"role": "assistant", "content": memory_content})
-    messages.extend(context.messages)
+    messages.extend(context.messages[context.history_offset:])
 
     if context.schedule:
         messages.append({"role": "system", "content": f"你需要参考日程表中的行动安排回答，忙碌时允许表示当前忙碌，当前日程表: {context.schedule}"})
 
     asyncio.create_task(_log_token_estimate(messages, getattr(llm_client, "model_name", None)))
 
-    async for raw in llm_client.chat_completion_stream(
+    final_sent = False
+    stream = llm_client.chat_completion_stream(
             messages=messages,
-            tools=context.tools
-    ):
-        if pipe and pipe.is_closed():
-            return
-        data = json.loads(raw)
-        delta = data["choices"][0]["delta"]
-        finish_reason = data["choices"][0]["finish_reason"]
-
-        # ==== Role ====
-        if delta.get("role") and not buffer_delta["role"]:
-            buffer_delta["role"] = delta["role"]
-
-        # ==== Content ====
-        if delta.get("content"):
-            buffer_delta["content"].append(delta["content"])
-            if pipe and not pipe.is_closed():
-                await pipe.text_delta(delta["content"])
-
-        # ==== Tool Calls ====
-        if delta.get("tool_calls"):
+            tools=context.tools,
+            abort_signal=pipe.abort_signal if pipe else None
+    )
+    try:
+        async for raw in stream:
             if pipe and pipe.is_closed():
                 return
-            for call in delta["tool_calls"]:
-                cid = call["id"]
-                if tool_call_id is None:
-                    tool_call_id = cid
-                if cid not in tool_call_accumulator:
-                    if current_type is None:
-                        current_type = call["type"]
-                    if current_tool_name is None:
-                        current_tool_name = call["function"]["name"]
-                    tool_call_accumulator[cid] = {
-                        "id": tool_call_id,
-                        "type": call["type"],
-                        "function": {
-                            "name": call["function"]["name"],
-                            "arguments": ""
+            # OpenAIStyleLLMClient 产出 JSON 字符串，RawSSELLMClient 直接产出 dict
+            data = raw if isinstance(raw, dict) else json.loads(raw)
+            choices = data.get("choices")
+            if not choices or final_sent:
+                # include_usage 的最后一个 chunk 没有 choices
+                continue
+            delta = choices[0].get("delta") or {}
+            finish_reason = choices[0].get("finish_reason")
+
+            # ==== Role ====
+            if delta.get("role") and not buffer_delta["role"]:
+                buffer_delta["role"] = delta["role"]
+
+            # ==== Content ====
+            if delta.get("content"):
+                buffer_delta["content"].append(delta["content"])
+                if pipe and not pipe.is_closed():
+                    await pipe.text_delta(delta["content"])
+
+            # ==== Tool Calls ====
+            if delta.get("tool_calls"):
+                if pipe and pipe.is_closed():
+                    return
+                for call in delta["tool_calls"]:
+                    cid = call["id"]
+                    if tool_call_id is None:
+                        tool_call_id = cid
+                    if cid not in tool_call_accumulator:
+                        if current_type is None:
+                            current_type = call["type"]
+                        if current_tool_name is None:
+                            current_tool_name = call["function"]["name"]
+                        tool_call_accumulator[cid] = {
+                            "id": tool_call_id,
+                            "type": call["type"],
+                            "function": {
+                                "name": call["function"]["name"],
+                                "arguments": ""
+                            }
                         }
-                    }
 
-                # 拼接 JSON 字符串片段
-                if call["function"]["arguments"]:
-                    tool_call_accumulator[cid]["function"]["arguments"] += call["function"]["arguments"]
+                    # 拼接 JSON 字符串片段
+                    if call["function"]["arguments"]:
+                        tool_call_accumulator[cid]["function"]["arguments"] += call["function"]["arguments"]
 
-                try:
-                    args = tool_call_accumulator[cid]["function"]["arguments"]
-                    parsed = json.loads(args)
-                    # 如果成功解析 → yield 出去让外部执行
-                    # messages.append(response.choices[0].message)
-                    if pipe and pipe.is_closed():
-                        return
-                    yield {
-                        "event": "tool_call",
-                        "tool_call": {
-                            "id": tool_call_id,
-                            "type": current_type,
-                            "function": {
-                                "name": current_tool_name,
-                                "arguments": parsed
+                    try:
+                        args = tool_call_accumulator[cid]["function"]["arguments"]
+                        parsed = json.loads(args)
+                        # 如果成功解析 → yield 出去让外部执行
+                        # messages.append(response.choices[0].message)
+                        if pipe and pipe.is_closed():
+                            return
+                        yield {
+                            "event": "tool_call",
+                            "tool_call": {
+                                "id": tool_call_id,
+                                "type": current_type,
+                                "function": {
+                                    "name": current_tool_name,
+                                    "arguments": parsed
+                                }
                             }
                         }
-                    }
-                    # 这个调用已经发出去，不要再重复 yield
-                    del tool_call_accumulator[cid]
-                    current_tool_name = None
-                    current_type = None
-                    tool_call_id = None
-                except:
-                    pass  # JSON 还没拼完，继续流式等下一段
-
-        # ==== 流结束 ====
-        if finish_reason:
-            if pipe and pipe.is_closed():
-                return
-            yield {
-                "event": "final_content",
-                "role": buffer_delta["role"],
-                "content": "".join(buffer_delta["content"]),
-            }
-            return
+                        # 这个调用已经发出去，不要再重复 yield
+                        del tool_call_accumulator[cid]
+                        current_tool_name = None
+                        current_type = None
+                        tool_call_id = None
+                    except:
+                        pass  # JSON 还没拼完，继续流式等下一段
+
+            # ==== 流结束 ====
+            if finish_reason:
+                if pipe and pipe.is_closed():
+                    return
+                yield {
+                    "event": "final_content",
+                    "role": buffer_delta["role"],
+                    "content": "".join(buffer_delta["content"]),
+                }
+                # 不直接 return，让流自然读完（usage / [DONE]），连接才能归还连接池
+                final_sent = True
+    finally:
+        # 提前退出（管道关闭 / 任务取消）时立即关闭上游流，不等 GC
+        await stream.aclose()
 
 class ExecutionMode(Enum):
     TEST = "test"
@@ -241,11 +255,21 @@ class BaseAgent(IBaseAgent, ServiceAwareAgent):
         
         # 从agent_profile中读取backbone_llm_config，如果没有则使用默认配置
         backbone_llm_config = agent_profile.get('backbone_llm_config')
-        self.backbone_llm_client = static_llmClientManager.get_client(name=name, config=backbone_llm_config)
+        # 持有 client 引用，agent 被替换/注销时通过 release() 归还
+        # CombinedAgent 会多次执行 BaseAgent.__init__，先归还之前拿到的引用
+        previous_client = getattr(self, "backbone_llm_client", None)
+        if previous_client is not None:
+            previous_client.release()
+        self.backbone_llm_client = static_llmClientManager.acquire(name=name, config=backbone_llm_config)
 
         self.context: Optional[Context] = None
         self.context_maker = None
 
+    def release(self):
+        """释放 agent 持有的资源（LLM client 引用）"""
+        if self.backbone_llm_client is not None:
+            self.backbone_llm_client.release()
+
     def set_context_maker(self, context_maker):
         """设置上下文构建器并注入服务"""
         # 注入服务
@@ -257,8 +281,9 @@ class BaseAgent(IBaseAgent, ServiceAwareAgent):
         self.context_maker = context_maker
         self.context_maker.agent_profile = self.agent_profile
 
-    async def initialize(self):
-        """初始化 Agent"""
+    async def build_init_requests(self) -> List[Dict[str, Any]]:
+        """构造初始化阶段需要的一次性 LLM 请求（目前为日程生成），供批量执行"""
+        requests = []
         for argument in self.agent_profile.get("augmenters", []):
             if argument["name"] == "schedule_augmenter":
                 request = AgentRequest(
@@ -266,11 +291,20 @@ class BaseAgent(IBaseAgent, ServiceAwareAgent):
                     query=f"当前时间为{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}，请创建你今天的日程表，按30分钟为一个tick，只需要给出日程时间安排不需要任何额外描述"
                 )
                 await self.build_real_messages_and_tool(request)
-                messages = [{"role": "system", "content": self.context.system_prompt},
-                            {"role": "user", "content": request.query}]
-                res = await self.backbone_llm_client.chat_completion(messages)
-                self.context_maker.add_augmenter(ScheduleAugmenter(schedule=res["choices"][0]["message"]["content"]))
+                requests.append({"messages": [{"role": "system", "content": self.context.system_prompt},
+                                              {"role": "user", "content": request.query}]})
                 self.context = None
+        return requests
+
+    def apply_init_result(self, response: Dict[str, Any]):
+        """应用初始化请求的结果"""
+        self.context_maker.add_augmenter(ScheduleAugmenter(schedule=response["choices"][0]["message"]["content"]))
+
+    async def initialize(self):
+        """初始化 Agent"""
+        for request in await self.build_init_requests():
+            res = await self.backbone_llm_client.chat_completion(**request)
+            self.apply_init_result(res)
         logger.info("[LLM] agent初始化完毕")
 
 
@@ -330,7 +364,7 @@ class ToolUsingAgent(BaseAgent):
         MAX_STEPS = int(self.agent_profile.get("behavior").get("max_tool_calls"))  # 防死循环
 
         for _ in range(MAX_STEPS):
-            tool_call_found = False
+            pending_calls = []
             final_answer = None
 
             async for event in run_llm_with_tools(
@@ -340,71 +374,14 @@ class ToolUsingAgent(BaseAgent):
             ):
                 # ======== 工具调用 ========
                 if event["event"] == "tool_call":
-                    tool_call_found = True
                     call = event["tool_call"]
                     logger.info(f"[LLM] 工具调用: {call}")
                     if pipe and pipe.is_closed():
                         return None
                     if pipe:
                         await pipe.tool_call(name=call['function']['name'], arguments=call['function']['arguments'])
-
-                    # 1. 执行工具
-                    if pipe and pipe.is_closed():
-                        return None
-                    if self.tool_manager:
-                        result = await self.tool_manager.call_tool(call)
-                    else:
-                        result = {"success": False, "error": "No tool manager set"}
-
-                    # 2. 处理审批需求
-                    if result.get("status") == "pending":
-                        approval_id = result.get("approval_id")
-                        approval_data = result.get("data", {})
-
-                        if pipe:
-                            await pipe.approval_required(
-                                name=call['function']['name'],
-                                arguments=call['function']['arguments'],
-                                approval_id=approval_id,
-                                message=approval_data.get('message', ''),
-                                safety_assessment=approval_data.get('safety_assessment', {})
-                            )
-                        
-                        # 审批决定由 pipe 提供
-                        if pipe:
-                            decision = await pipe.wait_for_approval(approval_id)
-                            if decision == "approved":
-                                approval_result = await self.tool_manager.approve_tool(approval_id)
-                                logger.info(f"[MCP] 批准结果: {approval_result}")
-                                result = approval_result
-                            else:
-                                rejection_result = await self.tool_manager.reject_tool(approval_id)
-                                logger.warning(f"[MCP] 拒绝结果: {rejection_result}")
-                                result = rejection_result
-                        else:
-                            rejection_result = await self.tool_manager.reject_tool(approval_id)
-                            logger.warning(f"[MCP] 拒绝结果: {rejection_result}")
-                            result = rejection_result
-
-                    # 3. 将工具结果加入 messages
-                    if result.get("success") is False:
-                        error_msg = result.get("error", "") or result.get("message", "")
-                        if pipe:
-                            await pipe.tool_result(call['function']['name'], False, {"error": error_msg})
-                        if pipe and pipe.is_closed():
-                            return None
-                        self.context.messages.append({
-                            "role": "user",
-                            "content": f"工具调用 {call['id']} 失败：{error_msg}"
-                        })
-                        continue
-
-                    msg = result.get("result", {}).get("data", "") or result.get("result", "")
-                    if pipe:
-                        await pipe.tool_result(call['function']['name'], True, msg)
-                    if pipe and pipe.is_closed():
-                        return None
-                    await self.append_tool_call(self.context.messages, call, msg, final_answer)
+                    # 先收集，本轮流结束后统一执行（多个调用可并发/批量）
+                    pending_calls.append(call)
 
                     # 注意：不要 break —— event 的流要读完
                     continue
@@ -416,7 +393,13 @@ class ToolUsingAgent(BaseAgent):
                     continue
 
             # ========= 一轮流结束后 =========
-            if tool_call_found:
+            if pending_calls:
+                if pipe and pipe.is_closed():
+                    return None
+                results = await self.execute_tool_calls(pending_calls, pipe)
+                for call, result in zip(pending_calls, results):
+                    if not await self._handle_tool_result(call, result, pipe):
+                        return None
                 # 有工具调用 → 开启下一轮 LLM 运行
                 logger.info("[LLM] 检测到工具调用，进入下一轮")
                 continue
@@ -438,6 +421,76 @@ class ToolUsingAgent(BaseAgent):
         logger.warning("[LLM] 工具调用轮次达到上限")
         return "{\"error\": \"Exceeded max ReAct steps\"}"
 
+    async def execute_tool_calls(self, calls: list, pipe: ProcessPipe | None = None) -> list:
+        """执行一轮中的全部工具调用，结果与 calls 顺序一致"""
+        if not self.tool_manager:
+            return [{"success": False, "error": "No tool manager set"} for _ in calls]
+
+        on_delta = None
+        if pipe:
+            async def on_delta(call, text):
+                if not pipe.is_closed():
+                    await pipe.tool_result_delta(call['function']['name'], text, call.get('id'))
+        return await self.tool_manager.call_tools(calls, on_delta=on_delta)
+
+    async def _handle_tool_result(self, call: Dict[str, Any], result: Dict[str, Any], pipe: ProcessPipe | None = None) -> bool:
+        """处理审批并把工具结果写入 messages，管道已关闭时返回 False"""
+        # 1. 处理审批需求
+        if result.get("status") == "pending":
+            approval_id = result.get("approval_id")
+            approval_data = result.get("data", {})
+
+            if pipe:
+                await pipe.approval_required(
+                    name=call['function']['name'],
+                    arguments=call['function']['arguments'],
+                    approval_id=approval_id,
+                    message=approval_data.get('message', ''),
+                    safety_assessment=approval_data.get('safety_assessment', {})
+                )
+
+            # 审批决定由 pipe 提供；审批在存储中过期时同样向客户端发出 approval_decision
+            if pipe:
+                async def on_decision(decision, message, _approval_id=approval_id):
+                    if pipe.is_waiting_for_approval(_approval_id):
+                        await pipe.approval_decision(_approval_id, decision, message)
+
+                self.tool_manager.watch_approval(approval_id, on_decision)
+                decision = await pipe.wait_for_approval(approval_id, timeout=self.tool_manager.approval_timeout)
+                if decision == "approved":
+                    approval_result = await self.tool_manager.approve_tool(approval_id)
+                    logger.info(f"[MCP] 批准结果: {approval_result}")
+                    result = approval_result
+                else:
+                    rejection_result = await self.tool_manager.reject_tool(approval_id)
+                    logger.warning(f"[MCP] 拒绝结果: {rejection_result}")
+                    result = rejection_result
+            else:
+                rejection_result = await self.tool_manager.reject_tool(approval_id)
+                logger.warning(f"[MCP] 拒绝结果: {rejection_result}")
+                result = rejection_result
+
+        # 2. 将工具结果加入 messages
+        if result.get("success") is False:
+            error_msg = result.get("error", "") or result.get("message", "")
+            if pipe:
+                await pipe.tool_result(call['function']['name'], False, {"error": error_msg})
+            if pipe and pipe.is_closed():
+                return False
+            self.context.messages.append({
+                "role": "user",
+                "content": f"工具调用 {call['id']} 失败：{error_msg}"
+            })
+            return True
+
+        msg = result.get("result", {}).get("data", "") or result.get("result", "")
+        if pipe:
+            await pipe.tool_result(call['function']['name'], True, msg)
+        if pipe and pipe.is_closed():
+            return False
+        await self.append_tool_call(self.context.messages, call, msg)
+        return True
+
     @staticmethod
     async def append_tool_call(messages, call, msg, final_answer = ""):
         """添加工具调用结果到消息列表"""
@@ -468,7 +521,6 @@ class MemoryAwareAgent(BaseAgent):
     def __init__(self,agent_profile:Dict[str, Any], name: str, work_flow_type: ExecutionMode, use_tools: bool = True, output_format: str = "json"):
         super().__init__(agent_profile= agent_profile, name=name, work_flow_type=work_flow_type, use_tools=use_tools, output_format=output_format)
         self.memory_service = None
-        self.response_cache: Dict[str, str] = {}
 
     def set_memory_service(self, memory_service):
         """设置记忆服务"""
@@ -476,23 +528,15 @@ class MemoryAwareAgent(BaseAgent):
 
     async def memory_hook(self, request: AgentRequest, text: str) -> Coroutine[Any, Any, None] | None:
         if request.extraInfo.get("add_memory", True) and self.memory_service:
-            self.response_cache["query"] = request.query
-            self.response_cache["response"] = {"response": text}
-            await self.add_memory(request.session_id)
-            return None
+            # 只进入会话缓冲，由写入队列合并多轮后统一 add
+            get_memory_ingest_queue().add_turn(self.memory_service, request.session_id, [
+                {"role": "user", "content": request.query},
+                {"role": "assistant", "content": text},
+            ])
         return None
 
     async def add_memory(self, session_id: str) -> None:
-        """添加记忆"""
+        """立即写入该会话缓冲的记忆"""
         if not self.memory_service:
             return
-
-        messages = [{
-            "role": "user",
-            "content": self.response_cache.get("query", "")
-        }, {
-            "role": "assistant",
-            "content": self.response_cache.get("response", "")
-        }]
-        self.response_cache.clear()
-        await self.memory_service.add(messages, session_id)
+        await get_memory_ingest_queue().flush(session_id)
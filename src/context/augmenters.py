@@ -3,13 +3,30 @@ from abc import ABC, abstractmethod
 import importlib
 from typing import Dict, Optional
 
+from src.context.prompt_segments import PromptSegment, SegmentedPrompt
+
 
 class AbsAugmenter(ABC):
+    # 补充信息的刷新间隔（秒）：None 只渲染一次，0 每轮重新渲染
+    refresh_interval: Optional[float] = 0
+
     def __init__(self, name, **kwargs):
         self.extra_info = None
         self.name = name
-
-    async def augment(self, context, **kwargs):
+        self._segment = None
+
+    @property
+    def segment(self) -> PromptSegment:
+        # 段对象随 augmenter 跨会话复用，build_extraInfo 不能依赖单个 context；
+        # 需要按 context 生成内容的 augmenter 应覆盖 augment
+        if self._segment is None:
+            self._segment = PromptSegment(self.name, self.build_extraInfo, self.refresh_interval)
+        return self._segment
+
+    async def augment(self, context, segments: Optional[SegmentedPrompt] = None, **kwargs):
+        if segments is not None:
+            segments.put(self.segment)
+            return context
         context.system_prompt = context.system_prompt + '\n' + self.build_extraInfo()
         return context
 
@@ -19,6 +36,9 @@ class AbsAugmenter(ABC):
 
 
 class TimeAugmenter(AbsAugmenter):
+    # 精确到秒，一秒内无需重新格式化
+    refresh_interval = 1.0
+
     def __init__(self, **kwargs):
         super().__init__("time_augmenter", **kwargs)
 
@@ -40,6 +60,9 @@ class ScheduleAugmenter(AbsAugmenter):
 
 
 class MotionAugmenter(AbsAugmenter):
+    # 动作列表固定，拼接结果只生成一次
+    refresh_interval = None
+
     def __init__(self, **kwargs):
         super().__init__("motion_augmenter", **kwargs)
         self.motion = [
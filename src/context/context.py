@@ -17,6 +17,7 @@ class Context:
     session_metadata: Dict[str, Any] = field(default_factory=dict) # 消息发送时间之类的
     system_prompt: Optional[str] = None
     avatar_url: Optional[str] = None
+    history_offset: int = 0 # 按 token 预算发送给 LLM 的历史起始下标，messages 本身不裁剪
     version: int = 0
     created_at: datetime = field(default_factory=datetime.now)
     updated_at: datetime = field(default_factory=datetime.now)
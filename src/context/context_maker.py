@@ -1,5 +1,6 @@
 import asyncio
 import json
+import time
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any, Optional
 
@@ -7,10 +8,51 @@ from sqlalchemy.util import deprecated
 
 from src.context.context import Context
 from src.context.manager import get_context_manager
+from src.context.prompt_segments import SegmentedPrompt
+from src.context.token_budget import get_token_budget
+from src.context.tool_selector import get_tool_selector
+from src.infrastructure.utils.token_estimator import estimate_tokens
 from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.utils.metrics import register_metrics
 
 logger = get_logger()
 
+# 会话预热的默认配置，agent_profile.prefetch 可覆盖
+DEFAULT_PREFETCH = {
+    "enabled": True,
+    "memory_query": "用户的基本信息、偏好、习惯和近期计划",
+    "memory_limit": 5,
+    "ttl": 300,
+    "refine_timeout": 1.5,
+    "timeout": 10,
+}
+
+_prefetch_stats = {"runs": 0, "failures": 0, "memory_reused": 0, "refine_fallbacks": 0, "expired": 0}
+register_metrics("context_prefetch", lambda: dict(_prefetch_stats))
+
+
+def _memory_items(memory: Any) -> Optional[List[Any]]:
+    if isinstance(memory, dict):
+        memory = memory.get("results")
+    return memory if isinstance(memory, list) else None
+
+
+def _merge_memory(specific: Any, generic: Any, limit: int) -> Any:
+    """本轮检索结果在前，预热召回的结果去重后补在后面"""
+    specific_items, generic_items = _memory_items(specific), _memory_items(generic)
+    if specific_items is None or generic_items is None:
+        return specific if specific else generic
+    seen = set()
+    merged = []
+    for item in specific_items + generic_items:
+        key = (item.get("id") or item.get("memory")) if isinstance(item, dict) else str(item)
+        if key in seen:
+            continue
+        seen.add(key)
+        merged.append(item)
+    merged = merged[:max(limit, len(specific_items))]
+    return {**specific, "results": merged} if isinstance(specific, dict) else merged
+
 
 class IContextMaker(ABC):
     """上下文构建接口"""
@@ -40,6 +82,8 @@ class DefaultContextMaker(IContextMaker):
         self.agent_profile = None
         self.augmenters = []
         self._augmenters_loaded = False
+        # session_id -> (预热时间, 通用记忆召回结果)，首轮取用一次
+        self._prefetched_memory: Dict[str, Any] = {}
     
     def add_augmenter(self, augmenter):
         """添加上下文增强器"""
@@ -100,14 +144,119 @@ class DefaultContextMaker(IContextMaker):
         
         # 增强上下文
         self._load_augmenters_from_profile()
-        await self.augment_context(context, **kwargs)
+        segments = await self._augment_segments(context, **kwargs)
+
+        # 按 token 预算裁剪各组件
+        self._apply_token_budget(context, segments)
 
         return context
+
+    def _prefetch_config(self) -> Dict[str, Any]:
+        return {**DEFAULT_PREFETCH, **((self.agent_profile or {}).get("prefetch") or {})}
+
+    async def prefetch(self, session_id: str) -> Dict[str, Any]:
+        """
+        会话 attach/init 时预热：加载上下文、烘焙 prompt、拉取工具目录，并做一次通用记忆召回
+
+        Returns:
+            各项预热耗时（毫秒），失败的项为错误信息
+        """
+        config = self._prefetch_config()
+        if not config.get("enabled"):
+            return {}
+        _prefetch_stats["runs"] += 1
+        agent_id = (self.agent_profile or {}).get("agent_id", "DefaultAgent")
+
+        async def timed(name, coro):
+            start = time.perf_counter()
+            result = await coro
+            return name, result, round((time.perf_counter() - start) * 1000, 1)
+
+        # 在线程中从存储加载并缓存到 ContextManager（按会话加锁），首轮 get_latest 直接命中
+        jobs = [timed("context", asyncio.to_thread(get_context_manager().get_latest, session_id, agent_id))]
+        if self.prompt_service and self.agent_profile:
+            jobs.append(timed("prompt", self.prompt_service.build_prompt(
+                session_id=session_id, agent_profile=self.agent_profile
+            )))
+        if self.tool_manager:
+            jobs.append(timed("tools", self.tool_manager.get_tools()))
+        if self.memory_service:
+            jobs.append(timed("memory", self.memory_service.search(
+                query=config["memory_query"], user_id=session_id, limit=int(config["memory_limit"])
+            )))
+
+        report: Dict[str, Any] = {}
+        try:
+            results = await asyncio.wait_for(
+                asyncio.gather(*jobs, return_exceptions=True), timeout=config["timeout"]
+            )
+        except asyncio.TimeoutError:
+            _prefetch_stats["failures"] += 1
+            logger.warning(f"[prefetch] timeout session_id={session_id}")
+            return report
+        for item in results:
+            if isinstance(item, Exception):
+                _prefetch_stats["failures"] += 1
+                report.setdefault("errors", []).append(str(item))
+                continue
+            name, result, elapsed_ms = item
+            report[name] = elapsed_ms
+            if name == "memory" and result:
+                self._prune_prefetched(config["ttl"])
+                self._prefetched_memory[session_id] = (time.monotonic(), result)
+        logger.info(f"[prefetch] session_id={session_id} {report}")
+        return report
+
+    def _prune_prefetched(self, ttl: float):
+        """清理未被首轮取用、已过期的预热结果"""
+        now = time.monotonic()
+        for session_id in [k for k, (at, _) in self._prefetched_memory.items() if now - at > ttl]:
+            del self._prefetched_memory[session_id]
+
+    def _take_prefetched_memory(self, session_id: str) -> Any:
+        item = self._prefetched_memory.pop(session_id, None)
+        if item is None:
+            return None
+        prefetched_at, memory = item
+        if time.monotonic() - prefetched_at > self._prefetch_config()["ttl"]:
+            _prefetch_stats["expired"] += 1
+            return None
+        return memory
+
+    async def _refine_memory(self, user_query: str, session_id: str, prefetched: Any, limit: int = 5):
+        """首轮在预热召回的基础上补充本轮检索；检索超时或失败时直接使用预热结果"""
+        _prefetch_stats["memory_reused"] += 1
+        try:
+            specific = await asyncio.wait_for(
+                self.memory_service.search(query=user_query, user_id=session_id, limit=limit),
+                timeout=self._prefetch_config()["refine_timeout"],
+            )
+        except Exception as e:
+            _prefetch_stats["refine_fallbacks"] += 1
+            logger.info(f"[prefetch] refine memory fallback session_id={session_id} reason={type(e).__name__}")
+            return prefetched
+        return _merge_memory(specific, prefetched, limit)
+
+    def _apply_token_budget(self, context: Context, segments: Optional[SegmentedPrompt] = None):
+        """按 agent_profile.token_budget（默认取 PE 的 max_token_budget）裁剪并记录各组件 token"""
+        config = (self.agent_profile or {}).get("token_budget") or {}
+        if config.get("enabled") is False:
+            context.history_offset = 0
+            return
+        report = get_token_budget().apply(context, config, segments=segments)
+        context.extra["prompt_budget"] = report
+        parts = " ".join(
+            f"{name}={item['tokens']}/{item['cap']}{'*' if item['trimmed'] else ''}"
+            for name, item in report["components"].items()
+        )
+        logger.info(f"[budget] {parts} total={report['total']}/{report['budget']}")
     
     async def _build_prompt_and_tools(self, context: Context, **kwargs):
         """构建prompt和tools"""
         session_id = context.session_id
         user_query = context.user_query
+        # 基础 prompt 只取本轮 PE 的结果，PE 失败/超时时不沿用上一轮组装好的 prompt
+        context.system_prompt = ""
         
         # 统一创建 Task 对象
         tasks = []
@@ -125,7 +274,11 @@ class DefaultContextMaker(IContextMaker):
             tasks.append(empty_pe_task())
 
         # 搜索记忆
-        if self.memory_service:
+        prefetched_memory = self._take_prefetched_memory(session_id) if self.memory_service else None
+        if self.memory_service and prefetched_memory is not None:
+            rag_task = asyncio.create_task(self._refine_memory(user_query, session_id, prefetched_memory))
+            tasks.append(rag_task)
+        elif self.memory_service:
             rag_task = asyncio.create_task(self.memory_service.search(
                 query=user_query,
                 user_id=session_id,
@@ -185,7 +338,7 @@ class DefaultContextMaker(IContextMaker):
             # 更新上下文
             context.system_prompt = system_prompt
             context.messages.append({"role": "user", "content": user_query})
-            context.tools = tools
+            context.tools = self._select_tools(tools, context)
             context.memory = rag_results
             get_context_manager().snapshot(context, "request_cancelled")
 
@@ -194,12 +347,52 @@ class DefaultContextMaker(IContextMaker):
         except Exception as e:
             logger.exception(f"❌ Unexpected error: {e}")
     
+    def _select_tools(self, tools: List[Dict[str, Any]], context: Context) -> List[Dict[str, Any]]:
+        """按 agent_profile.tool_selection 只保留与本轮问题相关的工具"""
+        selection = (self.agent_profile or {}).get("tool_selection") or {}
+        if not tools or not selection.get("enabled"):
+            return tools
+        # 带上上一条用户消息，避免“再查一次”这类追问丢失主题
+        user_messages = [m.get("content", "") for m in context.messages if m.get("role") == "user"]
+        query = " ".join(str(m) for m in user_messages[-2:])
+        selected = get_tool_selector().select(
+            tools,
+            query,
+            top_k=int(selection.get("top_k", 5)),
+            pinned=selection.get("pinned") or [],
+            version=getattr(self.tool_manager, "catalog_version", None),
+        )
+        if len(selected) < len(tools):
+            full_tokens = estimate_tokens(tools)
+            selected_tokens = estimate_tokens(selected)
+            logger.info(
+                f"[tools] 选择 {len(selected)}/{len(tools)} 个工具，"
+                f"估算 token {selected_tokens}/{full_tokens}，节省 {full_tokens - selected_tokens}"
+            )
+        return selected
+
     async def augment_context(self, context: Context, **kwargs) -> Context:
         """增强上下文"""
-        for augmenter in self.augmenters:
-            context = await augmenter.augment(context, **kwargs)
+        await self._augment_segments(context, **kwargs)
         return context
 
+    async def _augment_segments(self, context: Context, **kwargs) -> SegmentedPrompt:
+        """
+        以本轮的 system_prompt 为基础段组装 prompt
+
+        分段集合每次请求新建，不在会话间共享；augmenter 的段对象由 augmenter 自身缓存，
+        按各自的刷新间隔复用渲染结果
+        """
+        segments = SegmentedPrompt()
+        segments.set_text("system", context.system_prompt or "")
+        for augmenter in self.augmenters:
+            context = await augmenter.augment(context, segments=segments, **kwargs)
+        context.system_prompt = segments.assemble()
+        sizes = segments.token_sizes()
+        context.extra["prompt_segment_tokens"] = sizes
+        logger.debug(f"[prompt] 分段 token: {sizes}，合计 {sum(sizes.values())}")
+        return segments
+
     async def delete_context(self, session_id: str, agent_id: Optional[str] = None) -> int:
         cm = get_context_manager()
         if agent_id:
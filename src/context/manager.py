@@ -24,9 +24,8 @@ class ContextManager:
         return f"{session_id}:{agent_id}"
 
     def _get_lock(self, key: str) -> threading.Lock:
-        if key not in self._locks:
-            self._locks[key] = threading.Lock()
-        return self._locks[key]
+        # setdefault 是原子操作，预热线程与事件循环同时取锁时拿到的是同一把锁
+        return self._locks.setdefault(key, threading.Lock())
 
     def create_context(self, session_id: str, agent_id: str, **kwargs) -> Context:
         ctx = Context(session_id=session_id, agent_id=agent_id, **kwargs)
@@ -59,17 +58,23 @@ class ContextManager:
         return self.snapshot(ctx) if auto_snapshot else ctx
 
     def get_history(self, session_id: str, agent_id: str) -> Optional[List[Context]]:
-        if session_id in self._history:
-            return self._history.get(self._key(session_id, agent_id), [])
-        else:
+        key = self._key(session_id, agent_id)
+        hist = self._history.get(key)
+        if hist is not None:
+            return hist
+        # 未缓存时从存储加载一次；加锁避免预热线程与本轮请求重复加载
+        with self._get_lock(key):
+            hist = self._history.get(key)
+            if hist is not None:
+                return hist
             try:
-                key = self._key(session_id, agent_id)
                 ctx = self.storage.load(key=key)
-                if ctx:
-                    self._history.setdefault(key, []).append(ctx)
-                return self._history[key]
             except Exception:
                 return None
+            if not ctx:
+                return []
+            hist = self._history[key] = [ctx]
+            return hist
 
 
     def get_latest(self, session_id: str, agent_id: str) -> Optional[Context]:
@@ -0,0 +1,104 @@
+"""
+分段构建 system prompt
+
+system prompt 由有序的段组成：PE 烘焙的基础 prompt、各 augmenter 的补充信息等。
+每段声明刷新间隔：
+- None: 静态段，渲染一次后一直复用（除非显式更新文本）
+- 0:    每次组装都重新渲染
+- > 0:  距上次渲染超过该秒数后重新渲染
+
+组装时只做一次 join，并记录每段的估算 token 数。
+"""
+import time
+from typing import Callable, Dict, List, Optional
+
+from src.infrastructure.utils.token_estimator import estimate_text_tokens
+
+
+class PromptSegment:
+    """prompt 中的一段"""
+
+    def __init__(self, name: str, render: Callable[[], str], refresh_interval: Optional[float] = None):
+        self.name = name
+        self._render = render
+        self.refresh_interval = refresh_interval
+        self._text: Optional[str] = None
+        self._rendered_at = 0.0
+        self.tokens = 0
+        self.renders = 0
+
+    @classmethod
+    def static(cls, name: str, text: str) -> "PromptSegment":
+        segment = cls(name, lambda: text)
+        segment._store(text, time.monotonic())
+        return segment
+
+    def _store(self, text: str, now: float):
+        self._text = text or ""
+        self._rendered_at = now
+        self.tokens = estimate_text_tokens(self._text)
+
+    def _stale(self, now: float) -> bool:
+        if self._text is None:
+            return True
+        if self.refresh_interval is None:
+            return False
+        return now - self._rendered_at >= self.refresh_interval
+
+    def text(self, now: Optional[float] = None) -> str:
+        now = time.monotonic() if now is None else now
+        if self._stale(now):
+            self._store(self._render(), now)
+            self.renders += 1
+        return self._text
+
+    def set_text(self, text: str):
+        """直接替换静态段文本，内容不变时不重新计数"""
+        if text == self._text:
+            return
+        self._render = lambda: text
+        self._store(text, time.monotonic())
+
+    def invalidate(self):
+        self._text = None
+
+
+class SegmentedPrompt:
+    """有序的 prompt 段集合，按加入顺序组装"""
+
+    def __init__(self, separator: str = "\n"):
+        self.separator = separator
+        self._segments: Dict[str, PromptSegment] = {}
+
+    def put(self, segment: PromptSegment) -> PromptSegment:
+        """加入或替换同名段；同一个段对象重复加入时保持原位置"""
+        current = self._segments.get(segment.name)
+        if current is not segment:
+            self._segments[segment.name] = segment
+        return segment
+
+    def set_text(self, name: str, text: str) -> PromptSegment:
+        """设置静态段文本，段不存在时追加"""
+        segment = self._segments.get(name)
+        if segment is None:
+            return self.put(PromptSegment.static(name, text))
+        segment.set_text(text)
+        return segment
+
+    def get(self, name: str) -> Optional[PromptSegment]:
+        return self._segments.get(name)
+
+    def remove(self, name: str):
+        self._segments.pop(name, None)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._segments)
+
+    def assemble(self, skip=()) -> str:
+        now = time.monotonic()
+        parts = [segment.text(now) for name, segment in self._segments.items() if name not in skip]
+        return self.separator.join(part for part in parts if part)
+
+    def token_sizes(self) -> Dict[str, int]:
+        return {name: segment.tokens for name, segment in self._segments.items()}
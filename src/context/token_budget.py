@@ -0,0 +1,226 @@
+"""
+Prompt token 预算
+
+按组件统计每次请求的估算 token 数，并按固定规则裁剪到预算内：
+- system:   超出上限时从尾部依次去掉 augmenter 段，仍超出则截断基础 prompt 的末尾
+- schedule: 截断文本末尾
+- memory:   按检索顺序保留命中，放不下的丢弃
+- tools:    按目录/选择顺序保留工具，放不下的丢弃
+- history:  使用总预算扣除以上各项后的剩余部分，按轮次（以 user 消息开头）从新到旧保留，
+            最后一轮始终保留；不修改 context.messages，只设置 context.history_offset
+
+总预算默认读取 config/pe.json 的 pe_settings.max_token_budget，
+agent_profile.token_budget 可覆盖：
+    {"enabled": true, "total": 7000, "caps": {"system": 2500, "tools": 1500, "memory": 1000, "schedule": 300}}
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.context.prompt_segments import SegmentedPrompt
+from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.utils.metrics import register_metrics
+from src.infrastructure.utils.token_estimator import estimate_text_tokens, estimate_tokens, truncate_text_tokens
+
+logger = get_logger()
+
+COMPONENTS = ("system", "memory", "history", "tools", "schedule")
+DEFAULT_TOTAL = 7000
+# 未配置上限时按总预算的比例分配，history 使用剩余部分
+DEFAULT_SHARES = {"system": 0.35, "tools": 0.25, "memory": 0.15, "schedule": 0.05}
+
+
+def _load_pe_budget() -> int:
+    project_root = Path(__file__).resolve().parents[2]
+    for path in (Path("config/pe.json"), project_root / "config" / "pe.json"):
+        try:
+            if path.exists():
+                with open(path, "r", encoding="utf-8") as f:
+                    value = json.load(f).get("pe_settings", {}).get("max_token_budget")
+                if value:
+                    return int(value)
+        except Exception:
+            continue
+    return DEFAULT_TOTAL
+
+
+def _fit_items(items: List[Any], cap: int, measure) -> Tuple[List[Any], int]:
+    """按顺序保留放得下的条目"""
+    kept, used = [], 0
+    for item in items:
+        size = measure(item)
+        if used + size > cap:
+            continue
+        kept.append(item)
+        used += size
+    return kept, used
+
+
+class TokenBudgetAllocator:
+    """按组件上限裁剪上下文，并累计各组件的 token 统计"""
+
+    def __init__(self, default_total: Optional[int] = None):
+        self._default_total = default_total
+        self.requests = 0
+        self.over_budget = 0
+        self.trimmed = {name: 0 for name in COMPONENTS}
+        self.tokens_sum = {name: 0 for name in COMPONENTS}
+        self.tokens_max = {name: 0 for name in COMPONENTS}
+        self.last: Optional[Dict[str, Any]] = None
+
+    @property
+    def default_total(self) -> int:
+        if self._default_total is None:
+            self._default_total = _load_pe_budget()
+        return self._default_total
+
+    def resolve(self, config: Optional[Dict[str, Any]] = None) -> Tuple[int, Dict[str, int]]:
+        """计算总预算与各组件上限"""
+        config = config or {}
+        total = int(config.get("total") or self.default_total)
+        caps = {name: int(total * share) for name, share in DEFAULT_SHARES.items()}
+        for name, value in (config.get("caps") or {}).items():
+            if name in caps and value is not None:
+                caps[name] = int(value)
+        return total, caps
+
+    def apply(self, context, config: Optional[Dict[str, Any]] = None,
+              segments: Optional[SegmentedPrompt] = None) -> Dict[str, Any]:
+        """
+        裁剪 context 中的 system_prompt / schedule / memory / tools，并设置 history_offset
+
+        segments 为本次请求组装 system_prompt 所用的分段，超预算时优先去掉补充段
+
+        Returns:
+            本次请求的分项统计
+        """
+        total, caps = self.resolve(config)
+        used: Dict[str, int] = {}
+        trimmed: Dict[str, bool] = {}
+
+        context.system_prompt, used["system"], trimmed["system"] = self._fit_system(
+            context.system_prompt or "", caps["system"], segments
+        )
+
+        schedule = context.schedule or ""
+        used["schedule"] = estimate_text_tokens(schedule)
+        trimmed["schedule"] = used["schedule"] > caps["schedule"]
+        if trimmed["schedule"]:
+            context.schedule = truncate_text_tokens(schedule, caps["schedule"])
+            used["schedule"] = estimate_text_tokens(context.schedule)
+
+        context.memory, used["memory"], trimmed["memory"] = self._fit_memory(context.memory, caps["memory"])
+
+        tools = context.tools or []
+        kept_tools, used["tools"] = _fit_items(tools, caps["tools"], estimate_tokens)
+        trimmed["tools"] = len(kept_tools) < len(tools)
+        if trimmed["tools"]:
+            context.tools = kept_tools
+
+        history_cap = max(0, total - sum(used.values()))
+        context.history_offset, used["history"], trimmed["history"] = self._fit_history(
+            context.messages or [], history_cap
+        )
+        caps["history"] = history_cap
+
+        report = {
+            "total": sum(used.values()),
+            "budget": total,
+            "components": {
+                name: {"tokens": used[name], "cap": caps[name], "trimmed": trimmed[name]}
+                for name in COMPONENTS
+            },
+        }
+        self._record(report)
+        return report
+
+    @staticmethod
+    def _fit_system(text: str, cap: int, segments: Optional[SegmentedPrompt]) -> Tuple[str, int, bool]:
+        tokens = estimate_text_tokens(text)
+        if tokens <= cap:
+            return text, tokens, False
+        if segments is not None and segments.assemble() == text:
+            # 分段须与本次请求的 prompt 一致，否则直接截断 text；基础 prompt 之外的段从后往前去掉
+            names = [name for name in segments.names if name != "system"]
+            skip = []
+            while names and tokens > cap:
+                skip.append(names.pop())
+                text = segments.assemble(skip=skip)
+                tokens = estimate_text_tokens(text)
+        if tokens > cap:
+            text = truncate_text_tokens(text, cap)
+            tokens = estimate_text_tokens(text)
+        return text, tokens, True
+
+    @staticmethod
+    def _fit_memory(memory: Any, cap: int) -> Tuple[Any, int, bool]:
+        if not memory:
+            return memory, 0, False
+        if isinstance(memory, str):
+            tokens = estimate_text_tokens(memory)
+            if tokens <= cap:
+                return memory, tokens, False
+            memory = truncate_text_tokens(memory, cap)
+            return memory, estimate_text_tokens(memory), True
+        if isinstance(memory, dict):
+            # mem0 返回 {"results": [...]}，兼容 {"result": ...}
+            for key in ("results", "result"):
+                if key in memory:
+                    inner, tokens, cut = TokenBudgetAllocator._fit_memory(memory[key], cap)
+                    return ({**memory, key: inner} if cut else memory), tokens, cut
+            tokens = estimate_tokens(memory)
+            return memory, tokens, False
+        if isinstance(memory, list):
+            kept, tokens = _fit_items(memory, cap, lambda item: estimate_text_tokens(str(item)))
+            return kept, tokens, len(kept) < len(memory)
+        tokens = estimate_tokens(memory)
+        return memory, tokens, False
+
+    @staticmethod
+    def _fit_history(messages: List[Dict[str, Any]], cap: int) -> Tuple[int, int, bool]:
+        """按轮次从新到旧保留，返回 (起始下标, token 数, 是否裁剪)"""
+        if not messages:
+            return 0, 0, False
+        starts = [i for i, m in enumerate(messages) if m.get("role") == "user"]
+        if not starts or starts[0] != 0:
+            starts.insert(0, 0)
+        offset, used = len(messages), 0
+        for start in reversed(starts):
+            size = sum(estimate_tokens(m) for m in messages[start:offset])
+            # 最后一轮即使超出预算也保留
+            if used and used + size > cap:
+                break
+            offset, used = start, used + size
+        return offset, used, offset > 0
+
+    def _record(self, report: Dict[str, Any]):
+        self.requests += 1
+        if report["total"] > report["budget"]:
+            self.over_budget += 1
+        for name, item in report["components"].items():
+            self.tokens_sum[name] += item["tokens"]
+            self.tokens_max[name] = max(self.tokens_max[name], item["tokens"])
+            if item["trimmed"]:
+                self.trimmed[name] += 1
+        self.last = report
+
+    def get_stats(self) -> Dict[str, Any]:
+        requests = self.requests or 1
+        return {
+            "requests": self.requests,
+            "over_budget": self.over_budget,
+            "avg_tokens": {name: round(self.tokens_sum[name] / requests, 1) for name in COMPONENTS},
+            "max_tokens": dict(self.tokens_max),
+            "trimmed": dict(self.trimmed),
+            "last": self.last,
+        }
+
+
+_allocator = TokenBudgetAllocator()
+
+
+def get_token_budget() -> TokenBudgetAllocator:
+    return _allocator
+
+
+register_metrics("prompt_budget", _allocator.get_stats)
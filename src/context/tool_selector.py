@@ -0,0 +1,179 @@
+"""
+工具检索：按用户问题从工具目录中挑选相关工具，减少每轮发送的工具 schema
+
+BM25 索引，分词规则：
+- 英文/数字按单词切分，snake_case / camelCase 额外拆成子词
+- 中日韩连续字符按字二元组切分（单字片段保留单字）
+
+目录变化时只重建变化的工具文档；agent_profile.tool_selection 控制是否启用：
+    {"enabled": true, "top_k": 5, "pinned": ["get_time"]}
+"""
+import hashlib
+import json
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.infrastructure.utils.metrics import register_metrics
+from src.infrastructure.utils.token_estimator import estimate_tokens
+
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z0-9]*|\d+")
+_CJK_RUN_RE = re.compile(r"[㐀-䶿一-鿿぀-ヿ가-힯]+")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def tokenize(text: str) -> List[str]:
+    """BM25 分词"""
+    if not text:
+        return []
+    tokens = []
+    for word in _WORD_RE.findall(text.replace("_", " ").replace("-", " ")):
+        lower = word.lower()
+        tokens.append(lower)
+        parts = _CAMEL_RE.findall(word)
+        if len(parts) > 1:
+            tokens.extend(p.lower() for p in parts)
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def tool_name(tool: Dict[str, Any]) -> str:
+    return (tool.get("function") or {}).get("name") or tool.get("name", "")
+
+
+def tool_text(tool: Dict[str, Any]) -> str:
+    """用于索引的工具文本：名称 + 描述 + 参数名与参数描述"""
+    function = tool.get("function") or tool
+    parts = [function.get("name", ""), function.get("description", "")]
+    properties = ((function.get("parameters") or function.get("inputSchema") or {}).get("properties") or {})
+    for name, schema in properties.items():
+        parts.append(name)
+        if isinstance(schema, dict):
+            parts.append(str(schema.get("description", "")))
+    return " ".join(p for p in parts if p)
+
+
+class BM25ToolSelector:
+    """工具目录的 BM25 索引"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # name -> (fingerprint, term frequencies, doc length)
+        self._docs: Dict[str, Tuple[str, Counter, int]] = {}
+        self._df: Counter = Counter()
+        self._total_len = 0
+        self._version: Optional[Any] = None
+
+        self.rebuilt_docs = 0
+        self.selections = 0
+        self.tokens_full = 0
+        self.tokens_selected = 0
+
+    @staticmethod
+    def _fingerprint(tool: Dict[str, Any]) -> str:
+        return hashlib.sha1(json.dumps(tool, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+    def _remove(self, name: str):
+        _, tf, length = self._docs.pop(name)
+        self._df.subtract(tf.keys())
+        self._total_len -= length
+
+    def update(self, tools: List[Dict[str, Any]], version: Optional[Any] = None):
+        """同步工具目录，只重建新增或变化的工具；version 未变且没有未索引的工具时直接跳过"""
+        if version is not None and version == self._version \
+                and all(tool_name(tool) in self._docs for tool in tools):
+            return
+        seen = set()
+        for tool in tools:
+            name = tool_name(tool)
+            if not name:
+                continue
+            seen.add(name)
+            fingerprint = self._fingerprint(tool)
+            current = self._docs.get(name)
+            if current and current[0] == fingerprint:
+                continue
+            if current:
+                self._remove(name)
+            tf = Counter(tokenize(tool_text(tool)))
+            length = sum(tf.values())
+            self._docs[name] = (fingerprint, tf, length)
+            self._df.update(tf.keys())
+            self._total_len += length
+            self.rebuilt_docs += 1
+        for name in [n for n in self._docs if n not in seen]:
+            self._remove(name)
+        self._df += Counter()  # 去掉计数为 0 的词
+        self._version = version
+
+    def score(self, query: str) -> Dict[str, float]:
+        n_docs = len(self._docs)
+        if not n_docs:
+            return {}
+        avgdl = self._total_len / n_docs or 1.0
+        query_terms = set(tokenize(query))
+        scores: Dict[str, float] = {}
+        for name, (_, tf, length) in self._docs.items():
+            score = 0.0
+            for term in query_terms:
+                freq = tf.get(term)
+                if not freq:
+                    continue
+                df = self._df.get(term, 0)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                score += idf * freq * (self.k1 + 1) / (freq + self.k1 * (1 - self.b + self.b * length / avgdl))
+            if score > 0:
+                scores[name] = score
+        return scores
+
+    def select(
+        self,
+        tools: List[Dict[str, Any]],
+        query: str,
+        top_k: int = 5,
+        pinned: Iterable[str] = (),
+        version: Optional[Any] = None,
+    ) -> List[Dict[str, Any]]:
+        """返回固定工具 + 与 query 最相关的 top_k 个工具（保持目录中的原有顺序）"""
+        pinned = set(pinned or ())
+        if len(tools) <= top_k + len(pinned):
+            return tools
+        self.update(tools, version)
+        scores = self.score(query)
+        # 熔断等原因被过滤掉的工具不占名额
+        present = {tool_name(tool) for tool in tools}
+        ranked = [name for name in sorted(scores, key=scores.get, reverse=True) if name in present][:top_k]
+        keep = pinned | set(ranked)
+        selected = [tool for tool in tools if tool_name(tool) in keep]
+
+        self.selections += 1
+        self.tokens_full += estimate_tokens(tools)
+        self.tokens_selected += estimate_tokens(selected)
+        return selected
+
+    def get_stats(self) -> Dict[str, Any]:
+        saved = self.tokens_full - self.tokens_selected
+        return {
+            "indexed_tools": len(self._docs),
+            "rebuilt_docs": self.rebuilt_docs,
+            "selections": self.selections,
+            "avg_tokens_full": round(self.tokens_full / self.selections, 1) if self.selections else 0,
+            "avg_tokens_selected": round(self.tokens_selected / self.selections, 1) if self.selections else 0,
+            "saved_ratio": round(saved / self.tokens_full, 3) if self.tokens_full else 0.0,
+        }
+
+
+_selector = BM25ToolSelector()
+
+
+def get_tool_selector() -> BM25ToolSelector:
+    return _selector
+
+
+register_metrics("tool_selection", _selector.get_stats)
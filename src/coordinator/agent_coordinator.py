@@ -1,5 +1,8 @@
+import asyncio
 from typing import Dict, Optional, Any
 
+from global_statics import logger
+
 from src.agent import BaseAgent
 from src.coordinator.work_flow_engine import WorkflowEngine
 from src.domain.agent_data_models import AgentRequest
@@ -19,12 +22,17 @@ class AgentCoordinator(WorkflowEngine):
         self.task_dispatcher: Optional[TaskDispatcher] = None
     
     def register_agent(self, agent):
-        """注册 Agent"""
+        """注册 Agent，同 id 的旧 Agent 会被替换并释放资源"""
+        old = self.agents.get(agent.agent_id)
         self.agents[agent.agent_id] = agent
+        if old is not None and old is not agent and hasattr(old, "release"):
+            old.release()
 
     def unregist_agent(self, agent_id: str) -> None:
         if agent_id in self.agents:
-            del self.agents[agent_id]
+            agent = self.agents.pop(agent_id)
+            if hasattr(agent, "release"):
+                agent.release()
     
     def get_agent(self, agent_id: str) -> Optional[Any]:
         """获取 Agent"""
@@ -57,14 +65,44 @@ class AgentCoordinator(WorkflowEngine):
 
         return
 
-    async def initialize_all_agents(self):
-        """初始化所有 Agent"""
+    async def initialize_all_agents(self, concurrency: int = 4, batch_timeout: float = 30.0):
+        """
+        初始化所有 Agent
+
+        使用默认初始化流程的 Agent 先收集各自的初始化请求，按 LLM client 分组后
+        通过 chat_completion_batch 批量执行（共享限流、逐条重试），其余 Agent 各自初始化。
+        启动阶段供应商 batch 最多等待 batch_timeout 秒，超时回退为并发请求
+        """
         tasks = []
+        batch_agents = []
         for agent in self.agents.values():
-            if hasattr(agent, "initialize"):
+            if isinstance(agent, BaseAgent) and type(agent).initialize is BaseAgent.initialize:
+                batch_agents.append(agent)
+            elif hasattr(agent, "initialize"):
                 tasks.append(agent.initialize())
+
+        # client_key -> (client, [(agent, request)])
+        groups: Dict[str, Any] = {}
+        agent_requests = await asyncio.gather(*[agent.build_init_requests() for agent in batch_agents])
+        for agent, requests in zip(batch_agents, agent_requests):
+            client = agent.backbone_llm_client
+            _, items = groups.setdefault(client.client_key, (client, []))
+            items.extend((agent, request) for request in requests)
+
+        async def run_group(client, items):
+            results = await client.chat_completion_batch(
+                [request for _, request in items], concurrency=concurrency, batch_timeout=batch_timeout
+            )
+            for (agent, _), item in zip(items, results):
+                if item["success"]:
+                    agent.apply_init_result(item["result"])
+                else:
+                    logger.warning(f"Agent {agent.agent_id} 初始化请求失败: {item['error']}")
+
+        tasks.extend(run_group(client, items) for client, items in groups.values() if items)
         if tasks:
             await asyncio.gather(*tasks)
+        logger.info(f"[LLM] {len(self.agents)} 个agent初始化完毕")
 
 
 class TaskDispatcher:
@@ -0,0 +1,311 @@
+"""
+工具审批存储：待审批调用的过期、容量上限与可选持久化
+
+- 待审批项超过 ttl 秒未处理时自动拒绝（结果记为 expired），由后台清理任务或访问时触发
+- 待审批项超过 max_pending 时淘汰最早的一项（同样记为 expired）
+- 过期或被决定时通知 watch 登记的回调（decision, message），等待方据此向客户端发出 approval_decision
+- 审批结果只保留最近 max_results 条，超过 results_ttl 秒的结果会被清理
+- 配置 db_path 时待审批项写入 sqlite，进程重启后仍可审批；有事件循环时写入放到线程中按顺序执行
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from src.infrastructure.logging.logger import get_logger
+
+logger = get_logger()
+
+# 回调参数：(decision, message)
+ApprovalWatcher = Callable[[str, str], None]
+
+EXPIRED_RESULT = {
+    "success": False,
+    "status": "rejected",
+    "expired": True,
+    "message": "Tool approval expired",
+}
+
+
+class ApprovalStore:
+    def __init__(
+        self,
+        ttl: float = 300.0,
+        max_pending: int = 256,
+        max_results: int = 1024,
+        results_ttl: float = 3600.0,
+        sweep_interval: Optional[float] = None,
+        db_path: Optional[str] = None,
+    ):
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.max_results = max_results
+        self.results_ttl = results_ttl
+        self.sweep_interval = sweep_interval or max(1.0, min(ttl / 4, 30.0))
+        # approval_id -> {"tool_call", "pending_data", "timestamp", "expires_at"}，按加入顺序
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # approval_id -> (结果, 写入时间)
+        self._results: "OrderedDict[str, tuple]" = OrderedDict()
+        self._sweeper: Optional[asyncio.Task] = None
+        self._watchers: Dict[str, List[ApprovalWatcher]] = {}
+
+        self.expired = 0
+        self.evicted = 0
+
+        self._db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._db_queue: List[tuple] = []
+        self._db_writer: Optional[asyncio.Task] = None
+        if db_path:
+            self._open_db(db_path)
+            self._load()
+
+    # ---------- sqlite ----------
+
+    def _open_db(self, db_path: str):
+        dir_name = os.path.dirname(db_path)
+        if dir_name and not os.path.exists(dir_name):
+            os.makedirs(dir_name, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        try:
+            with self._conn:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+        except Exception:
+            pass
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pending_approvals (
+                    approval_id TEXT NOT NULL PRIMARY KEY,
+                    tool_call_json TEXT NOT NULL,
+                    pending_data_json TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _load(self):
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT approval_id, tool_call_json, pending_data_json, created_at, expires_at "
+                "FROM pending_approvals ORDER BY created_at"
+            ).fetchall()
+            with self._conn:
+                self._conn.execute("DELETE FROM pending_approvals WHERE expires_at<=?", (now,))
+        for approval_id, tool_call_json, pending_data_json, created_at, expires_at in rows:
+            if expires_at <= now:
+                self.expired += 1
+                continue
+            self._pending[approval_id] = {
+                "tool_call": json.loads(tool_call_json),
+                "pending_data": json.loads(pending_data_json),
+                "timestamp": created_at,
+                "expires_at": expires_at,
+            }
+        if self._pending:
+            logger.info(f"[ApprovalStore] 恢复 {len(self._pending)} 个待审批工具调用")
+
+    def _db_execute(self, sql: str, params: tuple = ()):
+        if not self._conn:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._db_write([(sql, params)])
+            return
+        # 写入排队，由单个任务按顺序放到线程中执行，不阻塞事件循环
+        self._db_queue.append((sql, params))
+        if self._db_writer is None or self._db_writer.done():
+            self._db_writer = loop.create_task(self._drain_db())
+
+    async def _drain_db(self):
+        while self._db_queue:
+            batch, self._db_queue = self._db_queue, []
+            await asyncio.to_thread(self._db_write, batch)
+
+    def _db_write(self, batch: List[tuple]):
+        try:
+            with self._lock:
+                if not self._conn:
+                    return
+                with self._conn:
+                    for sql, params in batch:
+                        self._conn.execute(sql, params)
+        except Exception as e:
+            logger.warning(f"[ApprovalStore] sqlite 写入失败: {e}")
+
+    # ---------- 待审批 ----------
+
+    def add(self, approval_id: str, tool_call: Dict[str, Any], pending_data: Dict[str, Any]):
+        now = time.time()
+        item = {
+            "tool_call": tool_call,
+            "pending_data": pending_data,
+            "timestamp": now,
+            "expires_at": now + self.ttl,
+        }
+        self._pending[approval_id] = item
+        self._db_execute(
+            "INSERT OR REPLACE INTO pending_approvals(approval_id, tool_call_json, pending_data_json, created_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                approval_id,
+                json.dumps(tool_call, ensure_ascii=False, default=str),
+                json.dumps(pending_data, ensure_ascii=False, default=str),
+                item["timestamp"],
+                item["expires_at"],
+            ),
+        )
+        while len(self._pending) > self.max_pending:
+            oldest = next(iter(self._pending))
+            logger.warning(f"[ApprovalStore] 待审批数量超过 {self.max_pending}，自动拒绝最早的 approval_id={oldest}")
+            self.evicted += 1
+            self._expire(oldest)
+        self.ensure_sweeper()
+
+    def get(self, approval_id: str) -> Optional[Dict[str, Any]]:
+        """取待审批项，已过期的视为不存在"""
+        item = self._pending.get(approval_id)
+        if item and item["expires_at"] <= time.time():
+            self._expire(approval_id)
+            return None
+        return item
+
+    def pop(self, approval_id: str) -> Optional[Dict[str, Any]]:
+        item = self.get(approval_id)
+        if item is None:
+            return None
+        self._pending.pop(approval_id, None)
+        self._db_execute("DELETE FROM pending_approvals WHERE approval_id=?", (approval_id,))
+        return item
+
+    def pending(self) -> List[Dict[str, Any]]:
+        self.sweep()
+        return [{"approval_id": approval_id, **item} for approval_id, item in self._pending.items()]
+
+    def _expire(self, approval_id: str):
+        self._pending.pop(approval_id, None)
+        self._db_execute("DELETE FROM pending_approvals WHERE approval_id=?", (approval_id,))
+        self.expired += 1
+        self.set_result(approval_id, dict(EXPIRED_RESULT))
+        self.resolve(approval_id, "rejected", "approval_timeout")
+
+    # ---------- 决定通知 ----------
+
+    def watch(self, approval_id: str, callback: ApprovalWatcher):
+        """登记审批决定 / 过期的回调；已有结果（已被决定或过期）时立即回调"""
+        if approval_id in self._pending:
+            self._watchers.setdefault(approval_id, []).append(callback)
+            return
+        result = self.get_result(approval_id)
+        if not result:
+            return
+        if result.get("expired"):
+            callback("rejected", "approval_timeout")
+        elif result.get("status") == "rejected":
+            callback("rejected", "")
+        else:
+            callback("approved", "")
+
+    def resolve(self, approval_id: str, decision: str, message: str = ""):
+        """通知并清除该审批的全部回调"""
+        for callback in self._watchers.pop(approval_id, []):
+            try:
+                callback(decision, message)
+            except Exception as e:
+                logger.warning(f"[ApprovalStore] 审批回调失败 approval_id={approval_id}: {e}")
+
+    # ---------- 审批结果 ----------
+
+    def set_result(self, approval_id: str, result: Dict[str, Any]):
+        self._results[approval_id] = (result, time.time())
+        self._results.move_to_end(approval_id)
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+
+    def get_result(self, approval_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._results.get(approval_id)
+        if entry is None:
+            return None
+        if time.time() - entry[1] > self.results_ttl:
+            self._results.pop(approval_id, None)
+            return None
+        return entry[0]
+
+    def clear_results(self):
+        self._results.clear()
+
+    # ---------- 清理 ----------
+
+    def sweep(self) -> List[str]:
+        """自动拒绝过期的待审批项并清理过期结果，返回本次过期的 approval_id"""
+        now = time.time()
+        expired_ids = [approval_id for approval_id, item in self._pending.items() if item["expires_at"] <= now]
+        for approval_id in expired_ids:
+            self._expire(approval_id)
+        if expired_ids:
+            logger.info(f"[ApprovalStore] {len(expired_ids)} 个待审批工具调用超时，已自动拒绝")
+        while self._results:
+            approval_id, (_, written_at) = next(iter(self._results.items()))
+            if now - written_at <= self.results_ttl:
+                break
+            self._results.popitem(last=False)
+        return expired_ids
+
+    def ensure_sweeper(self):
+        """在当前事件循环中启动后台清理任务（没有运行中的事件循环时只在访问时清理）"""
+        if self._sweeper and not self._sweeper.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._sweeper = loop.create_task(self._sweep_loop())
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.warning(f"[ApprovalStore] 清理失败: {e}")
+
+    async def close(self):
+        if self._sweeper:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._sweeper = None
+        if self._db_writer:
+            try:
+                await self._db_writer
+            except Exception:
+                pass
+            self._db_writer = None
+        if self._db_queue:
+            batch, self._db_queue = self._db_queue, []
+            self._db_write(batch)
+        if self._conn:
+            with self._lock:
+                self._conn.close()
+            self._conn = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "results": len(self._results),
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "ttl": self.ttl,
+            "persistent": bool(self._db_path),
+            "watched": len(self._watchers),
+        }
@@ -1,91 +1,536 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Awaitable, Callable, Optional
 from src.di.services.interfaces.tool_manager import IToolManager
+from src.di.services.impl.tool_policy import ToolPolicyManager, CircuitOpenError, CallNotStarted
+from src.di.services.impl.approval_store import ApprovalStore
 from src.infrastructure.clients.mcp_client import MCPHubClient
+from src.infrastructure.clients.mcp_direct_client import MCPDirectClient, MCPTransportError
 from global_statics import global_config
+from src.infrastructure.config.config_manager import ConfigManager
 from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.utils.metrics import register_metrics
+from src.infrastructure.utils.single_flight import SingleFlight
 import asyncio
+import json
 import uuid
 
 logger = get_logger()
 
+
+class _BatchItemFailed(Exception):
+    """批量请求中 hub 未能给出结果的单项"""
+
+    def __init__(self, result: Dict[str, Any]):
+        super().__init__(result.get("error"))
+        self.result = result
+
+
 class McpToolManager(IToolManager):
     """基于 MCP 的工具管理器"""
     
     def __init__(self):
-        self.mcpClient = MCPHubClient(base_url=f"{global_config['mcphub_url']}:{global_config['mcphub_port']}")
+        hub_config = ConfigManager.get_service_config('mcphub') or {}
+        self.mcpClient = MCPHubClient(
+            base_url=f"{global_config['mcphub_url']}:{global_config['mcphub_port']}",
+            tools_ttl=hub_config.get('tools_ttl', 60.0),
+            tools_max_stale=hub_config.get('tools_max_stale', 600.0),
+            tools_negative_ttl=hub_config.get('tools_negative_ttl', 10.0),
+            max_connections=hub_config.get('max_connections', 100),
+            max_keepalive_connections=hub_config.get('max_keepalive_connections', 20),
+            keepalive_expiry=hub_config.get('keepalive_expiry', 30.0),
+            http2=hub_config.get('http2', False),
+        )
+        register_metrics("mcp_hub", self.mcpClient.get_stats)
         self.tool_cache: List[Dict[str, Any]] = []
-        self.approval_queue: Dict[str, Dict[str, Any]] = {}  # 审批队列
-        self.approval_results: Dict[str, Dict[str, Any]] = {}  # 审批结果
+        # 走流式调用的工具，以及工具输出写入上下文的最大字符数
+        self.stream_tools = set(hub_config.get('stream_tools') or [])
+        self.tool_output_max_chars = hub_config.get('tool_output_max_chars', 8000)
+        # 按工具 / server 的超时、并发上限与熔断
+        self.policies = ToolPolicyManager(hub_config.get('tool_policies'))
+        register_metrics("mcp_tool_policies", self.policies.get_stats)
+        # 直连 MCP server（可选），未直连或直连失败的工具走 hub
+        direct_config = hub_config.get('direct') or {}
+        self.direct: Optional[MCPDirectClient] = None
+        if direct_config.get('enabled'):
+            self.direct = MCPDirectClient.from_config(
+                direct_config.get('servers_config', 'config/mcp_servers.json'),
+                timeout=direct_config.get('timeout', 30.0),
+                max_connections=direct_config.get('max_connections', 50),
+                tools_ttl=hub_config.get('tools_ttl', 60.0),
+            )
+            register_metrics("mcp_direct", self.direct.get_stats)
+        self._direct_version = 0
+        # 可共享结果的工具：并发的相同调用只请求一次（single-flight，不缓存结果）
+        self.shared_tools = set(hub_config.get('shared_tools') or [])
+        self.share_read_only = hub_config.get('share_read_only', True)
+        self._read_only_tools: set = set()
+        self.single_flight = SingleFlight()
+        register_metrics("mcp_single_flight", self.single_flight.get_stats)
+        # 工具目录版本，hub 或直连 server 的工具变化时递增
+        self.catalog_version = 0
+        self.mcpClient.add_tools_listener(self._on_tools_changed)
+        # 审批队列与审批结果：超时自动拒绝、数量有上限，可选 sqlite 持久化
+        approval_config = hub_config.get('approval') or {}
+        self.approvals = ApprovalStore(
+            ttl=approval_config.get('ttl', 300.0),
+            max_pending=approval_config.get('max_pending', 256),
+            max_results=approval_config.get('max_results', 1024),
+            results_ttl=approval_config.get('results_ttl', 3600.0),
+            db_path=approval_config.get('db_path'),
+        )
+        register_metrics("mcp_approvals", self.approvals.get_stats)
+
+    @property
+    def approval_timeout(self) -> float:
+        """等待用户审批的最长时间，超时视为拒绝"""
+        return self.approvals.ttl
     
     async def initialize(self):
         """初始化工具管理器"""
+        if self.direct:
+            await self.direct.start()
+            logger.info(f"MCP 直连发现 {len(self.direct.get_tools())} 个工具")
         try:
             tools = await self.mcpClient.get_tools()
-            self.tool_cache = tools
+            self.tool_cache = self._merge_direct_tools(tools)
             logger.info(f"MCPHubClient 发现 {len(tools)} 个工具")
         except Exception as e:
             logger.warning(f"MCPHubClient get_tools failed: {e}")
-            self.tool_cache = []
+            self.tool_cache = self._merge_direct_tools([])
+        self._index_catalog(self.tool_cache)
     
+    def _on_tools_changed(self, tools: List[Dict[str, Any]], version: int):
+        """工具目录变化通知"""
+        self.tool_cache = self._merge_direct_tools(tools)
+        self.catalog_version += 1
+        self._index_catalog(self.tool_cache)
+        logger.info(f"MCP 工具目录已更新: {len(tools)} 个工具, version={version}")
+
+    def _index_catalog(self, tools: List[Dict[str, Any]]):
+        """目录变化后更新工具所属 server 与只读工具集合"""
+        self.policies.set_tool_servers(tools)
+        read_only = set()
+        for tool in tools:
+            annotations = tool.get("annotations") or (tool.get("function") or {}).get("annotations") or {}
+            if annotations.get("readOnlyHint"):
+                read_only.add(self.policies.tool_name(tool))
+        self._read_only_tools = read_only
+
+    def is_shared_tool(self, tool_name: str) -> bool:
+        """相同参数的并发调用可共享一次执行结果的工具（配置的 shared_tools 或声明 readOnlyHint 的工具）"""
+        return tool_name in self.shared_tools or (self.share_read_only and tool_name in self._read_only_tools)
+
+    @staticmethod
+    def _flight_key(tool_name: str, arguments: Any) -> str:
+        return tool_name + ":" + json.dumps(arguments, sort_keys=True, ensure_ascii=False, default=str)
+
+    def _merge_direct_tools(self, hub_tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """直连 server 的工具优先，hub 中同名工具不再重复提供"""
+        if not self.direct:
+            return hub_tools
+        direct_tools = self.direct.get_tools()
+        if self.direct.tools_version != self._direct_version:
+            self._direct_version = self.direct.tools_version
+            self.catalog_version += 1
+        return direct_tools + [tool for tool in hub_tools if not self.direct.has_tool(self.policies.tool_name(tool))]
+
     async def get_tools(self) -> List[Dict[str, Any]]:
-        """获取可用工具列表"""
-        if not self.tool_cache:
-            await self.initialize()
-        return self.tool_cache
-    
+        """获取可用工具列表（过期时返回旧目录并在后台刷新，不阻塞本轮对话）"""
+        version = self.catalog_version
+        self.tool_cache = self._merge_direct_tools(await self.mcpClient.get_tools())
+        if version != self.catalog_version:
+            self._index_catalog(self.tool_cache)
+        # 熔断中的工具不提供给 LLM
+        return [tool for tool in self.tool_cache if self.policies.is_available(self.policies.tool_name(tool))]
+
+    @staticmethod
+    def _idempotency_key(tool_call: Dict[str, Any]) -> str:
+        """
+        逻辑调用的幂等键，首次使用时生成并记在 tool_call 上，回退 / 重试时沿用
+
+        LLM 给出的调用 id 在部分模型上会跨轮重复（如 call_0），因此附加随机后缀
+        """
+        key = tool_call.get("idempotency_key")
+        if not key:
+            key = f"{tool_call.get('id') or 'call'}:{uuid.uuid4().hex[:12]}"
+            tool_call["idempotency_key"] = key
+        return key
+
+    def is_direct_tool(self, tool_name: str) -> bool:
+        return self.direct is not None and self.direct.has_tool(tool_name)
+
+    async def _call_unary(
+        self,
+        tool_name: str,
+        arguments: Dict[str, Any],
+        timeout: float,
+        idempotency_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """直连 server 提供的工具直接调用，连接失败时回退到 hub"""
+        if self.is_direct_tool(tool_name):
+            try:
+                return await self.direct.call_tool(tool_name, arguments, timeout=timeout)
+            except MCPTransportError as e:
+                self.direct.fallbacks += 1
+                logger.warning(f"工具 {tool_name} 直连失败，回退到 hub: {e}")
+        return await self.mcpClient.call_tool(tool=tool_name, arguments=arguments, timeout=timeout,
+                                              idempotency_key=idempotency_key)
+
+    @staticmethod
+    def _circuit_open_result(tool_name: str) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "error": f"工具 {tool_name} 暂不可用（连续失败已熔断），请稍后再试或换用其他工具",
+            "circuit_open": True,
+        }
+
     async def call_tool(self, tool_call: Dict[str, Any]) -> Dict[str, Any]:
-        """调用工具"""
+        """调用工具（受超时、并发上限与熔断策略约束，失败时返回错误结果而不是抛异常）"""
         function = tool_call.get("function", {})
         tool_name = function.get("name", "")
-        arguments = function.get("arguments", {})
-        
-        # 调用工具
-        result = await self.mcpClient.call_tool(
-            tool=tool_name,
-            arguments=arguments
-        )
-        
+        if self.is_shared_tool(tool_name):
+            # 并发的相同调用共享同一次请求；调用方可能来自不同会话，审批项各自登记
+            key = self._flight_key(tool_name, function.get("arguments", {}))
+            result = dict(await self.single_flight.run(key, lambda: self._invoke(tool_call)))
+        else:
+            result = await self._invoke(tool_call)
+        return self._with_approval(tool_call, result)
+
+    def _with_approval(self, tool_call: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
         # 处理pending状态
         if result.get("status") == "pending":
-            approval_id = str(uuid.uuid4())
-            # 添加到审批队列
-            self.approval_queue[approval_id] = {
-                "tool_call": tool_call,
-                "pending_data": result.get("data", {}),
-                "timestamp": asyncio.get_event_loop().time()
-            }
-            # 返回pending状态和审批ID
-            return {
-                "success": False,
-                "status": "pending",
-                "approval_id": approval_id,
-                "message": "Tool execution requires approval",
-                "data": result.get("data", {})
-            }
-        
+            return self._enqueue_approval(tool_call, result)
         return result
-    
+
+    async def _invoke(self, tool_call: Dict[str, Any]) -> Dict[str, Any]:
+        function = tool_call.get("function", {})
+        tool_name = function.get("name", "")
+        arguments = function.get("arguments", {})
+
+        # 调用工具
+        try:
+            async with self.policies.guard(tool_name) as policy:
+                result = await asyncio.wait_for(
+                    self._call_unary(tool_name, arguments, policy.timeout, self._idempotency_key(tool_call)),
+                    timeout=policy.timeout,
+                )
+        except CircuitOpenError:
+            return self._circuit_open_result(tool_name)
+        except asyncio.TimeoutError:
+            logger.warning(f"工具 {tool_name} 调用超时")
+            return {"success": False, "error": f"工具 {tool_name} 调用超时"}
+        except Exception as e:
+            logger.warning(f"工具 {tool_name} 调用失败: {e}")
+            return {"success": False, "error": str(e)}
+        return result
+
+    def _enqueue_approval(self, tool_call: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+        """hub 返回 pending 时加入审批队列"""
+        approval_id = str(uuid.uuid4())
+        # 添加到审批队列
+        self.approvals.add(approval_id, tool_call, result.get("data", {}))
+        # 返回pending状态和审批ID
+        return {
+            "success": False,
+            "status": "pending",
+            "approval_id": approval_id,
+            "message": "Tool execution requires approval",
+            "data": result.get("data", {})
+        }
+
+    def is_stream_tool(self, tool_name: str) -> bool:
+        return "*" in self.stream_tools or tool_name in self.stream_tools
+
+    @staticmethod
+    def _chunk_text(chunk: Any) -> Optional[str]:
+        """从 hub 的流式 chunk 中取出文本片段"""
+        if isinstance(chunk, str):
+            return chunk
+        if isinstance(chunk, dict):
+            for key in ("delta", "content", "text", "data", "output"):
+                value = chunk.get(key)
+                if isinstance(value, str):
+                    return value
+        return None
+
+    async def call_tool_stream(
+        self,
+        tool_call: Dict[str, Any],
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        流式调用工具
+
+        未开启流式的工具直接走 call_tool；流式请求未到达工具（连接失败 / hub 无流式端点）时回退为一次性调用，
+        其余失败（工具可能已执行）直接返回错误结果。累计输出超过 tool_output_max_chars 时截断并断开流，结果中附带截断标记。
+        """
+        function = tool_call.get("function", {})
+        tool_name = function.get("name", "")
+        arguments = function.get("arguments", {})
+        if not self.is_stream_tool(tool_name) or self.is_direct_tool(tool_name):
+            return await self.call_tool(tool_call)
+
+        max_chars = self.tool_output_max_chars
+        parts: List[str] = []
+        total = 0
+        truncated = False
+        stream_error = None
+        try:
+            async with self.policies.guard(tool_name) as policy:
+                # 流式工具的 timeout 作为相邻 chunk 之间的最大间隔
+                stream = self.mcpClient.call_tool_stream(tool=tool_name, arguments=arguments,
+                                                         chunk_timeout=policy.timeout,
+                                                         idempotency_key=self._idempotency_key(tool_call))
+                try:
+                    async for chunk in stream:
+                        if isinstance(chunk, dict):
+                            if chunk.get("status") == "pending":
+                                return self._enqueue_approval(tool_call, chunk)
+                            if chunk.get("not_started") and not parts:
+                                raise CallNotStarted(chunk.get("error"))
+                            if chunk.get("error"):
+                                stream_error = chunk["error"]
+                                # 抛出以计入熔断
+                                raise RuntimeError(stream_error)
+                        text = self._chunk_text(chunk)
+                        if not text:
+                            continue
+                        if total + len(text) > max_chars:
+                            text = text[:max_chars - total]
+                            truncated = True
+                        if text:
+                            parts.append(text)
+                            total += len(text)
+                            if on_delta:
+                                await on_delta(text)
+                        if truncated:
+                            # 超出上限，断开流，不再读取剩余输出
+                            break
+                finally:
+                    await stream.aclose()
+        except CircuitOpenError:
+            return self._circuit_open_result(tool_name)
+        except CallNotStarted as e:
+            logger.warning(f"工具 {tool_name} 流式调用未发出，回退为一次性调用: {e}")
+            return await self.call_tool(tool_call)
+        except asyncio.TimeoutError:
+            return {"success": False, "error": f"工具 {tool_name} 调用超时", "result": {"data": "".join(parts)}}
+        except Exception as e:
+            if stream_error is None:
+                stream_error = str(e)
+            logger.warning(f"工具 {tool_name} 流式调用失败: {stream_error}")
+            return {"success": False, "error": stream_error, "result": {"data": "".join(parts)}}
+
+        data = "".join(parts)
+        if truncated:
+            marker = f"\n...[输出超过 {max_chars} 字符，已截断]"
+            data += marker
+            if on_delta:
+                await on_delta(marker)
+            logger.info(f"工具 {tool_name} 输出超过 {max_chars} 字符，已截断")
+        return {"success": True, "result": {"data": data}, "truncated": truncated}
+
+    async def _run_batch_item(
+        self,
+        tool_name: str,
+        admitted: asyncio.Future,
+        outcome: asyncio.Future,
+    ) -> Dict[str, Any]:
+        """
+        批量请求中的单项，与 _invoke 使用相同的 guard
+
+        取得槽位后以策略写入 admitted（被拒绝时写入 None），随后等待 outcome 中的批量结果
+        """
+        try:
+            async with self.policies.guard(tool_name) as policy:
+                admitted.set_result(policy)
+                result = await asyncio.wait_for(asyncio.shield(outcome), timeout=policy.timeout)
+                if result.get("hub_error"):
+                    # 抛出以计入熔断
+                    raise _BatchItemFailed(result)
+                return result
+        except CircuitOpenError:
+            return self._circuit_open_result(tool_name)
+        except asyncio.TimeoutError:
+            logger.warning(f"工具 {tool_name} 调用超时")
+            return {"success": False, "error": f"工具 {tool_name} 调用超时"}
+        except _BatchItemFailed as e:
+            return e.result
+        except Exception as e:
+            logger.warning(f"工具 {tool_name} 调用失败: {e}")
+            return {"success": False, "error": str(e)}
+        finally:
+            if not admitted.done():
+                admitted.set_result(None)
+
+    async def call_tools(
+        self,
+        tool_calls: List[Dict[str, Any]],
+        on_delta: Optional[Callable[[Dict[str, Any], str], Awaitable[None]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        并发执行一轮中的多个工具调用，结果与 tool_calls 顺序一致
+
+        流式工具各自走 call_tool_stream；其余工具超过一个时合并为一次 call_batch 请求，
+        由 hub 并发分发到各 MCP server；直连 server 的工具各自直接调用。
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(tool_calls)
+        stream_indexes = []
+        unary_indexes = []
+        direct_indexes = []
+        for index, call in enumerate(tool_calls):
+            tool_name = call.get("function", {}).get("name", "")
+            if self.is_direct_tool(tool_name):
+                direct_indexes.append(index)
+            elif self.is_stream_tool(tool_name):
+                stream_indexes.append(index)
+            else:
+                unary_indexes.append(index)
+
+        async def run_direct(index: int):
+            results[index] = await self.call_tool(tool_calls[index])
+
+        async def run_stream(index: int):
+            call = tool_calls[index]
+            callback = (lambda text: on_delta(call, text)) if on_delta else None
+            results[index] = await self.call_tool_stream(call, on_delta=callback)
+
+        async def run_unary():
+            if len(unary_indexes) == 1:
+                index = unary_indexes[0]
+                results[index] = await self.call_tool(tool_calls[index])
+                return
+            loop = asyncio.get_running_loop()
+            # 可共享工具：由本批发起的 key，以及等待其他请求结果的 (index, future)
+            flight_keys: Dict[int, str] = {}
+            followers = []
+            # 每个批量项各自经过 guard（熔断、并发槽位、超时），取得槽位后才放入批量请求；
+            # 同一作用域超出 max_in_flight 的调用不进本批，单独排队执行，避免批内互相等待槽位
+            admitted: Dict[int, asyncio.Future] = {}
+            outcomes: Dict[int, asyncio.Future] = {}
+            items: Dict[int, asyncio.Task] = {}
+            overflow = []
+            scope_counts: Dict[str, int] = {}
+            for index in unary_indexes:
+                function = tool_calls[index].get("function", {})
+                tool_name = function.get("name", "")
+                if self.is_shared_tool(tool_name):
+                    key = self._flight_key(tool_name, function.get("arguments", {}))
+                    fut, leader = self.single_flight.claim(key)
+                    if not leader:
+                        followers.append((index, fut))
+                        continue
+                    flight_keys[index] = key
+                scope = self.policies.breaker(tool_name).scope
+                if scope_counts.get(scope, 0) >= self.policies.policy_for(tool_name).max_in_flight:
+                    overflow.append(index)
+                    continue
+                scope_counts[scope] = scope_counts.get(scope, 0) + 1
+                admitted[index] = loop.create_future()
+                outcomes[index] = loop.create_future()
+                items[index] = asyncio.ensure_future(
+                    self._run_batch_item(tool_name, admitted[index], outcomes[index])
+                )
+
+            async def run_overflow(index: int):
+                results[index] = await self._invoke(tool_calls[index])
+
+            overflow_tasks = [asyncio.ensure_future(run_overflow(index)) for index in overflow]
+            try:
+                await asyncio.gather(*admitted.values())
+                batch_indexes = [index for index in admitted if admitted[index].result() is not None]
+                if batch_indexes:
+                    batch = []
+                    for index in batch_indexes:
+                        function = tool_calls[index].get("function", {})
+                        batch.append({
+                            "tool": function.get("name", ""),
+                            "arguments": function.get("arguments", {}),
+                            "id": tool_calls[index].get("id"),
+                            "idempotency_key": self._idempotency_key(tool_calls[index]),
+                        })
+                    # 单项超时由各自的 guard 控制，整个批量请求以其中最长的为上限
+                    timeout = max(admitted[index].result().timeout for index in batch_indexes)
+                    async for position, result in self.mcpClient.call_tools_batch(batch, timeout=timeout):
+                        outcome = outcomes[batch_indexes[position]]
+                        if not outcome.done():
+                            outcome.set_result(result)
+            except Exception as e:
+                logger.warning(f"批量工具调用失败: {e}")
+            finally:
+                # 没有拿到结果的批量项记为失败（计入熔断并释放槽位 / 探测名额）
+                for outcome in outcomes.values():
+                    if not outcome.done():
+                        outcome.set_result({"success": False, "error": "no result from hub", "hub_error": True})
+                for index, task in items.items():
+                    try:
+                        results[index] = await task
+                    except Exception as e:
+                        results[index] = {"success": False, "error": str(e)}
+                await asyncio.gather(*overflow_tasks, return_exceptions=True)
+                for index, key in flight_keys.items():
+                    self.single_flight.finish(key, results[index] or {"success": False, "error": "no result from hub"})
+            for index in flight_keys:
+                results[index] = dict(results[index])
+            for index, fut in followers:
+                results[index] = dict(await asyncio.shield(fut))
+            # 共享的是 hub 的 pending 结果，审批项按调用各自登记，一个会话的决定不会作用到其他会话
+            for index in unary_indexes:
+                if results[index] is not None:
+                    results[index] = self._with_approval(tool_calls[index], results[index])
+
+        tasks = [run_stream(index) for index in stream_indexes]
+        tasks.extend(run_direct(index) for index in direct_indexes)
+        if unary_indexes:
+            tasks.append(run_unary())
+        await asyncio.gather(*tasks)
+        return [
+            result if result is not None else {"success": False, "error": "no result from hub"}
+            for result in results
+        ]
+
     async def get_pending_approvals(self) -> List[Dict[str, Any]]:
         """获取待审批的工具调用"""
         return [
             {
-                "approval_id": approval_id,
+                "approval_id": item["approval_id"],
                 "tool_call": item["tool_call"],
                 "pending_data": item["pending_data"],
-                "timestamp": item["timestamp"]
+                "timestamp": item["timestamp"],
+                "expires_at": item["expires_at"],
             }
-            for approval_id, item in self.approval_queue.items()
+            for item in self.approvals.pending()
         ]
     
+    def watch_approval(self, approval_id: str, on_decision: Callable[[str, str], Awaitable[None]]):
+        """审批过期（后台清理 / 访问时）或被决定时回调 on_decision(decision, message)"""
+        def _notify(decision: str, message: str):
+            try:
+                asyncio.get_running_loop().create_task(on_decision(decision, message))
+            except RuntimeError:
+                pass
+
+        self.approvals.watch(approval_id, _notify)
+
+    def _missing_approval(self, approval_id: str) -> Dict[str, Any]:
+        # 已超时自动拒绝的审批返回拒绝结果，其余视为不存在
+        result = self.approvals.get_result(approval_id)
+        if result and result.get("expired"):
+            return result
+        return {
+            "success": False,
+            "error": "Approval ID not found"
+        }
+
     async def approve_tool(self, approval_id: str) -> Dict[str, Any]:
-        """批准工具执行"""
-        if approval_id not in self.approval_queue:
-            return {
-                "success": False,
-                "error": "Approval ID not found"
-            }
+        """批准工具执行（同一审批项的并发批准只执行一次）"""
+        return await self.single_flight.run(f"approve:{approval_id}", lambda: self._approve(approval_id))
+
+    async def _approve(self, approval_id: str) -> Dict[str, Any]:
+        # 从审批队列中移除
+        item = self.approvals.pop(approval_id)
+        if item is None:
+            return self._missing_approval(approval_id)
         
-        item = self.approval_queue[approval_id]
         tool_call = item["tool_call"]
         function = tool_call.get("function", {})
         tool_name = function.get("name", "")
@@ -98,29 +543,25 @@ class McpToolManager(IToolManager):
             approval_id=approval_id
         )
         
-        # 从审批队列中移除
-        del self.approval_queue[approval_id]
         # 保存审批结果
-        self.approval_results[approval_id] = result
+        self.approvals.set_result(approval_id, result)
+        self.approvals.resolve(approval_id, "approved")
         
         return result
     
     async def reject_tool(self, approval_id: str) -> Dict[str, Any]:
         """拒绝工具执行"""
-        if approval_id not in self.approval_queue:
-            return {
-                "success": False,
-                "error": "Approval ID not found"
-            }
-        
         # 从审批队列中移除
-        del self.approval_queue[approval_id]
+        if self.approvals.pop(approval_id) is None:
+            return self._missing_approval(approval_id)
+        
         # 保存拒绝结果
-        self.approval_results[approval_id] = {
+        self.approvals.set_result(approval_id, {
             "success": False,
             "status": "rejected",
             "message": "Tool execution rejected"
-        }
+        })
+        self.approvals.resolve(approval_id, "rejected")
         
         return {
             "success": False,
@@ -130,9 +571,9 @@ class McpToolManager(IToolManager):
     
     async def get_approval_result(self, approval_id: str) -> Optional[Dict[str, Any]]:
         """获取审批结果"""
-        return self.approval_results.get(approval_id)
+        return self.approvals.get_result(approval_id)
     
     async def clear_approval_history(self):
         """清除审批历史"""
-        self.approval_results.clear()
+        self.approvals.clear_results()
         return {"success": True, "message": "Approval history cleared"}
@@ -1,7 +1,10 @@
 import asyncio
+import time
 from typing import List, Dict, Any
+from src.di.services.impl.memory_search_cache import MemorySearchCache
 from src.di.services.interfaces.memory_service import IMemoryService
 from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.utils.metrics import register_metrics
 
 logger = get_logger()
 
@@ -19,18 +22,55 @@ class Mem0MemoryService(IMemoryService):
     
     def __init__(self):
         self.mem = MemoryManager()
+        # 同一会话相邻几轮的检索往往相同，短 TTL 缓存结果，写入记忆时失效
+        settings = dict(self.mem.search_cache_settings)
+        self.search_cache = None
+        if settings.pop("enabled", True):
+            self.search_cache = MemorySearchCache(**settings)
+            register_metrics("memory_search_cache", self.search_cache.get_stats)
     
     async def search(self, query: str, user_id: str, **kwargs) -> List[Dict[str, Any]]:
         """搜索记忆"""
         limit = kwargs.get("limit", 5)
-        logger.info(f"[Mem0] search memory with query: {query}, user_id: {user_id}, limit: {limit}")
+        cache = self.search_cache
         try:
-            return await self.mem.search(query=query, user_id=user_id, limit=limit)
+            embedding = None
+            if cache is not None:
+                generation = cache.generation(user_id)
+                similar = cache.similarity_enabled and isinstance(query, str)
+                cached = cache.get(user_id, query, limit, record_miss=not similar)
+                if cached is None and similar:
+                    embedding = await self.mem.embed(query)
+                    cached = cache.get(user_id, query, limit, embedding=embedding)
+                if cached is not None:
+                    logger.info(f"[Mem0] search memory cache hit, user_id: {user_id}, limit: {limit}")
+                    return cached
+            logger.info(f"[Mem0] search memory with query: {query}, user_id: {user_id}, limit: {limit}")
+            start = time.perf_counter()
+            results = await self.mem.search(query=query, user_id=user_id, limit=limit)
+            if cache is not None:
+                cache.put(user_id, query, limit, results, (time.perf_counter() - start) * 1000,
+                          generation, embedding=embedding)
+            return results
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Mem0Client search timeout ({self.mem.search_timeout}s), user_id: {user_id}")
+            return []
         except Exception as e:
             logger.warning(f"⚠️ Mem0Client search failed: {e}")
             return []
     
     async def add(self, messages: List[Dict[str, Any]], user_id: str) -> None:
         """添加记忆"""
-        await asyncio.to_thread(self.mem.add, messages, user_id)
+        if self.search_cache is not None:
+            self.search_cache.invalidate(user_id)
+        try:
+            await self.mem.add(messages, user_id)
+        finally:
+            # 写入期间开始的检索可能读到旧数据，再失效一次使其结果不进缓存
+            if self.search_cache is not None:
+                self.search_cache.invalidate(user_id)
         logger.info("[Mem0] add memory success")
+
+    def close(self) -> None:
+        """关闭 mem0 线程池"""
+        self.mem.close()
@@ -0,0 +1,216 @@
+"""
+记忆写入队列：按会话合并多轮对话，一次 memory_service.add 写入
+
+- 每轮对话结束只追加到该会话的缓冲区；静默 quiet_period 秒或攒够 max_turns 轮后写入
+- 写入由单个后台 worker 串行执行，有用户请求在处理时暂缓（最多等待 max_idle_wait 秒）
+- 会话断开时立即安排写入；进程退出前 close() 写完剩余缓冲
+- 写入失败的对话放回缓冲区，retry_delay 秒后重试，连续失败 max_retries 次后丢弃
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.utils.metrics import register_metrics
+
+logger = get_logger()
+
+
+class _SessionBuffer:
+    def __init__(self, memory_service):
+        self.memory_service = memory_service
+        self.messages: List[Dict[str, Any]] = []
+        self.turns = 0
+        self.first_at = time.monotonic()
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.retries = 0
+
+
+class MemoryIngestQueue:
+    def __init__(self, max_turns: int = 4, quiet_period: float = 30.0, max_idle_wait: float = 10.0,
+                 max_retries: int = 3, retry_delay: float = 5.0):
+        self.max_turns = max_turns
+        self.quiet_period = quiet_period
+        self.max_idle_wait = max_idle_wait
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._buffers: Dict[str, _SessionBuffer] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued = set()
+        self._worker: Optional[asyncio.Task] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._foreground = 0
+        self.turns_enqueued = 0
+        self.turns_flushed = 0
+        self.flushes = 0
+        self.failures = 0
+        self.retries = 0
+        self.turns_dropped = 0
+        self.deferred = 0
+        self._closing = False
+
+    def _ensure_worker(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._idle = asyncio.Event()
+            if self._foreground == 0:
+                self._idle.set()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    @asynccontextmanager
+    async def foreground(self):
+        """标记一次用户请求，期间暂缓记忆写入"""
+        self._ensure_worker()
+        self._foreground += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._foreground -= 1
+            if self._foreground == 0:
+                self._idle.set()
+
+    def add_turn(self, memory_service, session_id: str, messages: List[Dict[str, Any]]):
+        """追加一轮对话到会话缓冲区"""
+        self._ensure_worker()
+        buffer = self._buffers.get(session_id)
+        if buffer is None:
+            buffer = self._buffers[session_id] = _SessionBuffer(memory_service)
+        buffer.memory_service = memory_service
+        buffer.messages.extend(messages)
+        buffer.turns += 1
+        self.turns_enqueued += 1
+        if buffer.turns >= self.max_turns:
+            self.flush_soon(session_id)
+            return
+        if buffer.timer is not None:
+            buffer.timer.cancel()
+        buffer.timer = asyncio.get_running_loop().call_later(self.quiet_period, self.flush_soon, session_id)
+
+    def flush_soon(self, session_id: str):
+        """跳过静默等待，交给 worker 写入"""
+        buffer = self._buffers.get(session_id)
+        if buffer is None or session_id in self._queued:
+            return
+        if buffer.timer is not None:
+            buffer.timer.cancel()
+            buffer.timer = None
+        self._ensure_worker()
+        self._queued.add(session_id)
+        self._queue.put_nowait(session_id)
+
+    async def _run(self):
+        while True:
+            session_id = await self._queue.get()
+            try:
+                if not self._idle.is_set():
+                    self.deferred += 1
+                    try:
+                        await asyncio.wait_for(self._idle.wait(), timeout=self.max_idle_wait)
+                    except asyncio.TimeoutError:
+                        pass
+                self._queued.discard(session_id)
+                await self._flush(session_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[memory] ingest worker error session_id={session_id} error={e}")
+            finally:
+                self._queue.task_done()
+
+    async def _flush(self, session_id: str):
+        buffer = self._buffers.pop(session_id, None)
+        if buffer is None or not buffer.messages:
+            return
+        if buffer.timer is not None:
+            buffer.timer.cancel()
+        try:
+            await buffer.memory_service.add(buffer.messages, session_id)
+            self.flushes += 1
+            self.turns_flushed += buffer.turns
+            logger.info(f"[memory] ingest session_id={session_id} turns={buffer.turns}")
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"[memory] ingest failed session_id={session_id} turns={buffer.turns} error={e}")
+            self._requeue(session_id, buffer)
+
+    def _requeue(self, session_id: str, failed: _SessionBuffer):
+        """把写入失败的对话放回缓冲区（排在写入期间新到的对话之前），超过重试次数则丢弃"""
+        if failed.retries >= self.max_retries:
+            self.turns_dropped += failed.turns
+            logger.warning(f"[memory] ingest dropped session_id={session_id} turns={failed.turns} "
+                           f"after {failed.retries} retries")
+            return
+        self.retries += 1
+        buffer = self._buffers.get(session_id)
+        if buffer is not None:
+            if buffer.timer is not None:
+                buffer.timer.cancel()
+            failed.messages.extend(buffer.messages)
+            failed.turns += buffer.turns
+            failed.memory_service = buffer.memory_service
+        failed.retries += 1
+        failed.timer = None
+        self._buffers[session_id] = failed
+        if self._closing:
+            self.flush_soon(session_id)
+            return
+        delay = self.retry_delay * (2 ** (failed.retries - 1))
+        failed.timer = asyncio.get_running_loop().call_later(delay, self.flush_soon, session_id)
+
+    async def flush(self, session_id: str):
+        """立即写入该会话的缓冲（不等待空闲）"""
+        self._queued.discard(session_id)
+        await self._flush(session_id)
+
+    async def close(self, timeout: float = 30.0):
+        """写完所有缓冲后停止 worker"""
+        self._closing = True
+        for session_id in list(self._buffers):
+            buffer = self._buffers[session_id]
+            if buffer.timer is not None:
+                buffer.timer.cancel()
+                buffer.timer = None
+        if self._queue is not None:
+            if self._idle is not None:
+                self._idle.set()
+            for session_id in list(self._buffers):
+                self.flush_soon(session_id)
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"[memory] ingest close timeout, dropped sessions={len(self._buffers)}")
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "pending_sessions": len(self._buffers),
+            "pending_turns": sum(b.turns for b in self._buffers.values()),
+            "turns_enqueued": self.turns_enqueued,
+            "turns_flushed": self.turns_flushed,
+            "flushes": self.flushes,
+            "add_calls_saved": self.turns_flushed - self.flushes,
+            "failures": self.failures,
+            "retries": self.retries,
+            "turns_dropped": self.turns_dropped,
+            "deferred_for_foreground": self.deferred,
+            "foreground": self._foreground,
+        }
+
+
+_ingest_queue = MemoryIngestQueue()
+
+
+def get_memory_ingest_queue() -> MemoryIngestQueue:
+    return _ingest_queue
+
+
+register_metrics("memory_ingest", _ingest_queue.get_stats)
@@ -0,0 +1,143 @@
+"""
+记忆检索结果缓存：按用户（会话）缓存 search 结果，写入记忆时整体失效
+
+- 键为规范化后的 query 与 limit，短 TTL
+- 可选相似复用：提供 query 向量时，与该用户缓存中向量余弦相似度不低于阈值的结果直接复用
+- 每个用户有一个代数，失效时递增；检索开始后发生过失效的结果不写入缓存
+"""
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+_SPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCT = "?？!！。.,，~～ "
+
+
+def normalize_query(query: Any) -> str:
+    if not isinstance(query, str):
+        # 消息列表形式的 query 取文本拼接
+        query = " ".join(str(m.get("content", "")) if isinstance(m, dict) else str(m) for m in query or [])
+    return _SPACE_RE.sub(" ", query.strip().lower()).rstrip(_TRAILING_PUNCT)
+
+
+def cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    if not na or not nb:
+        return 0.0
+    return dot / (na * nb)
+
+
+class _Entry:
+    __slots__ = ("results", "expires_at", "latency_ms", "embedding")
+
+    def __init__(self, results, expires_at, latency_ms, embedding):
+        self.results = results
+        self.expires_at = expires_at
+        self.latency_ms = latency_ms
+        self.embedding = embedding
+
+
+class MemorySearchCache:
+    def __init__(self, ttl: float = 60.0, max_entries_per_user: int = 32, max_users: int = 1024,
+                 similarity_threshold: Optional[float] = None):
+        self.ttl = ttl
+        self.max_entries_per_user = max_entries_per_user
+        self.max_users = max_users
+        self.similarity_threshold = similarity_threshold
+        self._users: "OrderedDict[str, OrderedDict[Tuple[str, int], _Entry]]" = OrderedDict()
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_skips = 0
+        self.saved_ms = 0.0
+
+    @property
+    def similarity_enabled(self) -> bool:
+        return bool(self.similarity_threshold)
+
+    def generation(self, user_id: str) -> int:
+        return self._generations.get(user_id, 0)
+
+    def _entries(self, user_id: str, create: bool = False):
+        entries = self._users.get(user_id)
+        if entries is None:
+            if not create:
+                return None
+            entries = self._users[user_id] = OrderedDict()
+            while len(self._users) > self.max_users:
+                evicted, _ = self._users.popitem(last=False)
+                self._generations.pop(evicted, None)
+        self._users.move_to_end(user_id)
+        return entries
+
+    def get(self, user_id: str, query: Any, limit: int, embedding: Optional[List[float]] = None,
+            record_miss: bool = True):
+        """命中返回缓存结果，否则返回 None；record_miss=False 时未命中不计数（之后还会带向量再查一次）"""
+        entries = self._entries(user_id)
+        now = time.monotonic()
+        if entries:
+            for key in [k for k, e in entries.items() if e.expires_at <= now]:
+                del entries[key]
+            key = (normalize_query(query), limit)
+            entry = entries.get(key)
+            if entry is not None:
+                entries.move_to_end(key)
+                self.hits += 1
+                self.saved_ms += entry.latency_ms
+                return entry.results
+            if embedding is not None and self.similarity_enabled:
+                best, best_score = None, self.similarity_threshold
+                for (_, entry_limit), entry in entries.items():
+                    if entry_limit != limit or entry.embedding is None:
+                        continue
+                    score = cosine(embedding, entry.embedding)
+                    if score >= best_score:
+                        best, best_score = entry, score
+                if best is not None:
+                    self.similar_hits += 1
+                    self.saved_ms += best.latency_ms
+                    return best.results
+        if record_miss:
+            self.misses += 1
+        return None
+
+    def put(self, user_id: str, query: Any, limit: int, results: Any, latency_ms: float,
+            generation: int, embedding: Optional[List[float]] = None):
+        """写入缓存；generation 与当前不一致（检索期间有写入）时丢弃"""
+        if generation != self.generation(user_id):
+            self.stale_skips += 1
+            return
+        entries = self._entries(user_id, create=True)
+        key = (normalize_query(query), limit)
+        entries[key] = _Entry(results, time.monotonic() + self.ttl, latency_ms, embedding)
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries_per_user:
+            entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        self._generations[user_id] = self.generation(user_id) + 1
+        self._generations.move_to_end(user_id)
+        while len(self._generations) > self.max_users * 4:
+            self._generations.popitem(last=False)
+        if self._users.pop(user_id, None) is not None:
+            self.invalidations += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.similar_hits + self.misses
+        return {
+            "users": len(self._users),
+            "entries": sum(len(e) for e in self._users.values()),
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.similar_hits) / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "stale_skips": self.stale_skips,
+            "saved_ms": round(self.saved_ms, 1),
+        }
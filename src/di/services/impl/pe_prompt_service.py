@@ -2,6 +2,8 @@ from typing import Dict, Any, Optional
 from src.di.services.interfaces.prompt_service import IPromptService
 from tools.prompt_server import PromptBaker
 from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.utils.metrics import register_metrics
+from global_statics import global_config
 
 logger = get_logger()
 
@@ -10,13 +12,17 @@ class PePromptService(IPromptService):
     """基于 PE 的提示词服务"""
     
     def __init__(self):
-        self.pe_baker: Optional[PromptBaker] = PromptBaker()
+        # 模板修改后自动重新加载只在开发模式（reload）下开启
+        self.pe_baker: Optional[PromptBaker] = PromptBaker(auto_reload=bool(global_config.get('reload', False)))
+        register_metrics("prompt_cache", lambda: self.pe_baker.get_stats() if self.pe_baker else {})
     
     async def initialize(self):
         """初始化提示词服务"""
         try:
-            self.pe_baker = PromptBaker()
-            logger.info("PE_Baker实例初始化完毕")
+            if self.pe_baker is None:
+                self.pe_baker = PromptBaker(auto_reload=bool(global_config.get('reload', False)))
+            count = self.pe_baker.warmup()
+            logger.info(f"PE_Baker实例初始化完毕，预编译 {count} 个模板，耗时 {self.pe_baker.templates.warmup_ms}ms")
         except Exception as e:
             logger.exception(f"PE_Baker实例初始化失败 {e}")
     
@@ -26,3 +32,8 @@ class PePromptService(IPromptService):
             session_id=session_id,
             agent_profile=agent_profile
         )
+
+    def invalidate(self, agent_id: str):
+        """AgentProfile 更新后失效该 agent 烘焙过的 prompt"""
+        if self.pe_baker and agent_id:
+            self.pe_baker.invalidate_agent(agent_id)
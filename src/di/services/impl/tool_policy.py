@@ -0,0 +1,258 @@
+"""
+MCP 工具调用策略：超时、并发上限、熔断
+
+策略按 工具 > 所属 server > 默认 的顺序合并；熔断与并发上限按作用域统计，
+能识别出所属 server 的工具共享 server 级熔断器，否则按工具名独立统计。
+
+熔断器状态：
+- closed:    正常放行，连续失败达到 failure_threshold 后打开
+- open:      直接失败，不再请求 hub；同时从发给 LLM 的工具列表中隐藏
+- half_open: 打开 recovery_timeout 秒后放行一个探测请求，成功则关闭，失败则重新打开；
+             探测进行中同样拒绝其他调用并从工具列表中隐藏
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from src.infrastructure.logging.logger import get_logger
+
+logger = get_logger()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_POLICY = {
+    "timeout": 30.0,
+    "max_in_flight": 8,
+    "failure_threshold": 3,
+    "recovery_timeout": 30.0,
+}
+
+
+class CircuitOpenError(Exception):
+    """熔断打开，调用被直接拒绝"""
+
+    def __init__(self, scope: str):
+        super().__init__(f"circuit open: {scope}")
+        self.scope = scope
+
+
+class CallNotStarted(Exception):
+    """调用未到达工具（连接失败 / 端点不存在），不计入熔断，可安全换用其他方式重发"""
+
+
+class ToolPolicy:
+    """单个工具生效的策略"""
+
+    def __init__(self, timeout: float, max_in_flight: int, failure_threshold: int, recovery_timeout: float):
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+
+
+class CircuitBreaker:
+    def __init__(self, scope: str, failure_threshold: int, recovery_timeout: float):
+        self.scope = scope
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.open_count = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def available(self) -> bool:
+        """与 allow_request 的判断一致，但不占用探测名额"""
+        state = self.state
+        return state == CLOSED or (state == HALF_OPEN and not self._probing)
+
+    def record_success(self):
+        if self._state != CLOSED:
+            logger.info(f"[ToolPolicy] 熔断恢复 scope={self.scope}")
+        self._state = CLOSED
+        self._probing = False
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.total_failures += 1
+        if self._state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self._state != OPEN:
+                self.open_count += 1
+                logger.warning(
+                    f"[ToolPolicy] 熔断打开 scope={self.scope} failures={self.consecutive_failures} "
+                    f"recovery={self.recovery_timeout}s"
+                )
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    def release_probe(self):
+        """探测请求未得出结论（如被取消）时释放探测名额"""
+        self._probing = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "total_failures": self.total_failures,
+            "open_count": self.open_count,
+            "rejected": self.rejected,
+        }
+
+
+class ToolPolicyManager:
+    """
+    配置示例（mcphub_config.tool_policies）：
+        {
+            "default": {"timeout": 30, "max_in_flight": 8, "failure_threshold": 3, "recovery_timeout": 30},
+            "servers": {"terminal-user": {"timeout": 60, "max_in_flight": 2}},
+            "tools": {"web_search": {"timeout": 10}}
+        }
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.default = {**DEFAULT_POLICY, **{k: v for k, v in (config.get("default") or {}).items() if v is not None}}
+        self.tool_overrides: Dict[str, Dict[str, Any]] = config.get("tools") or {}
+        self.server_overrides: Dict[str, Dict[str, Any]] = config.get("servers") or {}
+        self._tool_servers: Dict[str, str] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._timeouts: Dict[str, int] = {}
+
+    @staticmethod
+    def tool_name(tool: Dict[str, Any]) -> str:
+        return (tool.get("function") or {}).get("name") or tool.get("name", "")
+
+    def set_tool_servers(self, tools: List[Dict[str, Any]]):
+        """根据工具目录记录工具所属 server（hub 在工具定义中提供 server / server_name 时）"""
+        mapping = {}
+        for tool in tools:
+            server = tool.get("server") or tool.get("server_name") or (tool.get("function") or {}).get("server")
+            if server:
+                mapping[self.tool_name(tool)] = server
+        self._tool_servers = mapping
+
+    def _scope(self, tool_name: str) -> str:
+        server = self._tool_servers.get(tool_name)
+        return f"server:{server}" if server else f"tool:{tool_name}"
+
+    def policy_for(self, tool_name: str) -> ToolPolicy:
+        merged = dict(self.default)
+        server = self._tool_servers.get(tool_name)
+        for override in (self.server_overrides.get(server) if server else None, self.tool_overrides.get(tool_name)):
+            if override:
+                merged.update({k: v for k, v in override.items() if v is not None})
+        return ToolPolicy(
+            timeout=float(merged["timeout"]),
+            max_in_flight=int(merged["max_in_flight"]),
+            failure_threshold=int(merged["failure_threshold"]),
+            recovery_timeout=float(merged["recovery_timeout"]),
+        )
+
+    def breaker(self, tool_name: str) -> CircuitBreaker:
+        scope = self._scope(tool_name)
+        breaker = self._breakers.get(scope)
+        if breaker is None:
+            policy = self.policy_for(tool_name)
+            breaker = CircuitBreaker(scope, policy.failure_threshold, policy.recovery_timeout)
+            self._breakers[scope] = breaker
+        return breaker
+
+    def _semaphore(self, tool_name: str, max_in_flight: int) -> asyncio.Semaphore:
+        scope = self._scope(tool_name)
+        semaphore = self._semaphores.get(scope)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(max(1, max_in_flight))
+            self._semaphores[scope] = semaphore
+        return semaphore
+
+    def is_available(self, tool_name: str) -> bool:
+        """熔断中的工具不提供给 LLM（half_open 且探测名额空闲时放出，以便探测）"""
+        scope = self._scope(tool_name)
+        breaker = self._breakers.get(scope)
+        return breaker is None or breaker.available()
+
+    def record_timeout(self, tool_name: str):
+        scope = self._scope(tool_name)
+        self._timeouts[scope] = self._timeouts.get(scope, 0) + 1
+
+    @asynccontextmanager
+    async def guard(self, tool_name: str) -> AsyncIterator[ToolPolicy]:
+        """
+        按策略执行一次调用：熔断检查 -> 并发槽位（等待不超过 timeout）-> 调用
+
+        块内抛出异常记为失败（计入熔断），正常退出记为成功；CallNotStarted 不计入
+        """
+        policy = self.policy_for(tool_name)
+        breaker = self.breaker(tool_name)
+        # half_open 时放行即占用了探测名额，只有占用者才能释放
+        probe = breaker.state == HALF_OPEN
+        if not breaker.allow_request():
+            raise CircuitOpenError(breaker.scope)
+
+        scope = breaker.scope
+        semaphore = self._semaphore(tool_name, policy.max_in_flight)
+        try:
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout=policy.timeout)
+            except asyncio.TimeoutError:
+                # 本地并发槽位排满不代表 server 故障，不计入熔断
+                self.record_timeout(tool_name)
+                raise
+            self._in_flight[scope] = self._in_flight.get(scope, 0) + 1
+            try:
+                yield policy
+            except (asyncio.CancelledError, CallNotStarted):
+                raise
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.record_timeout(tool_name)
+                breaker.record_failure()
+                raise
+            else:
+                breaker.record_success()
+            finally:
+                self._in_flight[scope] -= 1
+                semaphore.release()
+        finally:
+            if probe:
+                breaker.release_probe()
+
+    def get_stats(self) -> Dict[str, Any]:
+        scopes = {}
+        for scope, breaker in self._breakers.items():
+            scopes[scope] = {
+                **breaker.get_stats(),
+                "in_flight": self._in_flight.get(scope, 0),
+                "timeouts": self._timeouts.get(scope, 0),
+            }
+        return {
+            "default": self.default,
+            "open_circuits": [scope for scope, breaker in self._breakers.items() if breaker.state == OPEN],
+            "scopes": scopes,
+        }
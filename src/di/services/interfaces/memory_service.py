@@ -14,3 +14,7 @@ class IMemoryService(ABC):
     async def add(self, messages: List[Dict[str, Any]], user_id: str) -> None:
         """添加记忆"""
         pass
+
+    def close(self) -> None:
+        """释放资源"""
+        pass
@@ -14,3 +14,7 @@ class IPromptService(ABC):
     async def build_prompt(self, session_id: str, agent_profile:Dict[str,Any], **kwargs) -> Dict[str, Any]:
         """构建提示词"""
         pass
+
+    def invalidate(self, agent_id: str):
+        """AgentProfile 更新后失效该 agent 的提示词缓存，默认无缓存"""
+        pass
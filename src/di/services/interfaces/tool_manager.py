@@ -1,9 +1,13 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Awaitable, Callable, Optional
 
 
 class IToolManager(ABC):
     """工具管理接口"""
+
+    # 等待用户审批的最长秒数，None 表示不限
+    approval_timeout: Optional[float] = None
     
     @abstractmethod
     async def initialize(self):
@@ -19,3 +23,26 @@ class IToolManager(ABC):
     async def call_tool(self, tool_call: Dict[str, Any]) -> Dict[str, Any]:
         """调用工具"""
         pass
+
+    async def call_tool_stream(
+        self,
+        tool_call: Dict[str, Any],
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+    ) -> Dict[str, Any]:
+        """流式调用工具，部分输出通过 on_delta 回调；默认退化为一次性调用"""
+        return await self.call_tool(tool_call)
+
+    async def call_tools(
+        self,
+        tool_calls: List[Dict[str, Any]],
+        on_delta: Optional[Callable[[Dict[str, Any], str], Awaitable[None]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """并发调用一轮中的多个工具，结果与 tool_calls 顺序一致；on_delta(tool_call, text) 接收流式输出"""
+        return list(await asyncio.gather(*[
+            self.call_tool_stream(call, on_delta=(lambda text, _call=call: on_delta(_call, text)) if on_delta else None)
+            for call in tool_calls
+        ]))
+
+    def watch_approval(self, approval_id: str, on_decision: Callable[[str, str], Awaitable[None]]):
+        """审批在别处被决定或过期时回调 on_decision(decision, message)；默认不通知"""
+        return None
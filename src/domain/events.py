@@ -20,6 +20,7 @@ class ServerEventType(str, Enum):
     AGENT_THINK_DELTA = "think_delta"
     AGENT_TOOL_CALL = "tool_call"
     AGENT_TOOL_RESULT = "tool_result"
+    AGENT_TOOL_RESULT_DELTA = "tool_result_delta"
     AGENT_APPROVAL_REQUIRED = "approval_required"
     AGENT_APPROVAL_DECISION = "approval_decision"
     # 标准事件
@@ -116,6 +117,13 @@ class ToolResultPayload:
     result: Any
 
 
+@dataclass
+class ToolResultDeltaPayload:
+    name: str
+    delta: str
+    tool_call_id: Optional[str] = None
+
+
 @dataclass
 class ApprovalRequiredPayload:
     approval_id: str
@@ -180,6 +188,7 @@ ServiceEventPayload = Union[
     ThinkDeltaPayload,
     ToolCallPayload,
     ToolResultPayload,
+    ToolResultDeltaPayload,
     ApprovalRequiredPayload,
     ApprovalDecisionPayload,
     FinalPayload,
@@ -0,0 +1,214 @@
+"""
+embedding 缓存：包在 mem0 embedder 外面，相同模型 + 相同文本不再重复请求
+
+两级缓存：
+- 内存 LRU：最近使用的向量
+- 磁盘：float32 memmap 数组保存向量，sqlite 记录 key -> 行号；
+  超过容量时复用最久未使用的行。进程重启后仍可命中。
+  索引与向量文件都按维度区分，不同维度的缓存互不影响
+
+key 为 sha256(模型名 + 文本)；embedder 对 add/search 返回不同向量时可开启 key_by_action。
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.infrastructure.logging.logger import get_logger
+
+logger = get_logger()
+
+_GROW_ROWS = 1024
+
+
+class EmbeddingCache:
+    def __init__(self, model: str, dims: int, path: Optional[str] = None,
+                 max_memory_entries: int = 4096, max_disk_entries: int = 100_000):
+        """
+        Args:
+            model: embedding 模型名，参与 key 计算
+            dims: 向量维度
+            path: 磁盘缓存目录，为 None 时只用内存缓存
+            max_memory_entries: 内存 LRU 容量
+            max_disk_entries: 磁盘缓存容量（行数）
+        """
+        self.model = model
+        self.dims = int(dims)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._vectors: Optional[np.memmap] = None
+        self._vectors_path = None
+        self._rows = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._miss_ms_sum = 0.0
+        if path:
+            try:
+                self._open_disk(path)
+            except Exception as e:
+                logger.warning(f"[embedding_cache] disk tier disabled path={path} error={e}")
+                self._db = None
+                self._vectors = None
+
+    def _open_disk(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        # 行号只在同维度的向量文件内有效，索引也按维度分文件
+        self._db = sqlite3.connect(os.path.join(path, f"index_{self.dims}.sqlite"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, slot INTEGER NOT NULL UNIQUE, model TEXT, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._db.commit()
+        self._vectors_path = os.path.join(path, f"vectors_{self.dims}.f32")
+        if os.path.exists(self._vectors_path):
+            self._rows = os.path.getsize(self._vectors_path) // (self.dims * 4)
+        if self._rows:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(self._rows, self.dims))
+
+    def _ensure_rows(self, rows: int):
+        if rows <= self._rows:
+            return
+        new_rows = min(self.max_disk_entries, max(rows, self._rows + _GROW_ROWS))
+        if self._vectors is not None:
+            self._vectors.flush()
+            del self._vectors
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(new_rows * self.dims * 4)
+        self._rows = new_rows
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(self._rows, self.dims))
+
+    def key(self, text: str, action: Optional[str] = None) -> str:
+        raw = f"{self.model}\0{action or ''}\0{text}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+            if self._db is None:
+                return None
+            row = self._db.execute("SELECT slot FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None or row[0] >= self._rows:
+                return None
+            vector = self._vectors[row[0]].tolist()
+            self._db.execute("UPDATE embeddings SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self._remember(key, vector)
+            self.disk_hits += 1
+            return vector
+
+    def put(self, key: str, vector: List[float]):
+        vector = list(vector)
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is None or len(vector) != self.dims:
+                return
+            try:
+                self._put_disk(key, vector)
+            except Exception as e:
+                logger.warning(f"[embedding_cache] disk write failed error={e}")
+
+    def _put_disk(self, key: str, vector: List[float]):
+        # 复用行时的删除与写入在同一事务内，失败则回滚，旧 key 仍指向原向量
+        with self._db:
+            self._write_disk(key, vector)
+
+    def _write_disk(self, key: str, vector: List[float]):
+        row = self._db.execute("SELECT slot FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            slot = row[0]
+        else:
+            count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count < self.max_disk_entries:
+                slot = count
+            else:
+                # 容量已满，复用最久未使用的行
+                old_key, slot = self._db.execute(
+                    "SELECT key, slot FROM embeddings ORDER BY last_used LIMIT 1"
+                ).fetchone()
+                self._db.execute("DELETE FROM embeddings WHERE key = ?", (old_key,))
+        self._db.execute(
+            "INSERT OR REPLACE INTO embeddings (key, slot, model, last_used) VALUES (?, ?, ?, ?)",
+            (key, slot, self.model, time.time()),
+        )
+        # 向量最后写入，之前任一步失败都不会改动该行原有的向量
+        self._ensure_rows(slot + 1)
+        self._vectors[slot] = np.asarray(vector, dtype=np.float32)
+
+    def record_miss(self, elapsed_ms: float):
+        with self._lock:
+            self.misses += 1
+            self._miss_ms_sum += elapsed_ms
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        avg_miss_ms = self._miss_ms_sum / self.misses if self.misses else 0.0
+        disk_entries = 0
+        with self._lock:
+            if self._db is not None:
+                disk_entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {
+            "model": self.model,
+            "memory_entries": len(self._memory),
+            "disk_entries": disk_entries,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "avg_miss_ms": round(avg_miss_ms, 1),
+            # 按未命中的平均耗时估算
+            "saved_ms": round((self.memory_hits + self.disk_hits) * avg_miss_ms, 1),
+        }
+
+
+class CachedEmbedder:
+    """替换 mem0 Memory.embedding_model，其余属性透传给原 embedder"""
+
+    def __init__(self, embedder, cache: EmbeddingCache, key_by_action: bool = False):
+        self._embedder = embedder
+        self.cache = cache
+        self.key_by_action = key_by_action
+
+    def embed(self, text, memory_action=None):
+        if not isinstance(text, str):
+            return self._embedder.embed(text, memory_action)
+        key = self.cache.key(text, memory_action if self.key_by_action else None)
+        vector = self.cache.get(key)
+        if vector is not None:
+            return vector
+        start = time.perf_counter()
+        vector = self._embedder.embed(text, memory_action)
+        self.cache.record_miss((time.perf_counter() - start) * 1000)
+        self.cache.put(key, vector)
+        return vector
+
+    def __getattr__(self, name):
+        return getattr(self._embedder, name)
@@ -1,5 +1,20 @@
+import asyncio
+import random
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, AsyncGenerator
+from typing import List, Dict, Any, AsyncGenerator, Optional
+
+from src.infrastructure.logging.logger import get_logger
+
+logger = get_logger()
+
+# 这些状态码重试也不会成功（参数/鉴权问题），批量请求中直接判失败
+NON_RETRYABLE_STATUS = {400, 401, 403, 404, 422}
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    return status not in NON_RETRYABLE_STATUS
 
 
 class AbsLLMClient(ABC):
@@ -33,12 +48,83 @@ class AbsLLMClient(ABC):
         """流式生成"""
         pass
 
+    async def chat_completion_batch(
+        self,
+        requests: List[Dict[str, Any]],
+        concurrency: int = 4,
+        max_retries: int = 2,
+        retry_backoff: float = 1.0,
+        batch_timeout: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        批量一次性生成，适合启动/维护类的离线请求
+
+        Args:
+            requests: 请求列表，每项为 {"messages": [...], **chat_completion 参数}
+            concurrency: 同时进行的请求数上限（仍受 endpoint 共享限流器约束）
+            max_retries: 单条请求失败后的重试次数，参数/鉴权类错误不重试
+            retry_backoff: 重试退避基数（秒），指数增长并带随机抖动
+            batch_timeout: 供应商 batch 的等待上限（秒），为 None 时使用配置；超时后回退为并发请求
+
+        Returns:
+            与 requests 顺序一致的结果列表，每项为
+            {"index", "success", "result", "error"}
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+        pending = list(range(len(requests)))
+
+        if self.supports_batch_api and pending:
+            try:
+                items = await self._provider_batch(requests, timeout=batch_timeout)
+                if items is not None:
+                    for item in items:
+                        if item["success"]:
+                            results[item["index"]] = item
+                    pending = [i for i in pending if results[i] is None]
+                    logger.info(f"[LLM] provider batch 完成 {len(requests) - len(pending)}/{len(requests)}，"
+                                f"剩余 {len(pending)} 条走并发请求")
+            except Exception as e:
+                logger.warning(f"[LLM] provider batch 失败，回退为并发请求: {e}")
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def _run(index: int):
+            request = dict(requests[index])
+            messages = request.pop("messages")
+            attempt = 0
+            while True:
+                try:
+                    async with semaphore:
+                        result = await self.chat_completion(messages, **request)
+                    results[index] = {"index": index, "success": True, "result": result, "error": None}
+                    return
+                except Exception as e:
+                    if attempt >= max_retries or not _is_retryable(e):
+                        results[index] = {"index": index, "success": False, "result": None, "error": str(e)}
+                        return
+                    delay = retry_backoff * (2 ** attempt) * (0.5 + random.random())
+                    attempt += 1
+                    logger.warning(f"[LLM] 批量请求第 {index} 条失败，{delay:.2f}s 后重试({attempt}/{max_retries}): {e}")
+                    await asyncio.sleep(delay)
+
+        await asyncio.gather(*[_run(i) for i in pending])
+        return results
+
+    async def _provider_batch(self, requests: List[Dict[str, Any]],
+                              timeout: Optional[float] = None) -> Optional[List[Dict[str, Any]]]:
+        """供应商原生 batch 接口，返回格式同 chat_completion_batch；返回 None 表示不支持，全部走并发请求"""
+        return None
+
     # ========= 生命周期 =========
 
     @abstractmethod
     async def close(self):
         pass
 
+    def pool_stats(self) -> Dict[str, Any]:
+        """底层连接池状态，子类按需实现"""
+        return {}
+
     # ========= 元信息（用于能力判断） =========
 
     @property
@@ -54,3 +140,8 @@ class AbsLLMClient(ABC):
     @property
     def supports_vision(self) -> bool:
         return False
+
+    @property
+    def supports_batch_api(self) -> bool:
+        """是否支持供应商原生 batch 接口（如 OpenAI /v1/batches）"""
+        return False
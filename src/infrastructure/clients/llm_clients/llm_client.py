@@ -13,6 +13,10 @@ from typing import List, Dict, Any, Optional, AsyncGenerator
 import global_statics
 from global_statics import logger
 from src.infrastructure.clients.llm_clients.abs_llm_client import AbsLLMClient
+from src.infrastructure.clients.llm_clients.rate_limiter import get_rate_limiter, call_with_rate_limit
+from src.infrastructure.clients.llm_clients.stream_abort import StreamAbortWatcher
+from src.infrastructure.utils.http_pool import httpx_pool_stats
+from src.infrastructure.utils.token_estimator import estimate_tokens
 
 
 class OpenAIStyleLLMClient(AbsLLMClient):
@@ -43,13 +47,17 @@ class OpenAIStyleLLMClient(AbsLLMClient):
         self.model_name = backbone_llm_config['model_name']
         self.timeout = backbone_llm_config.get('timeout', 30)
 
-        # 初始化 OpenAI 客户端
+        # 初始化 OpenAI 客户端；关闭 SDK 内置重试，429 与瞬时错误的重试统一由 call_with_rate_limit 处理
         self.client = AsyncOpenAI(
             api_key=self.api_key,
             base_url=self.base_url,
-            timeout=self.timeout
+            timeout=self.timeout,
+            max_retries=0
         )
 
+        # 同一 endpoint 共享的限流器
+        self.rate_limiter = get_rate_limiter(backbone_llm_config)
+
         logger.info(f"LLMClient初始化完成，使用模型: {self.model_name}, base_url: {self.base_url}")
 
     async def chat_completion(
@@ -78,38 +86,23 @@ class OpenAIStyleLLMClient(AbsLLMClient):
             响应数据字典
         """
         try:
-            # 使用配置中的默认值
-            if model is None:
-                model = self.model_name
-            if temperature is None:
-                temperature = self.config['temperature']
-            if max_tokens is None:
-                max_tokens = self.config.get('max_tokens')
-
-            # 构建请求参数
-            request_params = {
-                "model": model,
-                "messages": messages,
-                "temperature": temperature,
-                **kwargs
-            }
-
-            if max_tokens:
-                request_params["max_tokens"] = max_tokens
-
-            if tools:
-                request_params["tools"] = tools
-
-            if tool_choice:
-                request_params["tool_choice"] = tool_choice
+            request_params = self._build_request_params(
+                messages, model, temperature, max_tokens, tools, tool_choice, **kwargs
+            )
 
-            logger.info(f"[LLM] 发送聊天请求，模型: {model}, 消息数: {len(messages)}")
+            logger.info(f"[LLM] 发送聊天请求，模型: {request_params['model']}, 消息数: {len(messages)}")
 
-            # 使用 OpenAI 客户端发送请求
-            response = await self.client.chat.completions.create(**request_params)
+            # 使用 OpenAI 客户端发送请求（经过限流器排队）
+            estimated = self._estimate_request_tokens(request_params)
+            response = await call_with_rate_limit(
+                self.rate_limiter,
+                estimated,
+                lambda: self.client.chat.completions.create(**request_params)
+            )
 
             # 将响应转换为字典格式
             result = response.model_dump()
+            self.rate_limiter.reconcile(estimated, (result.get('usage') or {}).get('total_tokens'))
 
             logger.info(f"[LLM] 收到响应，使用token: {result.get('usage', {})}")
             return result
@@ -128,47 +121,157 @@ class OpenAIStyleLLMClient(AbsLLMClient):
         tool_choice: Optional[str] = None,
         **kwargs
     ) -> AsyncGenerator[str, Any]:
+        # 管道关闭时触发，用于立即关闭上游 HTTP 流
+        abort_signal = kwargs.pop("abort_signal", None)
+        if abort_signal is not None and abort_signal.is_set():
+            return
         try:
-            # 使用配置中的默认值
-            if model is None:
-                model = self.model_name
-            if temperature is None:
-                temperature = self.config['temperature']
-            if max_tokens is None:
-                max_tokens = self.config.get('max_tokens')
-
-            # 构建请求参数
-            request_params = {
-                "model": model,
-                "messages": messages,
-                "temperature": temperature,
-                "stream": True,
-                **kwargs
-            }
-
-            if max_tokens:
-                request_params["max_tokens"] = max_tokens
-
-            if tools:
-                request_params["tools"] = tools
-
-            if tool_choice:
-                request_params["tool_choice"] = tool_choice
-
-            logger.info(f"[LLM] 发送聊天请求，模型: {model}, 消息数: {len(messages)}")
-
-            # AsyncOpenAI 流式生成
-            stream = await self.client.chat.completions.create(
-                **request_params,
+            request_params = self._build_request_params(
+                messages, model, temperature, max_tokens, tools, tool_choice, stream=True, **kwargs
             )
 
-            async for chunk in stream:
-                yield chunk.model_dump_json()
+            logger.info(f"[LLM] 发送聊天请求，模型: {request_params['model']}, 消息数: {len(messages)}")
+
+            # AsyncOpenAI 流式生成（经过限流器排队，429 只会发生在建立连接时）
+            stream = await call_with_rate_limit(
+                self.rate_limiter,
+                self._estimate_request_tokens(request_params),
+                lambda: self.client.chat.completions.create(**request_params)
+            )
+
+            watcher = StreamAbortWatcher(abort_signal, stream.close, label=self.client_key).start()
+            try:
+                async for chunk in stream:
+                    if watcher.aborted:
+                        delta = chunk.choices[0].delta if chunk.choices else None
+                        watcher.on_chunk(getattr(delta, "content", None))
+                        break
+                    yield chunk.model_dump_json()
+            except Exception:
+                # 中止时底层连接被关闭，读流报错属于预期
+                if not watcher.aborted:
+                    raise
+            finally:
+                await watcher.finish()
 
         except Exception as e:
             logger.error(f"[LLM] 流式聊天请求失败: {str(e)}")
             raise
 
+    def _build_request_params(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = None,
+        temperature: float = None,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_choice: Optional[str] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """构建请求参数，未指定的项使用配置中的默认值"""
+        if max_tokens is None:
+            max_tokens = self.config.get('max_tokens')
+
+        request_params = {
+            "model": model or self.model_name,
+            "messages": messages,
+            "temperature": self.config['temperature'] if temperature is None else temperature,
+            **kwargs
+        }
+
+        if max_tokens:
+            request_params["max_tokens"] = max_tokens
+
+        if tools:
+            request_params["tools"] = tools
+
+        if tool_choice:
+            request_params["tool_choice"] = tool_choice
+
+        return request_params
+
+    @property
+    def supports_batch_api(self) -> bool:
+        # 需要供应商实现 /v1/files + /v1/batches，默认关闭，通过 batch_api 配置开启
+        return bool(self.config.get('batch_api'))
+
+    async def _provider_batch(self, requests: List[Dict[str, Any]],
+                              timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        通过 OpenAI Batch API 提交批量请求
+
+        上传 JSONL -> 创建 batch -> 轮询到完成或超时 -> 按 custom_id 还原顺序。
+        超时（timeout，默认取配置 batch_timeout）会取消 batch 并抛出异常，由 chat_completion_batch 回退为并发请求。
+        """
+        lines = []
+        for index, request in enumerate(requests):
+            request = dict(request)
+            messages = request.pop("messages")
+            body = self._build_request_params(messages, **request)
+            lines.append(json.dumps({
+                "custom_id": f"req-{index}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body,
+            }, ensure_ascii=False))
+
+        batch_file = await self.client.files.create(
+            file=(f"batch_{uuid.uuid4().hex}.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        logger.info(f"[LLM] 已提交 batch {batch.id}，请求数: {len(requests)}")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.config.get('batch_timeout', 600))
+        poll_interval = self.config.get('batch_poll_interval', 5)
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            if loop.time() >= deadline:
+                try:
+                    await self.client.batches.cancel(batch.id)
+                except Exception as e:
+                    logger.warning(f"[LLM] 取消 batch {batch.id} 失败: {e}")
+                raise TimeoutError(f"batch {batch.id} 未在截止时间内完成，状态: {batch.status}")
+            await asyncio.sleep(poll_interval)
+            batch = await self.client.batches.retrieve(batch.id)
+
+        if batch.status != "completed":
+            raise RuntimeError(f"batch {batch.id} 结束状态: {batch.status}")
+
+        results = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await self.client.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                index = int(item["custom_id"].split("-", 1)[1])
+                response = item.get("response") or {}
+                if response.get("status_code") == 200:
+                    results[index] = {"index": index, "success": True, "result": response.get("body"), "error": None}
+                else:
+                    error = item.get("error") or response.get("body") or "unknown error"
+                    results[index] = {"index": index, "success": False, "result": None, "error": str(error)}
+
+        return [
+            results.get(i, {"index": i, "success": False, "result": None, "error": "missing from batch output"})
+            for i in range(len(requests))
+        ]
+
+    def _estimate_request_tokens(self, request_params: Dict[str, Any]) -> int:
+        """估算本次请求占用的 TPM：输入 + 最大输出"""
+        prompt_tokens = estimate_tokens(request_params.get("messages")) + estimate_tokens(request_params.get("tools"))
+        return prompt_tokens + int(request_params.get("max_tokens") or 0)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return httpx_pool_stats(self.client._client)
+
     async def close(self):
         """关闭客户端连接"""
         await self.client.close()
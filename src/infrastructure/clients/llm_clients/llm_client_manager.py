@@ -1,40 +1,112 @@
+import asyncio
 import hashlib
-from typing import Dict
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, AsyncGenerator
 
 import global_statics
 from src.infrastructure.clients.llm_clients.abs_llm_client import AbsLLMClient
 from src.infrastructure.clients.llm_clients.llm_client import OpenAIStyleLLMClient
+from src.infrastructure.clients.llm_clients.sse_llm_client import RawSSELLMClient
+from src.infrastructure.utils.metrics import register_metrics
 
 
 # from src.infrastructure.clients.llm_clients.llm_client import OllamaLLMClient
 
+# provider -> 客户端实现，未列出的 provider 默认走 OpenAI 官方 SDK
+CLIENT_IMPLEMENTATIONS = {
+    "raw_sse": RawSSELLMClient,
+    "openai_raw": RawSSELLMClient,
+}
+
+
+class LLMClientHandle:
+    """
+    LLM 客户端的引用句柄
+
+    持有句柄期间对应 client 不会被回收；对话调用期间额外计入 in-flight，
+    即使句柄已释放（例如 agent 被新 profile 替换），进行中的流式请求也不会被关闭。
+    其余属性透传给底层 client。
+    """
+
+    def __init__(self, manager: "LLMClientManager", client_key: str, client: AbsLLMClient):
+        self._manager = manager
+        self._client_key = client_key
+        self._client = client
+        self._released = False
+
+    @property
+    def client(self) -> AbsLLMClient:
+        return self._client
+
+    def __getattr__(self, item):
+        return getattr(self._client, item)
+
+    async def chat_completion(self, messages: List[Dict[str, str]], **kwargs) -> Dict[str, Any]:
+        with self._manager.in_flight(self._client_key):
+            return await self._client.chat_completion(messages, **kwargs)
+
+    async def chat_completion_stream(self, messages: List[Dict[str, str]], **kwargs) -> AsyncGenerator[Any, None]:
+        with self._manager.in_flight(self._client_key):
+            stream = self._client.chat_completion_stream(messages, **kwargs)
+            try:
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                # 调用方提前退出时显式关闭内层生成器，让 client 立即释放 HTTP 流
+                await stream.aclose()
+
+    async def chat_completion_batch(self, requests: List[Dict[str, Any]], **kwargs) -> List[Dict[str, Any]]:
+        with self._manager.in_flight(self._client_key):
+            return await self._client.chat_completion_batch(requests, **kwargs)
+
+    def release(self):
+        """释放引用，可重复调用"""
+        if self._released:
+            return
+        self._released = True
+        self._manager.release(self._client_key)
+
+    def __enter__(self) -> "LLMClientHandle":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
 
 class LLMClientManager:
     """LLM客户端管理器，管理多个LLM客户端实例"""
 
-    def __init__(self):
+    def __init__(self, idle_timeout: float = 600.0, max_idle_clients: int = 8, sweep_interval: float = 60.0):
         self.clientMap: Dict[str, AbsLLMClient] = {}
         # client会有更多的属性，其实这里的一个client在我的计划里类似于一个agent
         # 通过配置的特征值来区分不同的客户端实例
 
+        # 引用计数 / 进行中请求数 / 最近使用时间（按 LRU 顺序）
+        self._refs: Dict[str, int] = {}
+        self._active: Dict[str, int] = {}
+        self._last_used: "OrderedDict[str, float]" = OrderedDict()
+
+        # 无引用的 client 空闲超过 idle_timeout 后关闭；无引用 client 最多保留 max_idle_clients 个
+        self.idle_timeout = idle_timeout
+        self.max_idle_clients = max_idle_clients
+        self.sweep_interval = sweep_interval
+        self._sweeper: Optional[asyncio.Task] = None
+        self.evicted_total = 0
+
     def _generate_client_key(self, name: str=None, config=None) -> str:
         """根据配置生成唯一的客户端密钥"""
         # 使用配置的关键参数生成哈希值
-        config_str = f"{config.get('openapi_url', '')}_{config.get('model_name', '')}_{config.get('temperature', '')}_{config.get('max_tokens', '')}"
+        config_str = f"{config.get('provider', '')}_{config.get('openapi_url', '')}_{config.get('model_name', '')}_{config.get('temperature', '')}_{config.get('max_tokens', '')}"
         config_hash = hashlib.md5(config_str.encode()).hexdigest()
         return f"{name or 'default'}_{config_hash}"
 
-    def get_client(self, name: str=None, config=None) -> AbsLLMClient:
-        """
-        获取或创建LLM客户端实例
-        
-        Args:
-            name: 客户端名称，用于标识不同的客户端
-            config: LLM配置，如果为None则使用全局配置
-            
-        Returns:
-            LLM客户端实例
-        """
+    def _touch(self, client_key: str):
+        self._last_used[client_key] = time.monotonic()
+        self._last_used.move_to_end(client_key)
+
+    def _get_or_create(self, name: str=None, config=None) -> tuple[str, AbsLLMClient]:
         if config is None:
             config = global_statics.backbone_llm_config
 
@@ -43,7 +115,8 @@ class LLMClientManager:
         provider = config.get("provider")
 
         if client_key not in self.clientMap:
-            self.clientMap[client_key] = OpenAIStyleLLMClient(client_key, config)
+            client_cls = CLIENT_IMPLEMENTATIONS.get(provider, OpenAIStyleLLMClient)
+            self.clientMap[client_key] = client_cls(client_key, config)
             # if provider == "siliconflow":
             #     self.clientMap[client_key] = OpenAIStyleLLMClient(client_key, config)
             # elif provider == "ollama":
@@ -51,14 +124,138 @@ class LLMClientManager:
             # else :
             #     raise NotImplementedError(f"不支持的LLM供应商: {provider}")
 
-        return self.clientMap[client_key]
+        self._touch(client_key)
+        return client_key, self.clientMap[client_key]
+
+    def get_client(self, name: str=None, config=None) -> LLMClientHandle:
+        """
+        获取或创建LLM客户端实例，同 acquire，返回的句柄持有引用
+
+        用完需 release（或 with 语句），否则该 client 不会被空闲回收
+
+        Args:
+            name: 客户端名称，用于标识不同的客户端
+            config: LLM配置，如果为None则使用全局配置
+
+        Returns:
+            LLMClientHandle，可直接当作 client 使用
+        """
+        return self.acquire(name, config)
+
+    def acquire(self, name: str=None, config=None) -> LLMClientHandle:
+        """
+        获取客户端并持有一个引用，用完调用 handle.release()
+
+        Args:
+            name: 客户端名称，用于标识不同的客户端
+            config: LLM配置，如果为None则使用全局配置
+
+        Returns:
+            LLMClientHandle，可直接当作 client 使用
+        """
+        client_key, client = self._get_or_create(name, config)
+        self._refs[client_key] = self._refs.get(client_key, 0) + 1
+        return LLMClientHandle(self, client_key, client)
+
+    def release(self, client_key: str):
+        """归还引用，引用清零后进入空闲回收队列"""
+        refs = self._refs.get(client_key, 0) - 1
+        if refs > 0:
+            self._refs[client_key] = refs
+        else:
+            self._refs.pop(client_key, None)
+        if client_key in self.clientMap:
+            self._touch(client_key)
+
+    @contextmanager
+    def in_flight(self, client_key: str):
+        """标记一次进行中的请求，期间 client 不会被回收"""
+        self._active[client_key] = self._active.get(client_key, 0) + 1
+        try:
+            yield
+        finally:
+            active = self._active.get(client_key, 0) - 1
+            if active > 0:
+                self._active[client_key] = active
+            else:
+                self._active.pop(client_key, None)
+            if client_key in self.clientMap:
+                self._touch(client_key)
+
+    def _is_idle(self, client_key: str) -> bool:
+        return not self._refs.get(client_key) and not self._active.get(client_key)
+
+    async def evict_idle(self) -> int:
+        """关闭空闲超时或超出 LRU 上限的无引用客户端，返回回收数量"""
+        now = time.monotonic()
+        idle_keys = [k for k in self._last_used if k in self.clientMap and self._is_idle(k)]
+        to_evict = [k for k in idle_keys if now - self._last_used[k] >= self.idle_timeout]
+        remaining = [k for k in idle_keys if k not in to_evict]
+        overflow = len(remaining) - self.max_idle_clients
+        if overflow > 0:
+            # _last_used 按最近使用排序，最前面的最久未用
+            to_evict.extend(remaining[:overflow])
+
+        for client_key in to_evict:
+            client = self.clientMap.pop(client_key, None)
+            self._last_used.pop(client_key, None)
+            if client is None:
+                continue
+            try:
+                await client.close()
+            except Exception as e:
+                global_statics.logger.warning(f"LLMClient关闭失败 key={client_key} error={e}")
+        if to_evict:
+            self.evicted_total += len(to_evict)
+            global_statics.logger.info(f"回收空闲LLMClient {len(to_evict)} 个，剩余 {len(self.clientMap)} 个")
+        return len(to_evict)
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                global_statics.logger.warning(f"LLMClient回收失败: {e}")
+
+    def start(self):
+        """启动后台回收任务（需在事件循环内调用）"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    def get_stats(self) -> Dict[str, Any]:
+        clients = {}
+        pool_connections = 0
+        for client_key, client in self.clientMap.items():
+            pool = client.pool_stats()
+            pool_connections += pool.get("connections", 0)
+            clients[client_key] = {
+                "provider": client.provider,
+                "refs": self._refs.get(client_key, 0),
+                "in_flight": self._active.get(client_key, 0),
+                "idle_for": round(time.monotonic() - self._last_used.get(client_key, time.monotonic()), 1),
+                "pool": pool,
+            }
+        return {
+            "live_clients": len(self.clientMap),
+            "pool_connections": pool_connections,
+            "evicted_total": self.evicted_total,
+            "clients": clients,
+        }
 
     async def close_all(self):
         """关闭所有客户端连接"""
+        if self._sweeper and not self._sweeper.done():
+            self._sweeper.cancel()
+        self._sweeper = None
         for client in self.clientMap.values():
             await client.close()
         self.clientMap.clear()
+        self._refs.clear()
+        self._active.clear()
+        self._last_used.clear()
         global_statics.logger.info("所有LLMClient连接已关闭")
 
 
 static_llmClientManager = LLMClientManager()
+register_metrics("llm_clients", static_llmClientManager.get_stats)
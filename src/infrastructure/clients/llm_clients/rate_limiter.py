@@ -0,0 +1,313 @@
+"""
+LLM 供应商限流
+
+同一个 endpoint（openapi_url）下的所有 client 共享一个 ProviderRateLimiter：
+- RPM / TPM 两个令牌桶，TPM 按估算 token 扣减，拿到真实 usage 后再校正
+- 桶不够时排队等待（FIFO），超过截止时间才失败
+- 收到 429 时按 Retry-After 冻结整个 endpoint，避免所有会话一起重试形成风暴
+- 连接失败、超时、408/409/5xx 等瞬时错误带抖动退避重试（SDK 内置重试已关闭，由这里统一处理）
+"""
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import httpx
+import openai
+
+from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.utils.metrics import register_metrics
+
+logger = get_logger()
+
+T = TypeVar("T")
+
+DEFAULT_MAX_WAIT = 30.0
+MAX_BACKOFF = 30.0
+# 瞬时错误的重试次数与退避基数（秒），只影响单个请求，不冻结 endpoint
+MAX_TRANSIENT_RETRIES = 2
+TRANSIENT_BACKOFF = 0.5
+TRANSIENT_STATUS = {408, 409}
+
+
+class RateLimitTimeout(Exception):
+    """排队超过截止时间仍未拿到配额"""
+
+    def __init__(self, key: str, waited: float):
+        super().__init__(f"rate limit queue timeout key={key} waited={waited:.2f}s")
+        self.key = key
+        self.waited = waited
+
+
+class TokenBucket:
+    """令牌桶，capacity 为每分钟配额，按秒匀速回填"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.refill_per_sec = self.capacity / 60.0
+        self.tokens = self.capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_sec)
+            self._updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """返回还需等待的秒数，0 表示当前即可扣减"""
+        self._refill(now)
+        # 单次请求超过桶容量时按满桶处理，否则永远拿不到
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_sec
+
+    def consume(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        """用真实用量校正，delta > 0 表示多扣，< 0 表示归还"""
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class ProviderRateLimiter:
+    """单个 endpoint 的限流器"""
+
+    def __init__(self, key: str, rpm: Optional[int] = None, tpm: Optional[int] = None,
+                 max_wait: float = DEFAULT_MAX_WAIT):
+        self.key = key
+        self.max_wait = max_wait
+        self.rpm_bucket: Optional[TokenBucket] = None
+        self.tpm_bucket: Optional[TokenBucket] = None
+        self.configure(rpm, tpm, max_wait)
+
+        self._lock = asyncio.Lock()
+        self._blocked_until = 0.0
+        self._consecutive_429 = 0
+
+        # 统计
+        self.waiting = 0
+        self.total_requests = 0
+        self.total_wait_time = 0.0
+        self.total_timeouts = 0
+        self.total_429 = 0
+        self.total_transient_retries = 0
+        self.estimated_tokens = 0
+        self.actual_tokens = 0
+
+    def configure(self, rpm: Optional[int], tpm: Optional[int], max_wait: Optional[float] = None):
+        """更新配额，配额未变化时保留桶内状态"""
+        if (rpm or None) != (self.rpm_bucket.capacity if self.rpm_bucket else None):
+            self.rpm_bucket = TokenBucket(rpm) if rpm else None
+        if (tpm or None) != (self.tpm_bucket.capacity if self.tpm_bucket else None):
+            self.tpm_bucket = TokenBucket(tpm) if tpm else None
+        if max_wait is not None:
+            self.max_wait = max_wait
+
+    def _wait_time(self, estimated_tokens: int, now: float) -> float:
+        wait = max(0.0, self._blocked_until - now)
+        if self.rpm_bucket:
+            wait = max(wait, self.rpm_bucket.wait_time(1, now))
+        if self.tpm_bucket:
+            wait = max(wait, self.tpm_bucket.wait_time(estimated_tokens, now))
+        return wait
+
+    async def acquire(self, estimated_tokens: int, deadline: Optional[float] = None) -> float:
+        """
+        排队获取一次请求配额
+
+        Args:
+            estimated_tokens: 本次请求估算的 token 数（prompt + 预期输出）
+            deadline: time.monotonic() 截止时间，None 表示使用 max_wait
+
+        Returns:
+            实际等待的秒数
+        """
+        start = time.monotonic()
+        if deadline is None:
+            deadline = start + self.max_wait
+        self.waiting += 1
+        try:
+            try:
+                await asyncio.wait_for(self._lock.acquire(), timeout=max(0.0, deadline - start))
+            except asyncio.TimeoutError:
+                self.total_timeouts += 1
+                raise RateLimitTimeout(self.key, time.monotonic() - start)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._wait_time(estimated_tokens, now)
+                    if wait <= 0:
+                        break
+                    if now + wait > deadline:
+                        self.total_timeouts += 1
+                        raise RateLimitTimeout(self.key, now - start)
+                    await asyncio.sleep(wait)
+                if self.rpm_bucket:
+                    self.rpm_bucket.consume(1)
+                if self.tpm_bucket:
+                    self.tpm_bucket.consume(estimated_tokens)
+            finally:
+                self._lock.release()
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - start
+        self.total_requests += 1
+        self.total_wait_time += waited
+        self.estimated_tokens += estimated_tokens
+        if waited > 0.5:
+            logger.info(f"[RateLimit] key={self.key} queued {waited:.2f}s")
+        return waited
+
+    def on_rate_limited(self, retry_after: Optional[float]):
+        """收到 429，冻结整个 endpoint 直到 Retry-After 到期"""
+        self.total_429 += 1
+        self._consecutive_429 += 1
+        if not retry_after or retry_after <= 0:
+            retry_after = min(MAX_BACKOFF, 2 ** (self._consecutive_429 - 1))
+        self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        logger.warning(f"[RateLimit] key={self.key} 429 received, blocked for {retry_after:.2f}s")
+
+    def on_success(self):
+        self._consecutive_429 = 0
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """拿到真实 usage 后校正 TPM 桶"""
+        if not actual_tokens:
+            return
+        self.actual_tokens += actual_tokens
+        if self.tpm_bucket:
+            self.tpm_bucket.adjust(actual_tokens - estimated_tokens)
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "rpm": self.rpm_bucket.capacity if self.rpm_bucket else None,
+            "tpm": self.tpm_bucket.capacity if self.tpm_bucket else None,
+            "rpm_available": round(self.rpm_bucket.tokens, 2) if self.rpm_bucket else None,
+            "tpm_available": round(self.tpm_bucket.tokens, 2) if self.tpm_bucket else None,
+            "blocked_for": round(max(0.0, self._blocked_until - now), 3),
+            "waiting": self.waiting,
+            "total_requests": self.total_requests,
+            "avg_wait": round(self.total_wait_time / self.total_requests, 4) if self.total_requests else 0.0,
+            "total_timeouts": self.total_timeouts,
+            "total_429": self.total_429,
+            "total_transient_retries": self.total_transient_retries,
+            "estimated_tokens": self.estimated_tokens,
+            "actual_tokens": self.actual_tokens,
+        }
+
+
+def parse_retry_after(exc: BaseException) -> Optional[float]:
+    """
+    判断异常是否为 429，兼容 openai.APIStatusError 与 httpx.HTTPStatusError
+
+    Returns:
+        None 表示不是 429；否则返回 Retry-After 秒数（未提供时为 0）
+    """
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    if status != 429:
+        return None
+    headers = getattr(response, "headers", None) or {}
+    try:
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            return float(retry_after_ms) / 1000.0
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                reset_at = parsedate_to_datetime(retry_after)
+                return max(0.0, reset_at.timestamp() - time.time())
+    except Exception:
+        pass
+    return 0.0
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """连接失败、超时与 408/409/5xx，重试可能成功（与 OpenAI SDK 默认重试的范围一致）"""
+    if isinstance(exc, (httpx.TransportError, openai.APIConnectionError, asyncio.TimeoutError)):
+        return True
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    return status in TRANSIENT_STATUS or (status is not None and status >= 500)
+
+
+async def call_with_rate_limit(
+        limiter: ProviderRateLimiter,
+        estimated_tokens: int,
+        fn: Callable[[], Awaitable[T]],
+) -> T:
+    """
+    在限流器保护下发起请求，429 时按 Retry-After 排队重试直到截止时间；
+    瞬时错误最多重试 MAX_TRANSIENT_RETRIES 次，指数退避带抖动，同样不超过截止时间
+    """
+    deadline = time.monotonic() + limiter.max_wait
+    transient_retries = 0
+    while True:
+        await limiter.acquire(estimated_tokens, deadline)
+        try:
+            result = await fn()
+            limiter.on_success()
+            return result
+        except Exception as e:
+            retry_after = parse_retry_after(e)
+            if retry_after is not None:
+                limiter.on_rate_limited(retry_after)
+                if time.monotonic() >= deadline:
+                    raise
+                continue
+            if transient_retries >= MAX_TRANSIENT_RETRIES or not is_transient_error(e):
+                raise
+            delay = TRANSIENT_BACKOFF * (2 ** transient_retries) * (0.5 + random.random())
+            if time.monotonic() + delay >= deadline:
+                raise
+            transient_retries += 1
+            limiter.total_transient_retries += 1
+            logger.warning(f"[RateLimit] key={limiter.key} transient error, retry {transient_retries}/"
+                           f"{MAX_TRANSIENT_RETRIES} in {delay:.2f}s: {type(e).__name__}: {e}")
+            await asyncio.sleep(delay)
+
+
+# ========= endpoint 级共享 =========
+
+_limiters: Dict[str, ProviderRateLimiter] = {}
+
+
+def _limiter_key(config: Dict[str, Any]) -> str:
+    rate_limit = config.get("rate_limit") or {}
+    return rate_limit.get("key") or (config.get("openapi_url") or "default").rstrip("/")
+
+
+def get_rate_limiter(config: Dict[str, Any]) -> ProviderRateLimiter:
+    """
+    获取 endpoint 共享的限流器
+
+    配置示例（backbone_llm_config.rate_limit）：
+        {"rpm": 60, "tpm": 100000, "max_wait": 30}
+    未配置 rpm/tpm 时不限流，但仍会处理 429 / Retry-After
+    """
+    rate_limit = config.get("rate_limit") or {}
+    key = _limiter_key(config)
+    rpm = rate_limit.get("rpm")
+    tpm = rate_limit.get("tpm")
+    max_wait = rate_limit.get("max_wait", DEFAULT_MAX_WAIT)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        limiter = ProviderRateLimiter(key, rpm=rpm, tpm=tpm, max_wait=max_wait)
+        _limiters[key] = limiter
+    elif rate_limit:
+        limiter.configure(rpm, tpm, max_wait)
+    return limiter
+
+
+def get_rate_limiter_stats() -> Dict[str, Any]:
+    return {key: limiter.get_stats() for key, limiter in _limiters.items()}
+
+
+register_metrics("llm_rate_limit", get_rate_limiter_stats)
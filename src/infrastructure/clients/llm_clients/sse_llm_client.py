@@ -0,0 +1,211 @@
+"""
+轻量 LLM 客户端，直接用 httpx 读取 OpenAI 兼容接口的 SSE 流
+
+与 OpenAIStyleLLMClient 的区别：不为每个 chunk 构造 pydantic 对象，
+每行 `data:` 只做一次 json.loads，直接 yield dict，适合大量并发流式会话。
+"""
+import json
+from typing import List, Dict, Any, Optional, AsyncGenerator
+
+import httpx
+
+import global_statics
+from global_statics import logger
+from src.infrastructure.clients.llm_clients.abs_llm_client import AbsLLMClient
+from src.infrastructure.clients.llm_clients.rate_limiter import get_rate_limiter, call_with_rate_limit
+from src.infrastructure.clients.llm_clients.stream_abort import StreamAbortWatcher
+from src.infrastructure.utils.http_pool import httpx_pool_stats
+from src.infrastructure.utils.token_estimator import estimate_tokens
+
+
+class RawSSELLMClient(AbsLLMClient):
+    """基于 httpx + 最小 SSE 解析器的 OpenAI 兼容客户端"""
+
+    @property
+    def provider(self) -> str:
+        return self.config.get('provider', 'raw_sse')
+
+    @property
+    def supports_tools(self) -> bool:
+        return True
+
+    def __init__(self, client_key, backbone_llm_config=None):
+        """
+        初始化LLM客户端
+
+        Args:
+            client_key: 客户端唯一标识，用于区分不同的客户端实例
+            backbone_llm_config: Backbone LLM配置，如果为None则使用config中的配置
+        """
+        if backbone_llm_config is None:
+            backbone_llm_config = global_statics.backbone_llm_config
+
+        super().__init__(client_key, backbone_llm_config)
+
+        self.base_url = backbone_llm_config['openapi_url']
+        self.api_key = backbone_llm_config['openapi_key']
+        self.model_name = backbone_llm_config['model_name']
+        self.timeout = backbone_llm_config.get('timeout', 30)
+        self.endpoint = self._resolve_endpoint(self.base_url)
+        # 是否要求服务端在流末尾附带 usage（stream_options.include_usage）
+        self.stream_usage = backbone_llm_config.get('stream_usage', False)
+
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+            },
+        )
+
+        # 同一 endpoint 共享的限流器
+        self.rate_limiter = get_rate_limiter(backbone_llm_config)
+
+        logger.info(f"RawSSELLMClient初始化完成，使用模型: {self.model_name}, endpoint: {self.endpoint}")
+
+    @staticmethod
+    def _resolve_endpoint(base_url: str) -> str:
+        """兼容配置里写 base_url 或完整 chat/completions 地址两种形式"""
+        base_url = base_url.rstrip("/")
+        if base_url.endswith("/chat/completions"):
+            return base_url
+        return f"{base_url}/chat/completions"
+
+    def _build_payload(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = None,
+        temperature: float = None,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_choice: Optional[str] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        payload = {
+            "model": model or self.model_name,
+            "messages": messages,
+            "temperature": self.config['temperature'] if temperature is None else temperature,
+            **kwargs
+        }
+        if max_tokens is None:
+            max_tokens = self.config.get('max_tokens')
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
+        if tools:
+            payload["tools"] = tools
+        if tool_choice:
+            payload["tool_choice"] = tool_choice
+        return payload
+
+    @staticmethod
+    def _estimate_request_tokens(payload: Dict[str, Any]) -> int:
+        """估算本次请求占用的 TPM：输入 + 最大输出"""
+        prompt_tokens = estimate_tokens(payload.get("messages")) + estimate_tokens(payload.get("tools"))
+        return prompt_tokens + int(payload.get("max_tokens") or 0)
+
+    async def chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = None,
+        temperature: float = None,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_choice: Optional[str] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """发送非流式聊天请求，返回与 OpenAI 一致的响应字典"""
+        payload = self._build_payload(messages, model, temperature, max_tokens, tools, tool_choice, **kwargs)
+        try:
+            logger.info(f"[LLM] 发送聊天请求，模型: {payload['model']}, 消息数: {len(messages)}")
+
+            async def _post():
+                resp = await self.client.post(self.endpoint, json=payload)
+                resp.raise_for_status()
+                return resp
+
+            estimated = self._estimate_request_tokens(payload)
+            resp = await call_with_rate_limit(self.rate_limiter, estimated, _post)
+            result = resp.json()
+            # usage 随响应返回，不放在共享的客户端实例上
+            usage = result.get("usage") or {}
+            self.rate_limiter.reconcile(estimated, usage.get("total_tokens"))
+
+            logger.info(f"[LLM] 收到响应，使用token: {usage}")
+            return result
+
+        except Exception as e:
+            logger.error(f"[LLM] 聊天请求失败: {str(e)}")
+            raise
+
+    async def _open_stream(self, payload: Dict[str, Any]) -> httpx.Response:
+        request = self.client.build_request("POST", self.endpoint, json=payload)
+        resp = await self.client.send(request, stream=True)
+        if resp.status_code >= 400:
+            await resp.aread()
+            await resp.aclose()
+            resp.raise_for_status()
+        return resp
+
+    async def chat_completion_stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = None,
+        temperature: float = None,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_choice: Optional[str] = None,
+        **kwargs
+    ) -> AsyncGenerator[Dict[str, Any], Any]:
+        """流式生成，逐个 yield chunk 字典（结构同 ChatCompletionChunk）"""
+        # 管道关闭时触发，用于立即关闭上游 HTTP 流
+        abort_signal = kwargs.pop("abort_signal", None)
+        if abort_signal is not None and abort_signal.is_set():
+            return
+        payload = self._build_payload(messages, model, temperature, max_tokens, tools, tool_choice, **kwargs)
+        payload["stream"] = True
+        if self.stream_usage:
+            payload["stream_options"] = {"include_usage": True}
+
+        try:
+            logger.info(f"[LLM] 发送聊天请求，模型: {payload['model']}, 消息数: {len(messages)}")
+            estimated = self._estimate_request_tokens(payload)
+            resp = await call_with_rate_limit(self.rate_limiter, estimated, lambda: self._open_stream(payload))
+
+            watcher = StreamAbortWatcher(abort_signal, resp.aclose, label=self.client_key).start()
+            try:
+                async for line in resp.aiter_lines():
+                    # SSE: 空行分隔事件，":" 开头为注释/心跳
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if watcher.aborted:
+                        watcher.on_chunk(data)
+                        break
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    if "error" in chunk and not chunk.get("choices"):
+                        raise RuntimeError(f"SSE error: {chunk['error']}")
+                    # 开启 stream_usage 时 usage 在末尾 chunk 中随流返回
+                    usage = chunk.get("usage")
+                    if usage:
+                        self.rate_limiter.reconcile(estimated, usage.get("total_tokens"))
+                    yield chunk
+            except Exception:
+                # 中止时底层连接被关闭，读流报错属于预期
+                if not watcher.aborted:
+                    raise
+            finally:
+                await watcher.finish()
+
+        except Exception as e:
+            logger.error(f"[LLM] 流式聊天请求失败: {str(e)}")
+            raise
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return httpx_pool_stats(self.client)
+
+    async def close(self):
+        """关闭客户端连接"""
+        await self.client.aclose()
+        logger.info("RawSSELLMClient连接已关闭")
@@ -0,0 +1,111 @@
+"""
+流式请求的上游中止
+
+ProcessPipe 关闭（用户打断 / 新消息替换）时设置 AbortSignal，
+LLM client 里的 StreamAbortWatcher 监听到后立即关闭底层 HTTP 响应，
+不必等下一个 chunk 到达、也不依赖 GC 回收流对象。
+
+统计：中止次数、从信号到连接关闭的耗时，以及信号触发后读循环仍读到的 chunk / 估算 token
+（late_*，即关闭生效前已送达的部分；连接关闭后服务端是否继续生成无从统计）。
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.utils.metrics import register_metrics
+from src.infrastructure.utils.token_estimator import estimate_text_tokens
+
+logger = get_logger()
+
+
+class StreamAbortStats:
+    def __init__(self):
+        self.aborted_streams = 0
+        self.late_chunks = 0
+        self.late_tokens = 0
+        self.abort_latency_total = 0.0
+        self.abort_latency_max = 0.0
+
+    def record(self, latency: float, chunks: int, tokens: int):
+        self.aborted_streams += 1
+        self.late_chunks += chunks
+        self.late_tokens += tokens
+        self.abort_latency_total += latency
+        self.abort_latency_max = max(self.abort_latency_max, latency)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "aborted_streams": self.aborted_streams,
+            "late_chunks": self.late_chunks,
+            "late_tokens": self.late_tokens,
+            "avg_abort_ms": round(self.abort_latency_total / self.aborted_streams * 1000, 2)
+            if self.aborted_streams else 0.0,
+            "max_abort_ms": round(self.abort_latency_max * 1000, 2),
+        }
+
+
+_stats = StreamAbortStats()
+
+
+def get_stream_abort_stats() -> Dict[str, Any]:
+    return _stats.get_stats()
+
+
+class StreamAbortWatcher:
+    """
+    监听中止信号，触发后调用 close_fn 关闭底层流
+
+    close_fn 需幂等（httpx Response.aclose / openai AsyncStream.close 均满足），
+    finish() 会在 client 的 finally 中再调用一次，确保任何退出路径都关闭连接。
+    """
+
+    def __init__(self, abort_signal: Optional[asyncio.Event], close_fn: Callable[[], Awaitable[Any]], label: str = ""):
+        self.abort_signal = abort_signal
+        self.close_fn = close_fn
+        self.label = label
+        self.late_chunks = 0
+        self.late_tokens = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def aborted(self) -> bool:
+        return self.abort_signal is not None and self.abort_signal.is_set()
+
+    def start(self):
+        if self.abort_signal is not None:
+            self._task = asyncio.create_task(self._watch())
+        return self
+
+    async def _watch(self):
+        await self.abort_signal.wait()
+        try:
+            await self.close_fn()
+        except Exception as e:
+            logger.debug(f"[LLM] 中止流时关闭连接失败 {self.label}: {e}")
+
+    def on_chunk(self, text: Optional[str]):
+        """记录信号触发后读循环仍读到的 chunk"""
+        if self.aborted:
+            self.late_chunks += 1
+            self.late_tokens += estimate_text_tokens(text or "")
+
+    async def finish(self):
+        """停止监听并关闭流；若因中止结束则记录统计"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        try:
+            await self.close_fn()
+        except Exception as e:
+            logger.debug(f"[LLM] 关闭流失败 {self.label}: {e}")
+        if self.aborted:
+            set_at = getattr(self.abort_signal, "set_at", None)
+            latency = time.monotonic() - set_at if set_at else 0.0
+            _stats.record(latency, self.late_chunks, self.late_tokens)
+            logger.info(
+                f"[LLM] 流已中止 {self.label} reason={getattr(self.abort_signal, 'reason', None)} "
+                f"abort_ms={latency * 1000:.1f} late_chunks={self.late_chunks}"
+            )
+
+
+register_metrics("llm_stream_abort", get_stream_abort_stats)
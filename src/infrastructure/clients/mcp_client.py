@@ -1,11 +1,24 @@
 # agent_core/client/mcp_hub_client.py
 import asyncio
+import hashlib
+import importlib.util
+import inspect
 import json
-from typing import Any, Dict, List, AsyncGenerator, Optional
+import random
+import time
+import uuid
+from typing import Any, Callable, Dict, List, AsyncGenerator, Optional, Tuple
 
 import httpx
 
 from src.agent.abs_agent import IBaseAgent
+from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.utils.http_pool import httpx_pool_stats
+
+logger = get_logger()
+
+# 工具目录变化回调：callback(tools, version)，可为同步或异步函数
+ToolsListener = Callable[[List[Dict[str, Any]], int], Any]
 
 
 class MCPHubClient:
@@ -15,6 +28,23 @@ class MCPHubClient:
     - GET  /mcp_hub/health       -> health()
     - POST /mcp_hub/call         -> call(tool, arguments)  (returns dict)
     - POST /mcp_hub/call_stream  -> call_stream(tool, arguments) (yields chunks)
+    - POST /mcp_hub/call_batch   -> call_tools_batch(calls) (yields results as they complete)
+
+    Tool catalog cache:
+    - fresh for `tools_ttl` seconds
+    - after that, up to `tools_max_stale` seconds, the stale list is returned at once
+      and a single background refresh is started (stale-while-revalidate)
+    - refreshes send If-None-Match; 304 only extends freshness
+    - fetch errors and empty catalogs are cached for `tools_negative_ttl` seconds
+    - listeners registered via add_tools_listener are notified when the catalog changes
+
+    Unary and streaming calls share one pooled httpx client (keep-alive, optional HTTP/2).
+
+    Retries (jittered exponential backoff):
+    - GET: connection errors, timeouts, 429 and 502/503/504
+    - POST (tool calls, approvals): only failures where the hub provably did not run the
+      call -- connect errors, pool timeouts and 503. Every call carries an idempotency key
+      (Idempotency-Key header and "idempotency_key" field) so the hub can deduplicate.
     """
 
     def __init__(
@@ -23,9 +53,34 @@ class MCPHubClient:
         timeout: float = 30.0,
         max_retries: int = 2,
         backoff: float = 0.5,
+        tools_ttl: float = 60.0,
+        tools_max_stale: float = 600.0,
+        tools_negative_ttl: float = 10.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
     ):
         self.base_url = base_url.rstrip("/")
-        self._client = httpx.AsyncClient(timeout=timeout)
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("[MCPHub] http2 requested but 'h2' is not installed, falling back to HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            http2=http2,
+        )
+        self._request_count = 0
+        self._retry_count = 0
+        self._stream_count = 0
+        self._batch_count = 0
+        # None = unknown, False = hub answered 404/405 for /mcp_hub/call_batch
+        self._batch_supported: Optional[bool] = None
         self.timeout = timeout
         self.max_retries = max_retries
         self.backoff = backoff
@@ -33,23 +88,61 @@ class MCPHubClient:
         self._servers_cache: Optional[List[Dict[str, Any]]] = None
         self._lock = asyncio.Lock()
 
+        # tool catalog cache state
+        self.tools_ttl = tools_ttl
+        self.tools_max_stale = max(tools_max_stale, tools_ttl)
+        self.tools_negative_ttl = tools_negative_ttl
+        self._tools_fetched_at = 0.0
+        self._tools_etag: Optional[str] = None
+        self._tools_fingerprint: Optional[str] = None
+        self._tools_version = 0
+        self._tools_error_until = 0.0
+        self._tools_refresh_task: Optional[asyncio.Task] = None
+        self._tools_listeners: List[ToolsListener] = []
+
     # -----------------------
     # helpers
     # -----------------------
-    async def _request_json(self, method: str, path: str, **kwargs) -> Any:
+    # failures after which the request cannot have reached the hub's handler
+    SAFE_RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+    SAFE_RETRY_STATUS = {503}
+    # additionally retried for idempotent (read-only) methods
+    IDEMPOTENT_RETRY_EXCEPTIONS = (httpx.TransportError,)
+    IDEMPOTENT_RETRY_STATUS = {429, 502, 503, 504}
+
+    def _should_retry(self, method: str, exc: Exception) -> bool:
+        idempotent = method.upper() in ("GET", "HEAD", "OPTIONS")
+        if isinstance(exc, httpx.HTTPStatusError):
+            statuses = self.IDEMPOTENT_RETRY_STATUS if idempotent else self.SAFE_RETRY_STATUS
+            return exc.response.status_code in statuses
+        exceptions = self.IDEMPOTENT_RETRY_EXCEPTIONS if idempotent else self.SAFE_RETRY_EXCEPTIONS
+        return isinstance(exc, exceptions)
+
+    def _retry_delay(self, attempt: int) -> float:
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
         url = f"{self.base_url}{path}"
-        last_exc = None
         for attempt in range(self.max_retries + 1):
             try:
+                self._request_count += 1
                 resp = await self._client.request(method, url, **kwargs)
-                resp.raise_for_status()
-                return resp.json()
+                # 304 is a valid answer to a conditional request
+                if resp.status_code != 304:
+                    resp.raise_for_status()
+                return resp
             except Exception as e:
-                last_exc = e
-                if attempt < self.max_retries:
-                    await asyncio.sleep(self.backoff * (2 ** attempt))
-                    continue
-                raise last_exc
+                if attempt >= self.max_retries or not self._should_retry(method, e):
+                    raise
+                delay = self._retry_delay(attempt)
+                self._retry_count += 1
+                logger.warning(f"[MCPHub] {method} {path} failed ({type(e).__name__}), "
+                               f"retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _request_json(self, method: str, path: str, **kwargs) -> Any:
+        resp = await self._request(method, path, **kwargs)
+        return resp.json()
 
     # -----------------------
     # servers / tools / health
@@ -66,18 +159,102 @@ class MCPHubClient:
     async def get_tools(self, use_cache: bool = True) -> List[Dict[str, Any]]:
         """
         Returns the 'tools' list as the hub provides it.
+
+        Never blocks on the network while a cached (even stale) catalog is usable.
         """
-        if use_cache and self._tools_cache is not None:
-            return self._tools_cache
-        data = await self._request_json("GET", "/mcp_hub/tools")
+        if not use_cache:
+            return await self.refresh_tools()
+
+        now = time.monotonic()
+        cached = self._tools_cache
+        if cached is not None:
+            age = now - self._tools_fetched_at
+            ttl = self.tools_ttl if cached else self.tools_negative_ttl
+            if age < ttl or now < self._tools_error_until:
+                return cached
+            if age < self.tools_max_stale:
+                self._schedule_tools_refresh()
+                return cached
+        elif now < self._tools_error_until:
+            return []
+
+        return await self.refresh_tools()
+
+    async def refresh_tools(self) -> List[Dict[str, Any]]:
+        """Fetch the catalog now (joins an in-flight refresh if any)."""
+        await asyncio.shield(self._schedule_tools_refresh())
+        return self._tools_cache if self._tools_cache is not None else []
+
+    @property
+    def tools_version(self) -> int:
+        """Local catalog version, incremented whenever the tool list changes."""
+        return self._tools_version
+
+    def add_tools_listener(self, listener: ToolsListener):
+        """Register a callback invoked as listener(tools, version) when the catalog changes."""
+        if listener not in self._tools_listeners:
+            self._tools_listeners.append(listener)
+
+    def remove_tools_listener(self, listener: ToolsListener):
+        if listener in self._tools_listeners:
+            self._tools_listeners.remove(listener)
+
+    def _schedule_tools_refresh(self) -> asyncio.Task:
+        # single-flight: concurrent callers share one request
+        if self._tools_refresh_task is None or self._tools_refresh_task.done():
+            self._tools_refresh_task = asyncio.create_task(self._refresh_tools())
+        return self._tools_refresh_task
+
+    async def _refresh_tools(self):
+        headers = {}
+        if self._tools_etag and self._tools_cache is not None:
+            headers["If-None-Match"] = self._tools_etag
+        try:
+            resp = await self._request("GET", "/mcp_hub/tools", headers=headers)
+        except Exception as e:
+            self._tools_error_until = time.monotonic() + self.tools_negative_ttl
+            logger.warning(f"[MCPHub] tool catalog refresh failed, retry after {self.tools_negative_ttl}s: {e}")
+            return
+
+        self._tools_fetched_at = time.monotonic()
+        self._tools_error_until = 0.0
+        if resp.status_code == 304:
+            return
+
+        data = resp.json()
+        hub_version = None
         if isinstance(data, dict) and isinstance(data.get("tools"), list):
-            self._tools_cache = data["tools"]
-            return self._tools_cache
-        # some hubs may return list directly
-        if isinstance(data, list):
-            self._tools_cache = data
-            return data
-        return []
+            tools = data["tools"]
+            hub_version = data.get("version")
+        elif isinstance(data, list):
+            # some hubs may return list directly
+            tools = data
+        else:
+            tools = []
+        self._tools_etag = resp.headers.get("ETag")
+
+        if hub_version is not None:
+            fingerprint = f"v:{hub_version}"
+        else:
+            fingerprint = hashlib.sha1(
+                json.dumps(tools, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+            ).hexdigest()
+        changed = fingerprint != self._tools_fingerprint
+        self._tools_cache = tools
+        self._tools_fingerprint = fingerprint
+        if changed:
+            self._tools_version += 1
+            logger.info(f"[MCPHub] tool catalog updated: {len(tools)} tools, version={self._tools_version}")
+            await self._notify_tools_listeners(tools)
+
+    async def _notify_tools_listeners(self, tools: List[Dict[str, Any]]):
+        for listener in list(self._tools_listeners):
+            try:
+                result = listener(tools, self._tools_version)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.warning(f"[MCPHub] tools listener failed: {e}")
 
     async def health(self) -> Dict[str, Any]:
         return await self._request_json("GET", "/mcp_hub/health")
@@ -85,29 +262,50 @@ class MCPHubClient:
     # -----------------------
     # tool call (normal)
     # -----------------------
+    @staticmethod
+    def new_idempotency_key() -> str:
+        return f"call_{uuid.uuid4().hex}"
+
+    @classmethod
+    def _call_payload(
+        cls,
+        tool: str,
+        arguments: Dict[str, Any],
+        call_id: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Build a request body in MCPToolCallRequest format."""
+        key = idempotency_key or call_id or cls.new_idempotency_key()
+        return {
+            "id": call_id or key,
+            "type": "function",
+            "function": {
+                "name": tool,
+                "arguments": arguments
+            },
+            "idempotency_key": key,
+        }
+
     async def call_tool(
         self,
         tool: str,
         arguments: Dict[str, Any],
         timeout: Optional[float] = None,
+        idempotency_key: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
         Synchronous-style tool call (POST /hub/call).
         Returns parsed JSON (dict) from the hub.
+
+        idempotency_key identifies the logical call; pass the same key when
+        re-issuing the same call so the hub can return the first result.
         """
-        # Create payload in MCPToolCallRequest format
-        payload = {
-            "id": f"call_{hash(str(tool) + str(arguments))}",
-            "type": "function",
-            "function": {
-                "name": tool,
-                "arguments": arguments
-            }
-        }
+        payload = self._call_payload(tool, arguments, idempotency_key=idempotency_key)
         # allow override timeout per-call
         if timeout:
             payload["timeout"] = timeout
-        return await self._request_json("POST", "/mcp_hub/call", json=payload)
+        return await self._request_json("POST", "/mcp_hub/call", json=payload,
+                                        headers={"Idempotency-Key": payload["idempotency_key"]})
     
     async def approve_tool(
         self,
@@ -120,11 +318,13 @@ class MCPHubClient:
         Approve tool execution (POST /hub/approve).
         Returns parsed JSON (dict) from the hub.
         """
-        payload = {"tool": tool, "arguments": arguments, "approval_id": approval_id}
+        key = f"approve:{approval_id}"
+        payload = {"tool": tool, "arguments": arguments, "approval_id": approval_id, "idempotency_key": key}
         # allow override timeout per-call
         if timeout:
             payload["timeout"] = timeout
-        return await self._request_json("POST", "/mcp_hub/approve", json=payload)
+        return await self._request_json("POST", "/mcp_hub/approve", json=payload,
+                                        headers={"Idempotency-Key": key})
 
     # -----------------------
     # tool call (stream)
@@ -135,42 +335,128 @@ class MCPHubClient:
         arguments: Dict[str, Any],
         *,
         chunk_timeout: Optional[float] = None,
+        idempotency_key: Optional[str] = None,
     ) -> AsyncGenerator[Any, None]:
         """
         Stream call: POST /hub/call_stream
         Yields each JSON-decoded chunk (or raw line) as produced by hub.
         This function does NOT interpret chunks — it forwards them raw.
+        Streams are never retried. Errors are yielded as {"error": ...}; when the
+        call provably never reached a tool (connect failure, or the hub has no
+        stream endpoint: 404/405) the dict also carries "not_started": True.
         """
         url = f"{self.base_url}/mcp_hub/call_stream"
-        # Create payload in MCPToolCallRequest format
-        payload = {
-            "id": f"call_{hash(str(tool) + str(arguments))}",
-            "type": "function",
-            "function": {
-                "name": tool,
-                "arguments": arguments
-            }
-        }
-        # use a fresh client request so we can iterate response stream
-        async with httpx.AsyncClient(timeout=self._client.timeout) as client:
+        payload = self._call_payload(tool, arguments, idempotency_key=idempotency_key)
+        # reuse the pooled client so keep-alive connections are shared with unary calls
+        self._stream_count += 1
+        try:
+            # Send request and get streaming response
+            async with self._client.stream("POST", url, json=payload, timeout=chunk_timeout or self.timeout,
+                                           headers={"Idempotency-Key": payload["idempotency_key"]}) as resp:
+                if resp.status_code in (404, 405):
+                    yield {"error": f"stream endpoint unavailable: HTTP {resp.status_code}", "not_started": True}
+                    return
+                resp.raise_for_status()
+                async for raw_line in resp.aiter_lines():
+                    if raw_line is None:
+                        continue
+                    line = raw_line.strip()
+                    if not line:
+                        continue
+                    # try parse json, fallback to raw text
+                    try:
+                        yield json.loads(line)
+                    except Exception:
+                        yield line
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            yield {"error": str(e), "not_started": True}
+        except Exception as e:
+            # stream errors are yielded as an error dict for consumer convenience
+            yield {"error": str(e)}
+
+    # -----------------------
+    # tool call (batch)
+    # -----------------------
+    async def call_tools_batch(
+        self,
+        calls: List[Dict[str, Any]],
+        timeout: Optional[float] = None,
+    ) -> AsyncGenerator[Tuple[int, Dict[str, Any]], None]:
+        """
+        Batch call: POST /mcp_hub/call_batch
+
+        calls: [{"tool": name, "arguments": {...}, "id": optional call id,
+                 "idempotency_key": optional key}, ...]
+
+        Contract:
+            request:  {"calls": [MCPToolCallRequest, ...], "timeout": optional}
+            response: NDJSON, one line per finished call, in completion order
+                      {"index": <position in calls>, "id": <call id>, "result": <same as /mcp_hub/call>}
+                      a failed call may carry {"index", "id", "error"} instead of "result"
+
+        Yields (index, result) as each call completes. Hubs without the endpoint
+        (404/405) are remembered and served by concurrent /mcp_hub/call requests.
+        Other failures are reported per call (marked with "hub_error") and never
+        re-sent, since the hub may already have executed them.
+        """
+        payloads = [
+            self._call_payload(c["tool"], c.get("arguments") or {}, c.get("id"), c.get("idempotency_key"))
+            for c in calls
+        ]
+        if self._batch_supported is not False:
+            body: Dict[str, Any] = {"calls": payloads}
+            if timeout:
+                body["timeout"] = timeout
+            seen = set()
+            unsupported = False
+            self._batch_count += 1
             try:
-                # Send request and get streaming response
-                async with client.stream("POST", url, json=payload, timeout=chunk_timeout or self.timeout) as resp:
-                    resp.raise_for_status()
-                    async for raw_line in resp.aiter_lines():
-                        if raw_line is None:
-                            continue
-                        line = raw_line.strip()
-                        if not line:
-                            continue
-                        # try parse json, fallback to raw text
-                        try:
-                            yield json.loads(line)
-                        except Exception:
-                            yield line
+                async with self._client.stream("POST", f"{self.base_url}/mcp_hub/call_batch", json=body,
+                                               timeout=timeout or self.timeout) as resp:
+                    if resp.status_code in (404, 405):
+                        unsupported = True
+                    else:
+                        resp.raise_for_status()
+                        self._batch_supported = True
+                        async for raw_line in resp.aiter_lines():
+                            line = raw_line.strip() if raw_line else ""
+                            if not line:
+                                continue
+                            item = json.loads(line)
+                            index = item.get("index")
+                            if not isinstance(index, int) or index in seen or not 0 <= index < len(calls):
+                                continue
+                            seen.add(index)
+                            result = item.get("result")
+                            if result is None:
+                                result = {"success": False, "error": item.get("error") or "empty result"}
+                            yield index, result
+            except Exception as e:
+                logger.warning(f"[MCPHub] batch call failed after {len(seen)}/{len(calls)} results: {e}")
+                for index in range(len(calls)):
+                    if index not in seen:
+                        seen.add(index)
+                        yield index, {"success": False, "error": str(e), "hub_error": True}
+                return
+
+            if not unsupported:
+                for index in range(len(calls)):
+                    if index not in seen:
+                        yield index, {"success": False, "error": "missing from batch response"}
+                return
+            self._batch_supported = False
+            logger.info("[MCPHub] hub has no /mcp_hub/call_batch, using concurrent calls")
+
+        async def _one(index: int, payload: Dict[str, Any]):
+            try:
+                result = await self.call_tool(payload["function"]["name"], payload["function"]["arguments"],
+                                              timeout=timeout, idempotency_key=payload["idempotency_key"])
             except Exception as e:
-                # stream errors are yielded as an error dict for consumer convenience
-                yield {"error": str(e)}
+                result = {"success": False, "error": str(e), "hub_error": True}
+            return index, result
+
+        for fut in asyncio.as_completed([_one(i, p) for i, p in enumerate(payloads)]):
+            yield await fut
 
     # -----------------------
     # utilities
@@ -179,8 +465,30 @@ class MCPHubClient:
         async with self._lock:
             self._tools_cache = None
             self._servers_cache = None
+            self._tools_fetched_at = 0.0
+            self._tools_etag = None
+            self._tools_error_until = 0.0
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return httpx_pool_stats(self._client)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "pool": self.pool_stats(),
+            "requests": self._request_count,
+            "retries": self._retry_count,
+            "stream_requests": self._stream_count,
+            "batch_requests": self._batch_count,
+            "batch_supported": self._batch_supported,
+            "tools_version": self._tools_version,
+            "tools_cached": len(self._tools_cache) if self._tools_cache is not None else None,
+            "tools_age": round(time.monotonic() - self._tools_fetched_at, 1) if self._tools_fetched_at else None,
+        }
 
     async def close(self):
+        if self._tools_refresh_task and not self._tools_refresh_task.done():
+            self._tools_refresh_task.cancel()
         await self._client.aclose()
 
     # Context manager support
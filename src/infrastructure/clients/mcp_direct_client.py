@@ -0,0 +1,509 @@
+"""
+直连 MCP server 的客户端，绕过 MCP hub 这一跳
+
+支持两种传输：
+- streamable HTTP：JSON-RPC over POST，响应为 application/json 或 text/event-stream，
+  会话通过 Mcp-Session-Id 头维持，所有 HTTP server 共用一个 httpx 连接池
+- stdio：启动子进程，按行收发 JSON-RPC，请求按 id 复用同一进程
+
+配置沿用 config/mcp_servers.json，只有标记 "direct": true 的 server 走直连：
+    {"name": "terminal-user", "endpoint": "http://localhost:8001/mcp", "direct": true, "timeout": 30}
+    {"name": "files", "command": "python", "args": ["files_server.py"], "env": {}, "direct": true}
+
+直连不经过 hub 的安全审批，只应对可信 server 开启。
+"""
+import asyncio
+import itertools
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.utils.http_pool import httpx_pool_stats
+
+logger = get_logger()
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+
+PROTOCOL_VERSION = "2025-03-26"
+CLIENT_INFO = {"name": "agent-core", "version": "1.0"}
+
+
+class MCPTransportError(Exception):
+    """与 server 的连接或协议层错误，调用方可回退到 hub"""
+
+
+class MCPRemoteError(Exception):
+    """server 返回的 JSON-RPC error"""
+
+    def __init__(self, error: Dict[str, Any]):
+        super().__init__(error.get("message", "MCP error"))
+        self.code = error.get("code")
+        self.data = error.get("data")
+
+
+class _Session(ABC):
+    """单个 server 的 MCP 会话，子类实现具体传输"""
+
+    def __init__(self, name: str, timeout: float):
+        self.name = name
+        self.timeout = timeout
+        self._ids = itertools.count(1)
+        self._init_lock = asyncio.Lock()
+        self.initialized = False
+        self.server_info: Dict[str, Any] = {}
+        self.calls = 0
+        self.errors = 0
+
+    @abstractmethod
+    async def _rpc(self, method: str, params: Optional[Dict[str, Any]], timeout: float) -> Any:
+        """发送请求并返回 result，连接/协议错误抛出 MCPTransportError"""
+        pass
+
+    @abstractmethod
+    async def _notify(self, method: str, params: Optional[Dict[str, Any]] = None):
+        """发送通知（无响应）"""
+        pass
+
+    async def _open(self):
+        pass
+
+    async def ensure_initialized(self):
+        if self.initialized:
+            return
+        async with self._init_lock:
+            if self.initialized:
+                return
+            await self._open()
+            result = await self._rpc("initialize", {
+                "protocolVersion": PROTOCOL_VERSION,
+                "capabilities": {},
+                "clientInfo": CLIENT_INFO,
+            }, self.timeout)
+            self.server_info = (result or {}).get("serverInfo") or {}
+            await self._notify("notifications/initialized")
+            self.initialized = True
+            logger.info(f"[MCPDirect] {self.name} 已连接: {self.server_info.get('name', '')}")
+
+    async def request(self, method: str, params: Optional[Dict[str, Any]] = None,
+                      timeout: Optional[float] = None) -> Any:
+        await self.ensure_initialized()
+        self.calls += 1
+        try:
+            return await self._rpc(method, params, timeout or self.timeout)
+        except MCPTransportError:
+            self.errors += 1
+            # 下次调用重新握手
+            self.initialized = False
+            raise
+
+    async def list_tools(self) -> List[Dict[str, Any]]:
+        tools: List[Dict[str, Any]] = []
+        cursor = None
+        while True:
+            result = await self.request("tools/list", {"cursor": cursor} if cursor else {})
+            tools.extend((result or {}).get("tools") or [])
+            cursor = (result or {}).get("nextCursor")
+            if not cursor:
+                return tools
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        return await self.request("tools/call", {"name": name, "arguments": arguments or {}}, timeout)
+
+    async def close(self):
+        self.initialized = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"initialized": self.initialized, "calls": self.calls, "errors": self.errors}
+
+
+class StreamableHTTPSession(_Session):
+    def __init__(self, name: str, endpoint: str, client: httpx.AsyncClient, timeout: float,
+                 headers: Optional[Dict[str, str]] = None):
+        super().__init__(name, timeout)
+        self.endpoint = endpoint
+        self._client = client
+        self._headers = headers or {}
+        self._session_id: Optional[str] = None
+
+    def _request_headers(self) -> Dict[str, str]:
+        headers = {
+            "Accept": "application/json, text/event-stream",
+            "Content-Type": "application/json",
+            **self._headers,
+        }
+        if self._session_id:
+            headers["Mcp-Session-Id"] = self._session_id
+        if self.initialized:
+            headers["MCP-Protocol-Version"] = PROTOCOL_VERSION
+        return headers
+
+    async def _post(self, message: Dict[str, Any], timeout: float) -> httpx.Response:
+        try:
+            return await self._client.post(self.endpoint, json=message, headers=self._request_headers(),
+                                           timeout=timeout)
+        except (httpx.ReadTimeout, httpx.WriteTimeout) as e:
+            # 请求可能已被 server 执行，按超时处理，不回退到 hub 重复执行
+            raise asyncio.TimeoutError(f"{self.name}: {type(e).__name__}") from e
+        except httpx.HTTPError as e:
+            raise MCPTransportError(f"{self.name}: {type(e).__name__}: {e}") from e
+
+    async def _open(self):
+        self._session_id = None
+
+    async def _rpc(self, method: str, params: Optional[Dict[str, Any]], timeout: float) -> Any:
+        request_id = next(self._ids)
+        message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+        if params is not None:
+            message["params"] = params
+        resp = await self._post(message, timeout)
+        if resp.status_code == 404 and self._session_id:
+            # 会话已在 server 侧失效
+            raise MCPTransportError(f"{self.name}: session expired")
+        if resp.status_code >= 400:
+            raise MCPTransportError(f"{self.name}: HTTP {resp.status_code}")
+        session_id = resp.headers.get("Mcp-Session-Id")
+        if session_id:
+            self._session_id = session_id
+
+        content_type = resp.headers.get("Content-Type", "")
+        if content_type.startswith("text/event-stream"):
+            response = self._find_sse_response(resp.text, request_id)
+        else:
+            try:
+                data = resp.json()
+            except ValueError as e:
+                raise MCPTransportError(f"{self.name}: invalid JSON response") from e
+            items = data if isinstance(data, list) else [data]
+            response = next((item for item in items if isinstance(item, dict) and item.get("id") == request_id), None)
+        if response is None:
+            raise MCPTransportError(f"{self.name}: no response for {method}")
+        if "error" in response:
+            raise MCPRemoteError(response["error"])
+        return response.get("result")
+
+    @staticmethod
+    def _find_sse_response(body: str, request_id: int) -> Optional[Dict[str, Any]]:
+        for event in body.split("\n\n"):
+            data = "\n".join(line[5:].lstrip() for line in event.splitlines() if line.startswith("data:"))
+            if not data:
+                continue
+            try:
+                message = json.loads(data)
+            except ValueError:
+                continue
+            if isinstance(message, dict) and message.get("id") == request_id:
+                return message
+        return None
+
+    async def _notify(self, method: str, params: Optional[Dict[str, Any]] = None):
+        message = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            message["params"] = params
+        await self._post(message, self.timeout)
+
+    async def close(self):
+        if self._session_id:
+            try:
+                await self._client.delete(self.endpoint, headers=self._request_headers(), timeout=5)
+            except Exception:
+                pass
+            self._session_id = None
+        await super().close()
+
+
+class StdioSession(_Session):
+    def __init__(self, name: str, command: str, args: Optional[List[str]] = None,
+                 env: Optional[Dict[str, str]] = None, cwd: Optional[str] = None, timeout: float = 30.0):
+        super().__init__(name, timeout)
+        self.command = command
+        self.args = args or []
+        self.env = env or {}
+        self.cwd = cwd
+        self._proc: Optional[asyncio.subprocess.Process] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._write_lock = asyncio.Lock()
+
+    async def _open(self):
+        await self._terminate()
+        try:
+            self._proc = await asyncio.create_subprocess_exec(
+                self.command, *self.args,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+                env={**os.environ, **self.env},
+                cwd=self.cwd,
+                limit=16 * 1024 * 1024,
+            )
+        except OSError as e:
+            raise MCPTransportError(f"{self.name}: failed to start {self.command}: {e}") from e
+        self._reader = asyncio.create_task(self._read_loop(self._proc))
+
+    async def _read_loop(self, proc: asyncio.subprocess.Process):
+        try:
+            while True:
+                line = await proc.stdout.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(message, dict):
+                    continue
+                fut = self._pending.pop(message.get("id"), None) if "id" in message else None
+                if fut and not fut.done():
+                    fut.set_result(message)
+        finally:
+            for fut in self._pending.values():
+                if not fut.done():
+                    fut.set_exception(MCPTransportError(f"{self.name}: process exited"))
+            self._pending.clear()
+            self.initialized = False
+
+    async def _send(self, message: Dict[str, Any]):
+        if not self._proc or self._proc.returncode is not None:
+            raise MCPTransportError(f"{self.name}: process not running")
+        data = json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n"
+        try:
+            async with self._write_lock:
+                self._proc.stdin.write(data)
+                await self._proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            raise MCPTransportError(f"{self.name}: {e}") from e
+
+    async def _rpc(self, method: str, params: Optional[Dict[str, Any]], timeout: float) -> Any:
+        request_id = next(self._ids)
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = fut
+        message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+        if params is not None:
+            message["params"] = params
+        try:
+            await self._send(message)
+            response = await asyncio.wait_for(fut, timeout=timeout)
+        finally:
+            self._pending.pop(request_id, None)
+        if "error" in response:
+            raise MCPRemoteError(response["error"])
+        return response.get("result")
+
+    async def _notify(self, method: str, params: Optional[Dict[str, Any]] = None):
+        message = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            message["params"] = params
+        await self._send(message)
+
+    async def _terminate(self):
+        proc, self._proc = self._proc, None
+        if proc and proc.returncode is None:
+            try:
+                proc.stdin.close()
+                await asyncio.wait_for(proc.wait(), timeout=2)
+            except Exception:
+                proc.kill()
+        if self._reader:
+            self._reader.cancel()
+            self._reader = None
+
+    async def close(self):
+        await self._terminate()
+        await super().close()
+
+
+class MCPDirectClient:
+    """
+    直连多个 MCP server：合并工具目录，按工具名路由调用
+
+    工具目录格式与 hub 一致（OpenAI function 格式），额外带 "server" 字段；
+    调用结果转换为 hub 的 {"success", "result": {"data"}} 格式。
+    """
+
+    def __init__(
+        self,
+        servers: List[Dict[str, Any]],
+        timeout: float = 30.0,
+        max_connections: int = 50,
+        max_keepalive_connections: int = 10,
+        tools_ttl: float = 60.0,
+    ):
+        self.timeout = timeout
+        self.tools_ttl = tools_ttl
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+        )
+        self.sessions: Dict[str, _Session] = {}
+        for server in servers:
+            session = self._make_session(server)
+            if session:
+                self.sessions[server["name"]] = session
+        self._tools: List[Dict[str, Any]] = []
+        self._routes: Dict[str, str] = {}
+        self._tools_fetched_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.tools_version = 0
+        # 直连失败、由调用方回退到 hub 的次数
+        self.fallbacks = 0
+
+    def _make_session(self, server: Dict[str, Any]) -> Optional[_Session]:
+        name = server.get("name")
+        timeout = float(server.get("timeout") or self.timeout)
+        if not name:
+            return None
+        if server.get("endpoint") or server.get("url"):
+            return StreamableHTTPSession(name, server.get("endpoint") or server.get("url"), self._client, timeout,
+                                         headers=server.get("headers"))
+        if server.get("command"):
+            return StdioSession(name, server["command"], server.get("args"), server.get("env"),
+                                server.get("cwd"), timeout)
+        logger.warning(f"[MCPDirect] server {name} 既没有 endpoint 也没有 command，跳过")
+        return None
+
+    @classmethod
+    def from_config(cls, path: str, **kwargs) -> "MCPDirectClient":
+        """读取 mcp_servers.json 中 enabled 且 direct 的 server，相对路径按项目根目录解析"""
+        if not os.path.isabs(path):
+            path = str(PROJECT_ROOT / path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"[MCPDirect] 读取 {path} 失败: {e}")
+            config = {}
+        servers = [
+            server for server in config.get("servers") or []
+            if server.get("direct") and server.get("enabled", True)
+        ]
+        return cls(servers, **kwargs)
+
+    # ---------- 工具目录 ----------
+
+    async def start(self):
+        """连接全部 server 并拉取工具目录，单个 server 失败不影响其他 server"""
+        await self.refresh_tools()
+
+    async def refresh_tools(self) -> List[Dict[str, Any]]:
+        async def _list(name: str, session: _Session):
+            try:
+                return name, await session.list_tools()
+            except Exception as e:
+                logger.warning(f"[MCPDirect] {name} 获取工具失败: {e}")
+                return name, None
+
+        results = await asyncio.gather(*[_list(name, session) for name, session in self.sessions.items()])
+        tools: List[Dict[str, Any]] = []
+        routes: Dict[str, str] = {}
+        for name, server_tools in results:
+            if server_tools is None:
+                # 暂时失败的 server 保留旧目录，调用失败时由 hub 兜底
+                server_tools_old = [t for t in self._tools if t.get("server") == name]
+                tools.extend(server_tools_old)
+                routes.update({self.tool_name(t): name for t in server_tools_old})
+                continue
+            for tool in server_tools:
+                tool_name = tool.get("name")
+                if not tool_name or tool_name in routes:
+                    continue
+                routes[tool_name] = name
+                tools.append(self._to_function(tool, name))
+        self._tools_fetched_at = time.monotonic()
+        if routes != self._routes or tools != self._tools:
+            self.tools_version += 1
+        self._tools = tools
+        self._routes = routes
+        return tools
+
+    @staticmethod
+    def tool_name(tool: Dict[str, Any]) -> str:
+        return (tool.get("function") or {}).get("name") or tool.get("name", "")
+
+    @staticmethod
+    def _to_function(tool: Dict[str, Any], server: str) -> Dict[str, Any]:
+        return {
+            "type": "function",
+            "server": server,
+            "function": {
+                "name": tool["name"],
+                "description": tool.get("description", ""),
+                "parameters": tool.get("inputSchema") or {"type": "object", "properties": {}},
+            },
+            "annotations": tool.get("annotations") or {},
+        }
+
+    def get_tools(self) -> List[Dict[str, Any]]:
+        """返回已缓存的目录，过期时在后台刷新"""
+        if self.sessions and time.monotonic() - self._tools_fetched_at >= self.tools_ttl:
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self.refresh_tools())
+        return self._tools
+
+    def has_tool(self, tool_name: str) -> bool:
+        return tool_name in self._routes
+
+    # ---------- 调用 ----------
+
+    @staticmethod
+    def _to_hub_result(result: Dict[str, Any]) -> Dict[str, Any]:
+        parts = []
+        for item in (result or {}).get("content") or []:
+            if item.get("type") == "text":
+                parts.append(item.get("text", ""))
+            elif item.get("type") == "resource":
+                resource = item.get("resource") or {}
+                parts.append(resource.get("text") or resource.get("uri", ""))
+            else:
+                parts.append(f"[{item.get('type')}]")
+        data = "\n".join(parts)
+        if not data and (result or {}).get("structuredContent") is not None:
+            data = json.dumps(result["structuredContent"], ensure_ascii=False)
+        if (result or {}).get("isError"):
+            return {"success": False, "error": data or "tool error", "result": {"data": data}}
+        return {"success": True, "result": {"data": data}}
+
+    async def call_tool(self, tool: str, arguments: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        调用工具，返回 hub 格式结果
+
+        连接/协议层错误抛出 MCPTransportError（调用方可回退到 hub），
+        server 返回的 JSON-RPC error 作为失败结果返回。
+        """
+        server = self._routes.get(tool)
+        if server is None:
+            raise MCPTransportError(f"no direct server for tool {tool}")
+        try:
+            result = await self.sessions[server].call_tool(tool, arguments, timeout)
+        except MCPRemoteError as e:
+            return {"success": False, "error": str(e)}
+        return self._to_hub_result(result)
+
+    # ---------- 其他 ----------
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "servers": {name: session.get_stats() for name, session in self.sessions.items()},
+            "tools": len(self._tools),
+            "tools_version": self.tools_version,
+            "fallbacks": self.fallbacks,
+            "pool": httpx_pool_stats(self._client),
+        }
+
+    async def close(self):
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        for session in self.sessions.values():
+            try:
+                await session.close()
+            except Exception:
+                pass
+        await self._client.aclose()
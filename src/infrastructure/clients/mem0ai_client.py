@@ -4,14 +4,34 @@ from pathlib import Path
 from typing import Dict, Any, List
 
 from mem0 import Memory
+from src.infrastructure.clients.embedding_cache import CachedEmbedder, EmbeddingCache
 from src.infrastructure.logging.logger import get_logger
+from src.infrastructure.utils.bounded_executor import BoundedExecutor
+from src.infrastructure.utils.metrics import register_metrics
 
 logger = get_logger()
 
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+
+# mem0 读写的线程池与截止时间默认值，可在 mem0.json 的 executor 段覆盖
+# 检索（max_workers / max_queue）与写入（add_workers / add_max_queue）各用一个线程池，
+# 慢写入占满线程时不影响检索
+DEFAULT_EXECUTOR_SETTINGS = {
+    "max_workers": 4,
+    "max_queue": 64,
+    "add_workers": 2,
+    "add_max_queue": 64,
+    "search_timeout": 3.0,
+    "add_timeout": 60.0,
+}
+
 
 class MemoryManager:
     """
     基于 mem0 的记忆管理器，提供基础的添加和搜索功能
+
+    mem0 的 embedding 与向量检索都是同步调用，放到专用的有界线程池执行，
+    避免阻塞事件循环；检索与写入分用两个线程池，每次调用带截止时间，排队已满时直接拒绝
     """
 
     def __init__(self, config_path: str | None = None, storage_path: str | None = None):
@@ -22,6 +42,10 @@ class MemoryManager:
             config_path: 配置文件路径，不指定则自动查找
             storage_path: 向量数据库存储路径，不指定则使用配置文件中的路径
         """
+        self._executor_settings = dict(DEFAULT_EXECUTOR_SETTINGS)
+        # mem0.json 的 search_cache 段，由记忆服务用来配置检索结果缓存
+        self.search_cache_settings: Dict[str, Any] = {}
+        self._embedding_cache_settings: Dict[str, Any] = {}
         self._config = self._load_config(config_path)
 
         # 如果指定了存储路径，覆盖配置中的路径
@@ -32,8 +56,43 @@ class MemoryManager:
         storage_dir.mkdir(parents=True, exist_ok=True)
 
         self._memory = Memory.from_config(self._config)
-
-    def add(self, messages: List[Dict[str, str]], user_id: str, metadata: Dict[str, Any] | None = None) -> None:
+        self.embedding_cache = self._install_embedding_cache()
+
+        settings = self._executor_settings
+        self.search_timeout = settings["search_timeout"]
+        self.add_timeout = settings["add_timeout"]
+        self._executor = BoundedExecutor(
+            "mem0",
+            max_workers=int(settings["max_workers"]),
+            max_queue=int(settings["max_queue"]),
+        )
+        self._add_executor = BoundedExecutor(
+            "mem0_add",
+            max_workers=int(settings["add_workers"]),
+            max_queue=int(settings["add_max_queue"]),
+        )
+        register_metrics("mem0_executor", self._executor.get_stats)
+        register_metrics("mem0_add_executor", self._add_executor.get_stats)
+
+    def _install_embedding_cache(self) -> EmbeddingCache | None:
+        """按 mem0.json 的 embedding_cache 段在 embedder 外包一层缓存"""
+        settings = dict(self._embedding_cache_settings)
+        if not settings.pop("enabled", True):
+            return None
+        embedder_config = self._config.get("embedder", {}).get("config", {})
+        model = f'{self._config.get("embedder", {}).get("provider", "")}/{embedder_config.get("model", "")}'
+        dims = embedder_config.get("embedding_dims") or self._config["vector_store"]["config"].get(
+            "embedding_model_dims", 1024)
+        key_by_action = settings.pop("key_by_action", False)
+        # 相对路径按项目根目录解析，不随启动目录变化
+        if settings.get("path") and not os.path.isabs(settings["path"]):
+            settings["path"] = str(PROJECT_ROOT / settings["path"])
+        cache = EmbeddingCache(model, dims, **settings)
+        self._memory.embedding_model = CachedEmbedder(self._memory.embedding_model, cache, key_by_action)
+        register_metrics("embedding_cache", cache.get_stats)
+        return cache
+
+    async def add(self, messages: List[Dict[str, str]], user_id: str, metadata: Dict[str, Any] | None = None) -> None:
         """
         添加记忆
 
@@ -42,7 +101,9 @@ class MemoryManager:
             user_id: 用户ID
             metadata: 可选的元数据
         """
-        self._memory.add(messages, user_id=user_id, metadata=metadata)
+        await self._add_executor.run(
+            self._memory.add, messages, user_id=user_id, metadata=metadata, timeout=self.add_timeout
+        )
         logger.debug(f"memory added: {messages}")
 
     async def search(self, query: str | List[Dict[str, str]], user_id: str, limit: int = 3) -> List[Dict[str, Any]]:
@@ -56,8 +117,40 @@ class MemoryManager:
 
         Returns:
             相关记忆列表
+
+        Raises:
+            asyncio.TimeoutError: 超过 search_timeout
+            ExecutorOverloaded: 排队已满
+        """
+        return await self._executor.run(
+            self._memory.search, query=query, user_id=user_id, limit=limit, timeout=self.search_timeout
+        )
+
+    async def embed(self, text: str) -> List[float]:
+        """
+        计算检索用的 query 向量
+
+        Args:
+            text: 查询文本
+
+        Returns:
+            向量
         """
-        return self._memory.search(query=query, user_id=user_id, limit=limit)
+        def _embed():
+            try:
+                return self._memory.embedding_model.embed(text, "search")
+            except TypeError:
+                # 旧版本 mem0 的 embed 只接受文本
+                return self._memory.embedding_model.embed(text)
+
+        return await self._executor.run(_embed, timeout=self.search_timeout)
+
+    def close(self):
+        """关闭线程池（不等待执行中的调用）与 embedding 缓存"""
+        self._executor.shutdown(wait=False)
+        self._add_executor.shutdown(wait=False)
+        if self.embedding_cache is not None:
+            self.embedding_cache.close()
 
     def _load_config(self, config_path: str | None) -> Dict[str, Any]:
         """加载配置文件"""
@@ -77,6 +170,9 @@ class MemoryManager:
                 if path.exists():
                     with open(path, "r", encoding="utf-8") as f:
                         config_data = json.load(f)
+                    self._executor_settings.update(config_data.pop("executor", None) or {})
+                    self.search_cache_settings = config_data.pop("search_cache", None) or {}
+                    self._embedding_cache_settings = config_data.pop("embedding_cache", None) or {}
                     return self._normalize_config(config_data)
             except Exception:
                 continue
@@ -156,7 +252,7 @@ class MemoryManager:
 
 
 # 使用示例
-if __name__ == '__main__':
+async def _example():
     import time
 
     # 初始化管理器
@@ -172,7 +268,7 @@ if __name__ == '__main__':
     ]
 
     start = time.time()
-    manager.add(messages, user_id="john", metadata={"category": "food"})
+    await manager.add(messages, user_id="john", metadata={"category": "food"})
     print(f"添加耗时: {time.time() - start:.3f}s")
 
     # 搜索记忆
@@ -180,8 +276,15 @@ if __name__ == '__main__':
     query = "What are my food preferences?"
 
     start = time.time()
-    results = manager.search(query, user_id="john", limit=3)
+    results = await manager.search(query, user_id="john", limit=3)
     print(f"搜索耗时: {time.time() - start:.3f}s")
 
     print("\n搜索结果:")
     print(json.dumps(results, ensure_ascii=False, indent=2))
+    manager.close()
+
+
+if __name__ == '__main__':
+    import asyncio
+
+    asyncio.run(_example())
@@ -1,23 +1,148 @@
 import asyncio
+import itertools
 import json
+import uuid
 import websockets
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import logging
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 
+class PEConnectionError(ConnectionError):
+    """连接断开，等待中的请求失败"""
+
+
+class _PEConnection:
+    """
+    单条 WebSocket 连接上的多路复用
+
+    发送不加锁等待响应；由一个读取任务按 request_id 把响应分发给等待中的 future。
+    连接断开时所有等待中的请求以 PEConnectionError 失败。
+    """
+
+    def __init__(self, uri: str, index: int):
+        self.uri = uri
+        self.index = index
+        self.websocket = None
+        self._reader: Optional[asyncio.Task] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._send_lock = asyncio.Lock()
+        self._connection_start_time = None
+        self.unmatched = 0
+
+    @property
+    def is_connected(self) -> bool:
+        return self.websocket is not None and self._reader is not None and not self._reader.done()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    async def connect(self):
+        self.websocket = await websockets.connect(self.uri)
+        self._connection_start_time = datetime.now()
+        self._reader = asyncio.create_task(self._read_loop(self.websocket))
+        logger.info(f"WebSocket连接已建立 #{self.index}")
+
+    async def _read_loop(self, websocket):
+        error: Exception = PEConnectionError("WebSocket连接已关闭")
+        try:
+            async for raw in websocket:
+                try:
+                    resp = json.loads(raw)
+                except json.JSONDecodeError:
+                    self.unmatched += 1
+                    logger.warning(f"PE返回无效的JSON响应 #{self.index}")
+                    continue
+                fut = self._pending.pop(resp.get("request_id"), None) if isinstance(resp, dict) else None
+                if fut is None:
+                    self.unmatched += 1
+                    logger.warning(f"PE响应找不到对应请求 #{self.index}: request_id={resp.get('request_id') if isinstance(resp, dict) else None}")
+                    continue
+                if not fut.done():
+                    fut.set_result(resp)
+        except websockets.exceptions.WebSocketException as e:
+            error = PEConnectionError(f"WebSocket通信错误: {e}")
+        except asyncio.CancelledError:
+            error = PEConnectionError("WebSocket连接已关闭")
+            raise
+        finally:
+            self._fail_pending(error)
+
+    def _fail_pending(self, error: Exception):
+        pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_exception(error)
+
+    async def request(self, req: Dict[str, Any], timeout: Optional[float]) -> Dict[str, Any]:
+        if not self.is_connected:
+            raise PEConnectionError("WebSocket未连接")
+        request_id = req["request_id"]
+        if request_id in self._pending:
+            raise ValueError(f"重复的request_id: {request_id}")
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = fut
+        try:
+            try:
+                async with self._send_lock:
+                    await self.websocket.send(json.dumps(req))
+            except websockets.exceptions.WebSocketException as e:
+                raise PEConnectionError(f"WebSocket通信错误: {e}") from e
+            return await asyncio.wait_for(fut, timeout=timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def close(self):
+        websocket, self.websocket = self.websocket, None
+        if websocket is not None:
+            try:
+                await websocket.close()
+            except Exception as e:
+                logger.warning(f"关闭WebSocket时错误: {e}")
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._reader = None
+        self._fail_pending(PEConnectionError("WebSocket连接已关闭"))
+
+
 class PEClient:
-    def __init__(self, pe_url: str, auto_reconnect: bool = True, max_reconnect_attempts: int = 3):
+    """
+    PE 服务客户端
+
+    多个请求可并发共用连接：请求带唯一 request_id，响应由读取任务按 request_id 分发。
+    pool_size > 1 时维护多条连接，新请求发往等待中请求最少的连接。
+    连接断开时其上等待中的请求立即失败；开启 auto_reconnect 时重连后重试一次。
+    """
+
+    def __init__(
+        self,
+        pe_url: str,
+        auto_reconnect: bool = True,
+        max_reconnect_attempts: int = 3,
+        pool_size: int = 1,
+        request_timeout: Optional[float] = 30.0,
+        reconnect_backoff: float = 0.5,
+    ):
         self.pe_url = pe_url
-        self.websocket = None
-        self._connected = False
-        self._connect_lock = asyncio.Lock()
         self._auto_reconnect = auto_reconnect
         self._max_reconnect_attempts = max_reconnect_attempts
-        self._reconnect_attempts = 0
-        self._connection_start_time = None
+        self._reconnect_backoff = reconnect_backoff
+        self.request_timeout = request_timeout
+        uri = f"{self.pe_url}/ws/build_prompt"
+        self._connections: List[_PEConnection] = [_PEConnection(uri, i) for i in range(max(1, pool_size))]
+        self._connect_locks = [asyncio.Lock() for _ in self._connections]
+        self._ids = itertools.count(1)
+        self._instance_id = uuid.uuid4().hex[:8]
+        self.requests = 0
+        self.reconnects = 0
+        self.failures = 0
 
     async def __aenter__(self):
         await self.connect()
@@ -28,72 +153,77 @@ class PEClient:
 
     @property
     def is_connected(self) -> bool:
-        return self._connected and self.websocket is not None
+        return any(conn.is_connected for conn in self._connections)
 
-    async def connect(self):
-        if self.is_connected:
+    async def _connect_one(self, index: int):
+        conn = self._connections[index]
+        if conn.is_connected:
             return
-
-        async with self._connect_lock:
-            if self.is_connected:
+        async with self._connect_locks[index]:
+            if conn.is_connected:
                 return
-
+            await conn.close()
             try:
-                uri = f"{self.pe_url}/ws/build_prompt"
-                self.websocket = await websockets.connect(uri)
-                self._connected = True
-                self._connection_start_time = datetime.now()
-                self._reconnect_attempts = 0
-                logger.info("WebSocket连接已建立")
+                await conn.connect()
             except Exception as e:
-                self._connected = False
-                self.websocket = None
-                logger.error(f"WebSocket连接失败: {e}")
+                logger.error(f"WebSocket连接失败 #{index}: {e}")
                 raise
 
+    async def connect(self):
+        """建立连接池中的全部连接，至少一条成功即可"""
+        results = await asyncio.gather(
+            *[self._connect_one(i) for i in range(len(self._connections))], return_exceptions=True
+        )
+        if not self.is_connected:
+            raise next(r for r in results if isinstance(r, Exception))
+
     async def ensure_connected(self):
         if not self.is_connected:
             await self.connect()
 
-    async def _try_reconnect(self) -> bool:
-        if not self._auto_reconnect:
-            return False
-
-        if self._reconnect_attempts >= self._max_reconnect_attempts:
-            return False
-
-        self._reconnect_attempts += 1
-        logger.warning(f"尝试重连({self._reconnect_attempts}/{self._max_reconnect_attempts})")
+    async def _reconnect(self, index: int):
+        """带退避的重连，失败次数达到上限后抛出最后一次的异常"""
+        last_exc: Optional[Exception] = None
+        for attempt in range(self._max_reconnect_attempts):
+            logger.warning(f"尝试重连 #{index} ({attempt + 1}/{self._max_reconnect_attempts})")
+            try:
+                await self._connect_one(index)
+                self.reconnects += 1
+                return
+            except Exception as e:
+                last_exc = e
+                await asyncio.sleep(self._reconnect_backoff * (2 ** attempt))
+        raise PEConnectionError(f"重连失败: {last_exc}")
 
-        try:
+    async def _pick(self) -> _PEConnection:
+        """选择等待中请求最少的可用连接，没有可用连接时重连"""
+        live = [conn for conn in self._connections if conn.is_connected]
+        if live:
+            return min(live, key=lambda conn: conn.in_flight)
+        if not self._auto_reconnect:
             await self.connect()
-            return True
-        except Exception:
-            return False
+        else:
+            await self._reconnect(0)
+        return self._connections[0]
 
     async def close(self):
-        if self.is_connected:
-            try:
-                await self.websocket.close()
-            except Exception as e:
-                logger.warning(f"关闭WebSocket时错误: {e}")
-            finally:
-                self.websocket = None
-                self._connected = False
-                logger.info("WebSocket连接已关闭")
+        await asyncio.gather(*[conn.close() for conn in self._connections])
+        logger.info("WebSocket连接已关闭")
+
+    def new_request_id(self) -> str:
+        return f"pe_{self._instance_id}_{next(self._ids)}"
 
     async def build_prompt(
             self,
             session_id: str,
             user_query: str,
             request_id: Optional[str] = None,
-            stream: bool = False
+            stream: bool = False,
+            timeout: Optional[float] = None,
     ) -> Dict[str, Any]:
 
-        await self.ensure_connected()
-
         if request_id is None:
-            request_id = f"pe_request_{asyncio.current_task().get_name()}"
+            request_id = self.new_request_id()
 
         req = {
             "type": "build_prompt",
@@ -103,24 +233,39 @@ class PEClient:
                      "stream": stream}
         }
 
+        self.requests += 1
+        conn = await self._pick()
         try:
-            await self.websocket.send(json.dumps(req))
-            resp_raw = await self.websocket.recv()
-            resp = json.loads(resp_raw)
-
-            if resp.get("status") == "success":
-                return resp.get("data", {})
-            else:
-                raise ValueError(f"PE请求失败: {resp.get('error')}")
-
-        except websockets.exceptions.WebSocketException as e:
-            logger.error(f"WebSocket通信错误: {e}")
-            self._connected = False
-
-            if await self._try_reconnect():
-                return await self.build_prompt(session_id, user_query, request_id, stream)
-            else:
+            resp = await conn.request(req, timeout or self.request_timeout)
+        except PEConnectionError as e:
+            logger.error(f"WebSocket通信错误 #{conn.index}: {e}")
+            if not self._auto_reconnect:
+                self.failures += 1
                 raise
+            # 连接断开时请求未必送达，build_prompt 无副作用，重连后重试一次
+            try:
+                await self._reconnect(conn.index)
+                resp = await self._connections[conn.index].request(req, timeout or self.request_timeout)
+            except Exception:
+                self.failures += 1
+                raise
+        except asyncio.TimeoutError:
+            self.failures += 1
+            logger.warning(f"PE请求超时 request_id={request_id}")
+            raise
+
+        if resp.get("status") == "success":
+            return resp.get("data", {})
+        else:
+            raise ValueError(f"PE请求失败: {resp.get('error')}")
 
-        except json.JSONDecodeError:
-            raise ValueError("无效的JSON响应")
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "pool_size": len(self._connections),
+            "connected": sum(1 for conn in self._connections if conn.is_connected),
+            "in_flight": sum(conn.in_flight for conn in self._connections),
+            "requests": self.requests,
+            "reconnects": self.reconnects,
+            "failures": self.failures,
+            "unmatched_responses": sum(conn.unmatched for conn in self._connections),
+        }
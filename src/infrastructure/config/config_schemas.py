@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field, HttpUrl
 
@@ -12,21 +12,86 @@ class ServerConfig(BaseModel):
     timeout_keep_alive: int = Field(default=5, ge=1)
 
 
+class RateLimitConfig(BaseModel):
+    rpm: Optional[int] = Field(default=None, ge=1)
+    tpm: Optional[int] = Field(default=None, ge=1)
+    max_wait: float = Field(default=30.0, ge=0)
+    key: Optional[str] = None
+
+
 class BackboneLLMConfig(BaseModel):
+    provider: Optional[str] = None
     openapi_url: str = "https://api.openai.com/v1"
     openapi_key: Optional[str] = ""
     model_name: str = "tts-1"
     temperature: float = 0.7
     max_tokens: int = 1024
+    stream_usage: bool = False
+    batch_api: bool = False
+    batch_timeout: float = Field(default=600.0, gt=0)
+    batch_poll_interval: float = Field(default=5.0, gt=0)
+    rate_limit: Optional[RateLimitConfig] = None
 
 
 class SimpleURLConfig(BaseModel):
     url: str
 
 
+class ToolPolicyConfig(BaseModel):
+    timeout: Optional[float] = Field(default=None, gt=0)
+    max_in_flight: Optional[int] = Field(default=None, ge=1)
+    failure_threshold: Optional[int] = Field(default=None, ge=1)
+    recovery_timeout: Optional[float] = Field(default=None, ge=0)
+
+
+class ToolPoliciesConfig(BaseModel):
+    default: ToolPolicyConfig = Field(default_factory=ToolPolicyConfig)
+    tools: Dict[str, ToolPolicyConfig] = Field(default_factory=dict)
+    servers: Dict[str, ToolPolicyConfig] = Field(default_factory=dict)
+
+
+class ApprovalConfig(BaseModel):
+    # 待审批工具调用的有效期（超时自动拒绝）、数量上限，审批结果保留条数与时长
+    ttl: float = Field(default=300.0, gt=0)
+    max_pending: int = Field(default=256, ge=1)
+    max_results: int = Field(default=1024, ge=1)
+    results_ttl: float = Field(default=3600.0, gt=0)
+    # 配置后待审批项持久化到 sqlite，重启后仍可审批
+    db_path: Optional[str] = None
+
+
+class DirectMCPConfig(BaseModel):
+    # 直连 mcp_servers.json 中标记 "direct": true 的 server，hub 作为回退
+    enabled: bool = False
+    servers_config: str = "config/mcp_servers.json"
+    timeout: float = Field(default=30.0, gt=0)
+    max_connections: int = Field(default=50, ge=1)
+
+
 class MCPHubConfig(BaseModel):
     url: str = "http://127.0.0.1"
     port: int = 9000
+    # 工具目录缓存：新鲜期 / 最长可用陈旧期（期间后台刷新）/ 失败与空目录的缓存时间
+    tools_ttl: float = Field(default=60.0, ge=0)
+    tools_max_stale: float = Field(default=600.0, ge=0)
+    tools_negative_ttl: float = Field(default=10.0, ge=0)
+    # 走 call_stream 的工具名（"*" 表示全部），以及单次工具输出写入上下文的最大字符数
+    stream_tools: List[str] = Field(default_factory=list)
+    tool_output_max_chars: int = Field(default=8000, ge=1)
+    # hub 连接池（unary 与流式调用共用）
+    max_connections: int = Field(default=100, ge=1)
+    max_keepalive_connections: int = Field(default=20, ge=0)
+    keepalive_expiry: float = Field(default=30.0, ge=0)
+    http2: bool = False
+    # 并发的相同调用共享一次执行（single-flight）的工具，以及是否自动包含声明 readOnlyHint 的工具
+    shared_tools: List[str] = Field(default_factory=list)
+    share_read_only: bool = True
+    # 按工具 / server 的超时、并发上限与熔断策略
+    tool_policies: ToolPoliciesConfig = Field(default_factory=ToolPoliciesConfig)
+    # 工具审批
+    approval: ApprovalConfig = Field(default_factory=ApprovalConfig)
+    # 直连 MCP server
+    direct: DirectMCPConfig = Field(default_factory=DirectMCPConfig)
 
 
 class CoreConfig(BaseModel):
@@ -0,0 +1,21 @@
+"""
+中止信号：ProcessPipe 关闭（用户打断 / 新消息替换）时设置，下游据此立即停止工作
+"""
+import asyncio
+import time
+from typing import Optional
+
+
+class AbortSignal(asyncio.Event):
+    """记录触发时间和原因的 asyncio.Event"""
+
+    def __init__(self):
+        super().__init__()
+        self.set_at: Optional[float] = None
+        self.reason: Optional[str] = None
+
+    def abort(self, reason: Optional[str] = None):
+        if self.set_at is None:
+            self.set_at = time.monotonic()
+            self.reason = reason
+        self.set()
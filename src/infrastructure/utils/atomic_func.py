@@ -3,6 +3,8 @@ from src.infrastructure.clients.llm_clients.llm_client_manager import static_llm
 
 async def atomic_llm_call(messages, llm_client = None):
     if llm_client is None:
-        llm_client = static_llmClientManager.get_client()
-    result = await llm_client.call(messages)
+        # 持有引用直到调用结束，避免调用期间被空闲回收
+        with static_llmClientManager.acquire() as handle:
+            return await atomic_llm_call(messages, handle)
+    result = await llm_client.chat_completion(messages)
     return result["choices"][0]["message"]["content"]
@@ -0,0 +1,113 @@
+"""
+有界线程池：把阻塞调用移出事件循环，并限制并发与排队长度
+
+- max_workers 个线程执行，最多 max_queue 个调用排队，超出时立即抛出 ExecutorOverloaded
+- 每次调用可带截止时间：排队期间超时的调用被取消、不再执行；
+  已在执行的调用无法中断，调用方先收到 asyncio.TimeoutError，线程执行完后结果丢弃
+"""
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class ExecutorOverloaded(RuntimeError):
+    """排队已满"""
+
+
+class BoundedExecutor:
+    def __init__(self, name: str, max_workers: int = 4, max_queue: int = 64):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.max_queued = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.expired = 0
+        self.rejected = 0
+        self._wait_ms_sum = 0.0
+        self._run_ms_sum = 0.0
+
+    def _invoke(self, fn: Callable, deadline: Optional[float], submitted: float, *args, **kwargs):
+        started = time.monotonic()
+        with self._lock:
+            self.queued -= 1
+            if deadline is not None and started >= deadline:
+                # 排队期间已超时，调用方已经放弃
+                self.expired += 1
+                return None
+            self.running += 1
+            self.started += 1
+            self._wait_ms_sum += (started - submitted) * 1000
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self._run_ms_sum += (time.monotonic() - started) * 1000
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise ExecutorOverloaded(f"{self.name} 排队已满 ({self.max_queue})")
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        submitted = time.monotonic()
+        deadline = submitted + timeout if timeout else None
+        call = functools.partial(self._invoke, fn, deadline, submitted, *args, **kwargs)
+        try:
+            future = self._pool.submit(call)
+        except RuntimeError:
+            with self._lock:
+                self.queued -= 1
+            raise
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            # 仍在排队时直接移出队列
+            if future.cancel():
+                with self._lock:
+                    self.queued -= 1
+                    self.expired += 1
+            raise
+        except asyncio.CancelledError:
+            if future.cancel():
+                with self._lock:
+                    self.queued -= 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        self.completed += 1
+        return result
+
+    def shutdown(self, wait: bool = False):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        started = self.started or 1
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "queued": self.queued,
+            "running": self.running,
+            "max_queued": self.max_queued,
+            "started": self.started,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "expired": self.expired,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self._wait_ms_sum / started, 2),
+            "avg_run_ms": round(self._run_ms_sum / started, 2),
+        }
@@ -0,0 +1,29 @@
+"""
+httpx 连接池观测工具
+"""
+from typing import Any, Dict
+
+
+def httpx_pool_stats(client: Any) -> Dict[str, Any]:
+    """
+    读取 httpx.AsyncClient 底层 httpcore 连接池的连接数
+
+    httpcore 没有公开的统计接口，这里只做尽力而为的读取，结构变化时返回空字典
+    """
+    try:
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", None) or [])
+    except Exception:
+        return {}
+    idle = 0
+    for conn in connections:
+        try:
+            if conn.is_idle():
+                idle += 1
+        except Exception:
+            continue
+    return {
+        "connections": len(connections),
+        "idle": idle,
+        "active": len(connections) - idle,
+    }
@@ -0,0 +1,34 @@
+"""
+进程内指标注册表
+
+各组件通过 register_metrics 注册一个返回 dict 的快照函数，
+/api/metrics 端点调用 collect_metrics 汇总输出，供看板拉取。
+"""
+from typing import Any, Callable, Dict
+
+from src.infrastructure.logging.logger import get_logger
+
+logger = get_logger()
+
+_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register_metrics(name: str, provider: Callable[[], Dict[str, Any]]) -> None:
+    """注册指标提供者，同名覆盖"""
+    _providers[name] = provider
+
+
+def unregister_metrics(name: str) -> None:
+    _providers.pop(name, None)
+
+
+def collect_metrics() -> Dict[str, Any]:
+    """汇总所有已注册组件的指标快照"""
+    result: Dict[str, Any] = {}
+    for name, provider in list(_providers.items()):
+        try:
+            result[name] = provider()
+        except Exception as e:
+            logger.warning(f"[metrics] collect failed name={name} error={e}")
+            result[name] = {"error": str(e)}
+    return result
@@ -1,9 +1,11 @@
 import asyncio
 from typing import Any, AsyncIterator, Dict, TypedDict, Literal
 
+from src.infrastructure.utils.abort_signal import AbortSignal
+
 
 class AgentEvent(TypedDict):
-    type: Literal["text_delta", "tool_call", "tool_result", "final", "error", "approval_required", "approval_decision", "think_delta"]
+    type: Literal["text_delta", "tool_call", "tool_result", "tool_result_delta", "final", "error", "approval_required", "approval_decision", "think_delta"]
     payload: Dict[str, Any]
 
 
@@ -16,6 +18,8 @@ class ProcessPipe:
         self._approval_results: Dict[str, str] = {}
         self._closed = False
         self._cancelled = False
+        # 管道被关闭（打断/替换）时触发，LLM client 据此立即中止上游 HTTP 流
+        self._abort = AbortSignal()
 
     @property
     def final(self) -> asyncio.Future[str]:
@@ -27,6 +31,10 @@ class ProcessPipe:
     def is_cancelled(self) -> bool:
         return self._cancelled
 
+    @property
+    def abort_signal(self) -> AbortSignal:
+        return self._abort
+
     async def write(self, event: AgentEvent) -> None:
         if self._closed:
             return
@@ -56,6 +64,9 @@ class ProcessPipe:
     async def tool_result(self, name: str, success: bool, result: Any) -> None:
         await self.write({"type": "tool_result", "payload": {"name": name, "success": success, "result": result}})
 
+    async def tool_result_delta(self, name: str, delta: str, tool_call_id: str | None = None) -> None:
+        await self.write({"type": "tool_result_delta", "payload": {"name": name, "delta": delta, "tool_call_id": tool_call_id}})
+
     async def approval_required(self, name: str, arguments: Any, approval_id: str, message: str = "", safety_assessment: Dict[str, Any] | None = None) -> None:
         await self.write({
             "type": "approval_required",
@@ -84,7 +95,12 @@ class ProcessPipe:
         else:
             self._approval_results[approval_id] = decision
 
+    def is_waiting_for_approval(self, approval_id: str) -> bool:
+        fut = self._approval_waiters.get(approval_id)
+        return fut is not None and not fut.done()
+
     async def wait_for_approval(self, approval_id: str, timeout: float | None = None) -> str:
+        """等待审批决定；超过 timeout 秒视为拒绝，并向客户端发出 approval_decision"""
         existing = self._approval_results.pop(approval_id, None)
         if existing:
             return existing
@@ -97,6 +113,11 @@ class ProcessPipe:
             else:
                 decision = await fut
             return decision
+        except asyncio.TimeoutError:
+            self._approval_waiters.pop(approval_id, None)
+            await self.approval_decision(approval_id, "rejected", "approval_timeout")
+            self._approval_results.pop(approval_id, None)
+            return "rejected"
         finally:
             self._approval_waiters.pop(approval_id, None)
 
@@ -111,6 +132,7 @@ class ProcessPipe:
             return
         if message == "request_cancelled":
             self._cancelled = True
+        self._abort.abort(message)
         for approval_id, fut in list(self._approval_waiters.items()):
             if not fut.done():
                 fut.set_result("rejected")
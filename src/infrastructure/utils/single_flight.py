@@ -0,0 +1,67 @@
+"""
+single-flight：相同 key 的并发请求只执行一次，其余调用方等待并共享同一结果
+
+与结果缓存不同，执行结束后立即忘记 key，不保存结果、不需要 TTL。
+执行放在独立 Task 中，发起者被取消时其他等待者不受影响。
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def claim(self, key: str) -> Tuple[asyncio.Future, bool]:
+        """
+        登记一次请求，返回 (future, 是否为发起者)
+
+        发起者负责执行并调用 finish；跟随者等待 future 即可
+        """
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.shared += 1
+            return fut, False
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        self.leaders += 1
+        return fut, True
+
+    def finish(self, key: str, result: Any = None, exc: Optional[BaseException] = None):
+        fut = self._inflight.pop(key, None)
+        if fut is None or fut.done():
+            return
+        if exc is not None:
+            fut.set_exception(exc)
+        else:
+            fut.set_result(result)
+        # 没有等待者时避免 "exception was never retrieved"
+        if exc is not None:
+            fut.exception()
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        fut, leader = self.claim(key)
+        if leader:
+            task = asyncio.ensure_future(factory())
+
+            def _done(t: asyncio.Task):
+                if t.cancelled():
+                    self.finish(key, exc=asyncio.CancelledError())
+                elif t.exception() is not None:
+                    self.finish(key, exc=t.exception())
+                else:
+                    self.finish(key, result=t.result())
+
+            task.add_done_callback(_done)
+        return await asyncio.shield(fut)
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.leaders + self.shared
+        return {
+            "in_flight": len(self._inflight),
+            "executed": self.leaders,
+            "shared": self.shared,
+            "shared_ratio": round(self.shared / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,61 @@
+"""
+轻量 token 估算
+
+用于限流、预算等需要在请求路径上快速估算的场景，不依赖 tiktoken：
+CJK 字符按 1 个 token 计，其余字符按 4 个字符 1 个 token 计。
+精确统计请使用 abs_agent 中基于 tiktoken 的 _log_token_estimate。
+"""
+import json
+from typing import Any
+
+
+def _is_cjk(ch: str) -> bool:
+    code = ord(ch)
+    return (
+        0x4E00 <= code <= 0x9FFF
+        or 0x3400 <= code <= 0x4DBF
+        or 0x3000 <= code <= 0x303F
+        or 0xFF00 <= code <= 0xFFEF
+        or 0x3040 <= code <= 0x30FF
+        or 0xAC00 <= code <= 0xD7AF
+    )
+
+
+def estimate_text_tokens(text: str) -> int:
+    """估算一段文本的 token 数"""
+    if not text:
+        return 0
+    cjk = 0
+    for ch in text:
+        if _is_cjk(ch):
+            cjk += 1
+    other = len(text) - cjk
+    return cjk + (other + 3) // 4
+
+
+def estimate_tokens(obj: Any) -> int:
+    """估算任意对象（字符串 / messages / tools schema）的 token 数"""
+    if obj is None:
+        return 0
+    if isinstance(obj, str):
+        return estimate_text_tokens(obj)
+    try:
+        payload = json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    except Exception:
+        payload = str(obj)
+    return estimate_text_tokens(payload)
+
+
+def truncate_text_tokens(text: str, max_tokens: int, suffix: str = "…") -> str:
+    """截断文本使估算 token 数不超过 max_tokens，保留开头部分"""
+    if not text or estimate_text_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    budget = max_tokens * 4 - len(suffix)
+    used = 0
+    for i, ch in enumerate(text):
+        used += 4 if _is_cjk(ch) else 1
+        if used > budget:
+            return text[:i] + suffix
+    return text
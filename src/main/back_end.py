@@ -46,6 +46,11 @@ async def lifespan(app: FastAPI):
     from src.di.services.impl.pe_prompt_service import PePromptService
     from src.di.services.impl.default_session_service import DefaultSessionService
 
+    from src.infrastructure.clients.llm_clients.llm_client_manager import static_llmClientManager
+
+    # 启动空闲 LLMClient 回收
+    static_llmClientManager.start()
+
     # 获取服务容器
     container = get_service_container()
     # 注册服务
@@ -55,6 +60,8 @@ async def lifespan(app: FastAPI):
     container.register("prompt_service", PePromptService())
     container.register("session_service", DefaultSessionService())
     logger.info("所有服务注册完成")
+    # 预编译提示词模板，避免首个请求承担编译开销
+    await container.get("prompt_service").initialize()
 
     # 创建工作流引擎
     workflow_engine = AgentCoordinator()
@@ -87,6 +94,13 @@ async def lifespan(app: FastAPI):
 
     # 清理
     # await event_bus.close()
+    await static_llmClientManager.close_all()
+    # 写完缓冲中的记忆后再关闭记忆服务
+    from src.di.services.impl.memory_ingest_queue import get_memory_ingest_queue
+    await get_memory_ingest_queue().close()
+    memory_service = container.get("memory_service")
+    if memory_service is not None:
+        memory_service.close()
 
 
 # 创建FastAPI应用
@@ -129,6 +143,10 @@ async def upload_agent_profile(payload: Dict[str, Any] = Body(...)):
     merged = _deep_merge(base or {}, agent_profile)
     merged = _preserve_api_keys(base, agent_profile, merged)
     storage.create(agent_id, merged, merged.get("avatar_url"))
+    from src.di.container import get_service_container
+    prompt_service = get_service_container().get("prompt_service")
+    if prompt_service:
+        prompt_service.invalidate(agent_id)
     orchestrator = app.state.orchestrator
     engine = orchestrator.engine if orchestrator else None
     if engine and hasattr(engine, "get_agent") and engine.get_agent(agent_id):
@@ -215,6 +233,12 @@ async def get_agent_profile(agent_id: str):
     return _redact_profile(profile)
 
 
+@app.get("/api/metrics")
+async def get_metrics():
+    from src.infrastructure.utils.metrics import collect_metrics
+    return collect_metrics()
+
+
 @app.get("/api/session/{session_id}/messages")
 async def get_session_messages(session_id: str, agent_id: str, limit: int = 20):
     start_time = time.time()
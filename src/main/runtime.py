@@ -1,3 +1,4 @@
+import asyncio
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Dict, Any, Optional
@@ -24,6 +25,7 @@ class RuntimeSession:
         self.current_task = None
         self.current_request_id = None
         self.pending_query_text = None
+        self.prefetch_task: Optional[asyncio.Task] = None
 
         self.tts_handler = TTSHandler()
 
@@ -51,6 +53,9 @@ class RuntimeSession:
             self.pipe = None
         if self.current_task and not self.current_task.done():
             self.current_task.cancel()
+        if self.prefetch_task and not self.prefetch_task.done():
+            self.prefetch_task.cancel()
+        self.prefetch_task = None
         self.current_task = None
         self.current_request_id = None
         self.pending_query_text = None
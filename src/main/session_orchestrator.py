@@ -12,11 +12,12 @@ from src.domain.agent_data_models import AgentRequest
 from src.domain.events import (
     ServiceEventEnvelope, ServerEventType, StatePayload, ClientEventType, ClientEventEnvelope,
     ClientEventPayload, ServiceEventPayload, HeartbeatPayload, TextDeltaPayload, ThinkDeltaPayload,
-    ToolCallPayload, ToolResultPayload, FinalPayload, ApprovalRequiredPayload, ApprovalDecisionPayload,
+    ToolCallPayload, ToolResultPayload, ToolResultDeltaPayload, FinalPayload, ApprovalRequiredPayload, ApprovalDecisionPayload,
     ErrorPayload, ToolApprovalPayload, AudioDeltaPayload, ExpressionDeltaPayload
 )
 from src.agent.agent_factory import AgentFactory
 from src.agent.storage.sqlite_agent_profile_storage import SQLiteAgentProfileStorage
+from src.di.services.impl.memory_ingest_queue import get_memory_ingest_queue
 from src.infrastructure.utils.connet_manager import get_ws_manager
 from src.infrastructure.utils.pipe import ProcessPipe, AgentEvent
 from src.main.runtime import RuntimeSession
@@ -171,6 +172,7 @@ class SessionOrchestrator:
 
         # 存一下会话
         self.active_sessions[session_id] = session
+        self._start_prefetch(session)
 
         # 发送确认
         await self._send_event(session_id, ServiceEventEnvelope(
@@ -200,6 +202,7 @@ class SessionOrchestrator:
         session = self.active_sessions[session_id]
         await self._ensure_agent(session, agent_id or getattr(payload, "agent_id", None))
         agent_id = getattr(session, "agent_id", None)
+        self._start_prefetch(session)
         await self._send_event(session_id, ServiceEventEnvelope(
             session_id=session_id,
             event_id=str(uuid.uuid4()),
@@ -230,8 +233,10 @@ class SessionOrchestrator:
                 )
             ))
             session = self.active_sessions[session_id]
-            session.release()
+            await session.release()
             del self.active_sessions[session_id]
+            # 会话结束，缓冲的记忆不再等待静默期
+            get_memory_ingest_queue().flush_soon(session_id)
             logger.info(f"[session] onDetach:Done session_id={session_id}")
         else:
             logger.warning(f"[session] onDetach:Missing session_id={session_id}")
@@ -340,16 +345,33 @@ class SessionOrchestrator:
             session_id=session.session_id,
         )
         try:
-            await asyncio.gather(
-                self._run_workflow(request, pipe, session.agent_id, request_id),
-                self._consume_and_forward(session, request_id, pipe)
-            )
+            # 用户请求处理期间，后台记忆写入让路
+            async with get_memory_ingest_queue().foreground():
+                await asyncio.gather(
+                    self._run_workflow(request, pipe, session.agent_id, request_id),
+                    self._consume_and_forward(session, request_id, pipe)
+                )
         finally:
             if session.current_request_id == request_id:
                 session.pending_query_text = None
                 session.current_task = None
                 session.current_request_id = None
 
+    def _start_prefetch(self, session: RuntimeSession) -> None:
+        """后台预热该会话首轮需要的上下文、prompt、工具目录和记忆，不阻塞 attach/init 的响应"""
+        if session.prefetch_task and not session.prefetch_task.done():
+            return
+        agent = self.engine.get_agent(session.agent_id) if session.agent_id and hasattr(self.engine, "get_agent") else None
+        context_maker = getattr(agent, "context_maker", None)
+        if context_maker is None or not hasattr(context_maker, "prefetch"):
+            return
+        session.prefetch_task = asyncio.create_task(context_maker.prefetch(session.session_id))
+        session.prefetch_task.add_done_callback(
+            lambda t, s=session.session_id: logger.warning(
+                f"[session] onPrefetch:Failed session_id={s} error={t.exception()}"
+            ) if not t.cancelled() and t.exception() else None
+        )
+
     async def _ensure_agent(self, session: RuntimeSession, agent_id: Optional[str]) -> None:
         if not agent_id:
             return
@@ -454,6 +476,13 @@ class SessionOrchestrator:
                     success=event["payload"].get("success"),
                     result=event["payload"].get("result")
                 )
+
+            elif event["type"] == "tool_result_delta":
+                event_payload = ToolResultDeltaPayload(
+                    name=event["payload"].get("name"),
+                    delta=event["payload"].get("delta", ""),
+                    tool_call_id=event["payload"].get("tool_call_id")
+                )
                 
             elif event["type"] == "final":
                 remaining_text, remaining_exprs = expression_parser.flush()
@@ -586,6 +615,7 @@ class SessionOrchestrator:
             "think_delta": ServerEventType.AGENT_THINK_DELTA,
             "tool_call": ServerEventType.AGENT_TOOL_CALL,
             "tool_result": ServerEventType.AGENT_TOOL_RESULT,
+            "tool_result_delta": ServerEventType.AGENT_TOOL_RESULT_DELTA,
             "approval_required": ServerEventType.AGENT_APPROVAL_REQUIRED,
             "approval_decision": ServerEventType.AGENT_APPROVAL_DECISION,
             "final": ServerEventType.FINAL,
@@ -0,0 +1,136 @@
+"""
+流式吞吐对比：OpenAIStyleLLMClient vs RawSSELLMClient
+
+在子进程里起一个本地 OpenAI 兼容的 SSE 假服务，两个客户端分别以相同并发读取，
+统计墙钟时间、本进程 CPU 时间和 chunk 吞吐（chunk 都解析为 dict，口径与
+run_llm_with_tools 的消费方式一致）。
+
+用法:
+    python test/bench_llm_stream.py --streams 50 --chunks 400
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _chunk(i: int, finish: bool = False) -> bytes:
+    body = {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "bench-model",
+        "choices": [{
+            "index": 0,
+            "delta": {} if finish else {"content": f"tok{i} "},
+            "finish_reason": "stop" if finish else None,
+        }],
+    }
+    return f"data: {json.dumps(body)}\n\n".encode()
+
+
+def run_stub_server(port: int, chunks: int):
+    import uvicorn
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        more = True
+        while more:
+            message = await receive()
+            more = message.get("more_body", False)
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream")],
+        })
+        for i in range(chunks):
+            await send({"type": "http.response.body", "body": _chunk(i), "more_body": True})
+        await send({"type": "http.response.body", "body": _chunk(chunks, finish=True), "more_body": True})
+        await send({"type": "http.response.body", "body": b"data: [DONE]\n\n", "more_body": False})
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+async def consume(client, n_streams: int) -> int:
+    messages = [{"role": "user", "content": "hi"}]
+
+    async def one():
+        count = 0
+        async for raw in client.chat_completion_stream(messages=messages):
+            data = raw if isinstance(raw, dict) else json.loads(raw)
+            if data.get("choices"):
+                count += 1
+        return count
+
+    results = await asyncio.gather(*[one() for _ in range(n_streams)])
+    return sum(results)
+
+
+async def bench(name: str, client, n_streams: int) -> dict:
+    # 预热一次，建立连接
+    await consume(client, 1)
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    total = await consume(client, n_streams)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    await client.close()
+    return {
+        "client": name,
+        "streams": n_streams,
+        "chunks": total,
+        "wall_s": round(wall, 3),
+        "cpu_s": round(cpu, 3),
+        "chunks_per_s": round(total / wall, 1),
+        "cpu_us_per_chunk": round(cpu / total * 1e6, 2),
+    }
+
+
+async def main(args):
+    from src.infrastructure.clients.llm_clients.llm_client import OpenAIStyleLLMClient
+    from src.infrastructure.clients.llm_clients.sse_llm_client import RawSSELLMClient
+
+    config = {
+        "openapi_url": f"http://127.0.0.1:{args.port}/v1",
+        "openapi_key": "bench",
+        "model_name": "bench-model",
+        "temperature": 0.7,
+        "max_tokens": 0,
+        "timeout": 60,
+    }
+    results = [
+        await bench("OpenAIStyleLLMClient", OpenAIStyleLLMClient("bench_openai", config), args.streams),
+        await bench("RawSSELLMClient", RawSSELLMClient("bench_raw", config), args.streams),
+    ]
+    for r in results:
+        print(json.dumps(r, ensure_ascii=False))
+    base, raw = results
+    print(json.dumps({
+        "cpu_speedup": round(base["cpu_s"] / raw["cpu_s"], 2) if raw["cpu_s"] else None,
+        "throughput_speedup": round(raw["chunks_per_s"] / base["chunks_per_s"], 2),
+    }))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=18765)
+    parser.add_argument("--streams", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=400)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = mp.Process(target=run_stub_server, args=(args.port, args.chunks), daemon=True)
+    server.start()
+    time.sleep(1.5)
+    try:
+        asyncio.run(main(args))
+    finally:
+        server.terminate()
@@ -0,0 +1,141 @@
+"""
+工具调用延迟：经 MCP hub 转发 vs 直连 MCP server（streamable HTTP / stdio）
+
+子进程中启动 test/stub_mcp_server.py（HTTP），以及一个把 /mcp_hub/call 转发到该 server
+的 hub 替身，对同一个 echo 工具分别测量三条路径的单次调用延迟。
+
+用法:
+    python test/bench_mcp_direct.py --calls 300 --concurrency 10
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def run_mcp_server(port: int):
+    import uvicorn
+    from test.stub_mcp_server import create_app
+
+    uvicorn.run(create_app(), host="127.0.0.1", port=port, log_level="warning")
+
+
+def run_proxy_hub(port: int, mcp_port: int):
+    """hub 替身：每次 /mcp_hub/call 经 JSON 重新编码后转发到 MCP server"""
+    from contextlib import asynccontextmanager
+
+    import uvicorn
+    from fastapi import FastAPI
+    from src.infrastructure.clients.mcp_direct_client import MCPDirectClient
+
+    upstream = MCPDirectClient([{"name": "stub", "endpoint": f"http://127.0.0.1:{mcp_port}/mcp"}])
+
+    @asynccontextmanager
+    async def lifespan(_app):
+        await upstream.start()
+        yield
+        await upstream.close()
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.post("/mcp_hub/call")
+    async def call(body: dict):
+        function = body.get("function", {})
+        return await upstream.call_tool(function.get("name", ""), function.get("arguments") or {})
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def bench(name: str, call, n_calls: int, concurrency: int) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            result = await call()
+            latencies.append(time.perf_counter() - start)
+            assert result.get("success"), result
+
+    for _ in range(5):
+        await one()
+    latencies.clear()
+    wall_start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(n_calls)])
+    wall = time.perf_counter() - wall_start
+    return {
+        "path": name,
+        "calls": n_calls,
+        "concurrency": concurrency,
+        "wall_s": round(wall, 3),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+    }
+
+
+async def main(args):
+    from src.infrastructure.clients.mcp_client import MCPHubClient
+    from src.infrastructure.clients.mcp_direct_client import MCPDirectClient
+
+    arguments = {"text": "hello"}
+    hub = MCPHubClient(base_url=f"http://127.0.0.1:{args.hub_port}")
+    direct = MCPDirectClient([
+        {"name": "http", "endpoint": f"http://127.0.0.1:{args.mcp_port}/mcp"},
+    ])
+    stdio = MCPDirectClient([
+        {"name": "stdio", "command": sys.executable,
+         "args": [os.path.join(ROOT, "test", "stub_mcp_server.py"), "--stdio"]},
+    ])
+    await direct.start()
+    await stdio.start()
+
+    results = []
+    for concurrency in (1, args.concurrency):
+        results.append(await bench("hub", lambda: hub.call_tool("echo", arguments), args.calls, concurrency))
+        results.append(await bench("direct_http", lambda: direct.call_tool("echo", arguments), args.calls, concurrency))
+        results.append(await bench("direct_stdio", lambda: stdio.call_tool("echo", arguments), args.calls, concurrency))
+    results.append({"direct_stats": direct.get_stats()})
+    await hub.close()
+    await direct.close()
+    await stdio.close()
+    for r in results:
+        print(json.dumps(r, ensure_ascii=False))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mcp-port", type=int, default=19101)
+    parser.add_argument("--hub-port", type=int, default=19102)
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    servers = [
+        mp.Process(target=run_mcp_server, args=(args.mcp_port,), daemon=True),
+        mp.Process(target=run_proxy_hub, args=(args.hub_port, args.mcp_port), daemon=True),
+    ]
+    servers[0].start()
+    time.sleep(1.5)
+    servers[1].start()
+    time.sleep(2)
+    try:
+        asyncio.run(main(args))
+    finally:
+        for server in servers:
+            server.terminate()
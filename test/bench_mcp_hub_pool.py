@@ -0,0 +1,117 @@
+"""
+流式工具调用的单次开销：每次新建 httpx.AsyncClient vs MCPHubClient 共享连接池
+
+在子进程里起 test/stub_mcp_hub.py，分别用两种方式顺序/并发调用 call_stream，
+输出每次调用的延迟分位数与本进程 CPU 时间。本地明文 HTTP 不含 TLS 握手，
+真实部署（https / 跨机房）下新建连接的差距会更大。
+
+用法:
+    python test/bench_mcp_hub_pool.py --calls 200 --concurrency 10
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run_stub_server(port: int):
+    import uvicorn
+    from test.stub_mcp_hub import create_app
+
+    uvicorn.run(create_app(), host="127.0.0.1", port=port, log_level="warning")
+
+
+async def fresh_client_stream(base_url: str, tool: str, arguments: dict):
+    """旧实现：每次流式调用新建一个 AsyncClient"""
+    import httpx
+
+    payload = {"id": "bench", "type": "function", "function": {"name": tool, "arguments": arguments}}
+    async with httpx.AsyncClient(timeout=30) as client:
+        async with client.stream("POST", f"{base_url}/mcp_hub/call_stream", json=payload) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if line.strip():
+                    yield json.loads(line)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def bench(name: str, call, n_calls: int, concurrency: int) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            async for _ in call():
+                pass
+            latencies.append(time.perf_counter() - start)
+
+    # 预热
+    await one()
+    latencies.clear()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(n_calls)])
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    return {
+        "mode": name,
+        "calls": n_calls,
+        "concurrency": concurrency,
+        "wall_s": round(wall, 3),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "cpu_ms_per_call": round(cpu / n_calls * 1000, 3),
+    }
+
+
+async def main(args):
+    from src.infrastructure.clients.mcp_client import MCPHubClient
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    arguments = {"chunks": args.chunks, "interval": 0}
+    hub = MCPHubClient(base_url=base_url)
+
+    results = []
+    for concurrency in (1, args.concurrency):
+        results.append(await bench(
+            "fresh_client", lambda: fresh_client_stream(base_url, "stream", arguments), args.calls, concurrency
+        ))
+        results.append(await bench(
+            "pooled_client", lambda: hub.call_tool_stream("stream", arguments), args.calls, concurrency
+        ))
+    results.append({"pooled_stats": hub.get_stats()})
+    await hub.close()
+    for r in results:
+        print(json.dumps(r, ensure_ascii=False))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=19001)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--chunks", type=int, default=5)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = mp.Process(target=run_stub_server, args=(args.port,), daemon=True)
+    server.start()
+    time.sleep(2)
+    try:
+        asyncio.run(main(args))
+    finally:
+        server.terminate()
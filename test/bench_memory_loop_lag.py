@@ -0,0 +1,134 @@
+"""
+并发记忆检索下的事件循环延迟：直接在协程中调用同步 search vs 有界线程池
+
+mem0 的 search 是同步调用（embedding 请求 + 向量检索）。这里用一个替身函数模拟：
+先阻塞 --embed-ms（网络等待），再做 --cpu-ms 的纯计算（相似度打分）。
+
+测量方式：一个 ticker 协程每 --tick-ms 醒来一次，记录实际唤醒时间与预期时间的差值，
+同时用另一个协程模拟 token 流式输出，统计相邻两次输出的最大间隔。
+
+- inline:   旧实现，async def search 内直接调用同步函数
+- bounded:  BoundedExecutor（max_workers 个线程，带截止时间）
+
+用法:
+    python test/bench_memory_loop_lag.py --searches 40 --concurrency 8 --embed-ms 80 --cpu-ms 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.infrastructure.utils.bounded_executor import BoundedExecutor  # noqa: E402
+
+
+def make_search(embed_ms: float, cpu_ms: float):
+    def search(query, user_id, limit=5):
+        time.sleep(embed_ms / 1000)
+        end = time.perf_counter() + cpu_ms / 1000
+        score = 0
+        while time.perf_counter() < end:
+            score += 1
+        return {"results": [{"memory": f"{query}-{i}", "score": score} for i in range(limit)]}
+
+    return search
+
+
+async def ticker(interval: float, lags: list, stop: asyncio.Event):
+    expected = time.perf_counter() + interval
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        lags.append((now - expected) * 1000)
+        expected = now + interval
+
+
+async def streamer(gaps: list, stop: asyncio.Event, interval: float = 0.01):
+    """模拟其他会话的 token 推送"""
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        gaps.append((now - last) * 1000)
+        last = now
+
+
+async def run(mode: str, args) -> dict:
+    blocking_search = make_search(args.embed_ms, args.cpu_ms)
+    executor = BoundedExecutor("bench_mem0", max_workers=args.workers, max_queue=args.max_queue)
+
+    async def search(i: int):
+        if mode == "inline":
+            return blocking_search(f"q{i}", "u")
+        return await executor.run(blocking_search, f"q{i}", "u", timeout=args.timeout)
+
+    lags, gaps = [], []
+    stop = asyncio.Event()
+    background = [
+        asyncio.create_task(ticker(args.tick_ms / 1000, lags, stop)),
+        asyncio.create_task(streamer(gaps, stop)),
+    ]
+    await asyncio.sleep(0.05)
+
+    counter = iter(range(args.searches))
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                await search(i)
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await asyncio.gather(*background)
+    executor.shutdown(wait=True)
+
+    lags.sort()
+    return {
+        "mode": mode,
+        "searches": args.searches,
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "loop_lag_p50_ms": round(statistics.median(lags), 2),
+        "loop_lag_p99_ms": round(lags[int(len(lags) * 0.99) - 1], 2),
+        "loop_lag_max_ms": round(lags[-1], 2),
+        "stream_gap_max_ms": round(max(gaps), 2),
+        "search_p50_ms": round(statistics.median(latencies), 2),
+        "errors": errors,
+        "executor": executor.get_stats() if mode == "bounded" else None,
+    }
+
+
+async def main(args):
+    for mode in ("inline", "bounded"):
+        print(json.dumps(await run(mode, args), ensure_ascii=False))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--searches", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--embed-ms", type=float, default=80.0)
+    parser.add_argument("--cpu-ms", type=float, default=10.0)
+    parser.add_argument("--tick-ms", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=3.0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
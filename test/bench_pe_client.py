@@ -0,0 +1,115 @@
+"""
+PEClient 并发基准：串行收发 vs 单连接多路复用 vs 连接池
+
+在本进程内启动 test/stub_pe_server.py 的替身服务（每个请求固定延迟），
+以给定并发度发起 build_prompt：
+- serialized:   旧实现的等价物，单连接 send 后 recv，用锁保证响应不串
+- multiplexed:  单连接，按 request_id 分发响应
+- pool:         --pool-size 条连接，按等待中请求数选择连接
+
+用法:
+    python test/bench_pe_client.py --concurrency 32 --requests 512 --delay-ms 20 --pool-size 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.infrastructure.clients.pe_client import PEClient  # noqa: E402
+from stub_pe_server import make_handler  # noqa: E402
+
+
+class SerializedClient:
+    """旧版 PEClient 的收发方式：一次只能有一个请求在连接上"""
+
+    def __init__(self, pe_url: str):
+        self.uri = f"{pe_url}/ws/build_prompt"
+        self.websocket = None
+        self._lock = asyncio.Lock()
+
+    async def connect(self):
+        self.websocket = await websockets.connect(self.uri)
+
+    async def build_prompt(self, session_id: str, user_query: str, request_id: str):
+        req = {"type": "build_prompt", "request_id": request_id,
+               "data": {"session_id": session_id, "user_query": user_query, "stream": False}}
+        async with self._lock:
+            await self.websocket.send(json.dumps(req))
+            resp = json.loads(await self.websocket.recv())
+        return resp.get("data", {})
+
+    async def close(self):
+        await self.websocket.close()
+
+
+async def drive(client, total: int, concurrency: int):
+    latencies = []
+    counter = iter(range(total))
+    mismatched = 0
+
+    async def worker(wid: int):
+        nonlocal mismatched
+        for i in counter:
+            query = f"q{i}"
+            start = time.perf_counter()
+            data = await client.build_prompt(f"s{wid}", query, request_id=f"r{i}")
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not data.get("system_prompt", "").endswith(query):
+                mismatched += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker(w) for w in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 2),
+        "mismatched": mismatched,
+    }
+
+
+async def main(args):
+    handler = make_handler(args.delay_ms / 1000, args.jitter_ms / 1000)
+    async with websockets.serve(handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        pe_url = f"ws://127.0.0.1:{port}"
+
+        scenarios = [
+            ("serialized", lambda: SerializedClient(pe_url)),
+            ("multiplexed", lambda: PEClient(pe_url, pool_size=1)),
+            (f"pool_{args.pool_size}", lambda: PEClient(pe_url, pool_size=args.pool_size)),
+        ]
+        for name, factory in scenarios:
+            client = factory()
+            await client.connect()
+            total = args.requests if name != "serialized" else min(args.requests, args.serialized_requests)
+            result = await drive(client, total, args.concurrency)
+            await client.close()
+            print(json.dumps({"scenario": name, "concurrency": args.concurrency, **result}))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--serialized-requests", type=int, default=128,
+                        help="串行场景吞吐有限，只跑较少请求")
+    parser.add_argument("--delay-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--pool-size", type=int, default=4)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,114 @@
+"""
+首个请求的 prompt 烘焙延迟：每次新建 Environment vs 进程级模板注册表（字节码缓存 + 启动预编译）
+
+每个场景在独立子进程中执行，模拟服务刚启动后的第一次 bake_system_prompt：
+- legacy:          旧实现，新建 Environment，首次使用时编译模板
+- registry_cold:   注册表 + 空的字节码缓存目录（首次部署）
+- registry_disk:   注册表 + 已有字节码缓存（重启后），不预编译
+- registry_warmup: 注册表 + 已有字节码缓存，启动时 warmup，统计 warmup 之后的首个请求
+
+用法:
+    python test/bench_prompt_first_request.py --runs 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PROFILE = {
+    "agent_id": "bench",
+    "prompt_config": {
+        "template_id": "default",
+        "role": "桌面助手",
+        "expertise": ["日程管理", "文件整理", "信息检索"],
+        "personality": "耐心、简洁",
+        "guidelines": {"tone": "友好", "format": "先给结论再给步骤"},
+        "language": "zh-CN",
+        "examples": [{"user": "明天几点开会？", "assistant": "上午十点，在三楼会议室。"}],
+        "extra": ["回答不超过三段"],
+    },
+}
+
+
+def run_scenario(scenario: str, cache_dir: str) -> dict:
+    if scenario == "legacy":
+        from jinja2 import Environment, FileSystemLoader
+
+        template_dir = os.path.join(ROOT, "tools", "prompt_server", "templates")
+        start = time.perf_counter()
+        env = Environment(loader=FileSystemLoader(template_dir), autoescape=False)
+        config = PROFILE["prompt_config"]
+        env.get_template("default.j2").render(**{k: config.get(k) for k in config if k != "template_id"})
+        return {"first_request_ms": (time.perf_counter() - start) * 1000}
+
+    from tools.prompt_server import PromptBaker
+
+    baker = PromptBaker(bytecode_cache_dir=cache_dir)
+    warmup_ms = None
+    if scenario == "registry_warmup":
+        baker.warmup()
+        warmup_ms = baker.templates.warmup_ms
+    start = time.perf_counter()
+    asyncio.run(baker.bake_system_prompt("s1", PROFILE))
+    return {"first_request_ms": (time.perf_counter() - start) * 1000, "warmup_ms": warmup_ms}
+
+
+def spawn(scenario: str, cache_dir: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, __file__, "--scenario", scenario, "--cache-dir", cache_dir],
+        capture_output=True, text=True, check=True, cwd=ROOT,
+        env={**os.environ, "APP_LOG_DIR": os.environ.get("APP_LOG_DIR", tempfile.gettempdir())},
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(args):
+    cache_dir = tempfile.mkdtemp(prefix="jinja_cache_")
+    results = {name: [] for name in ("legacy", "registry_cold", "registry_disk", "registry_warmup")}
+    warmups = []
+    try:
+        for _ in range(args.runs):
+            results["legacy"].append(spawn("legacy", cache_dir)["first_request_ms"])
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            os.makedirs(cache_dir, exist_ok=True)
+            results["registry_cold"].append(spawn("registry_cold", cache_dir)["first_request_ms"])
+            results["registry_disk"].append(spawn("registry_disk", cache_dir)["first_request_ms"])
+            warm = spawn("registry_warmup", cache_dir)
+            results["registry_warmup"].append(warm["first_request_ms"])
+            warmups.append(warm["warmup_ms"])
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    for name, values in results.items():
+        print(json.dumps({
+            "scenario": name,
+            "runs": len(values),
+            "first_request_median_ms": round(statistics.median(values), 3),
+            "first_request_min_ms": round(min(values), 3),
+        }, ensure_ascii=False))
+    print(json.dumps({"startup_warmup_median_ms": round(statistics.median(warmups), 3)}))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scenario", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--cache-dir", default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.scenario:
+        print(json.dumps(run_scenario(args.scenario, args.cache_dir)))
+    else:
+        main(args)
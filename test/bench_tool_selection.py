@@ -0,0 +1,176 @@
+"""
+工具检索效果：BM25 top-k 选择的召回率与 prompt token 节省
+
+内置一个模拟的 MCP 工具目录（中英文描述混合）和带标注的问题集，
+统计期望工具落在所选集合中的比例，以及所选工具 schema 相对全量的估算 token。
+
+用法:
+    python test/bench_tool_selection.py --top-k 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _tool(name: str, description: str, params: dict) -> dict:
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": description,
+            "parameters": {
+                "type": "object",
+                "properties": {k: {"type": "string", "description": v} for k, v in params.items()},
+                "required": list(params)[:1],
+            },
+        },
+    }
+
+
+CATALOG = [
+    _tool("run_terminal_command", "在用户电脑的终端中执行 shell 命令并返回输出", {"command": "要执行的命令", "cwd": "工作目录"}),
+    _tool("read_file", "读取本地文件内容", {"path": "文件路径", "encoding": "文件编码"}),
+    _tool("write_file", "写入或覆盖本地文件", {"path": "文件路径", "content": "写入内容"}),
+    _tool("list_directory", "列出目录下的文件和子目录", {"path": "目录路径"}),
+    _tool("search_files", "按文件名或内容在目录中搜索文件", {"pattern": "搜索关键词或通配符", "path": "起始目录"}),
+    _tool("web_search", "使用搜索引擎搜索互联网上的最新信息和新闻", {"query": "搜索关键词"}),
+    _tool("fetch_webpage", "抓取网页 URL 并返回正文文本", {"url": "网页地址"}),
+    _tool("get_weather", "查询城市的天气预报、气温和降雨概率", {"city": "城市名称", "days": "预报天数"}),
+    _tool("get_current_time", "获取当前日期和时间，可指定时区", {"timezone": "时区"}),
+    _tool("create_calendar_event", "在日历中创建日程或会议安排", {"title": "日程标题", "start": "开始时间", "end": "结束时间"}),
+    _tool("list_calendar_events", "查看某天的日程安排和会议", {"date": "日期"}),
+    _tool("set_reminder", "设置提醒闹钟，到时间后通知用户", {"time": "提醒时间", "message": "提醒内容"}),
+    _tool("send_email", "发送电子邮件给联系人", {"to": "收件人邮箱", "subject": "邮件主题", "body": "邮件正文"}),
+    _tool("read_emails", "读取收件箱中最近的邮件", {"folder": "邮件文件夹", "limit": "数量"}),
+    _tool("play_music", "播放音乐、歌曲或歌单", {"song": "歌曲名或歌手"}),
+    _tool("pause_music", "暂停当前播放的音乐", {}),
+    _tool("translate_text", "把文本翻译成另一种语言", {"text": "要翻译的文本", "target_lang": "目标语言"}),
+    _tool("calculator", "计算数学表达式", {"expression": "数学表达式"}),
+    _tool("currency_convert", "按实时汇率换算货币金额", {"amount": "金额", "from_currency": "原币种", "to_currency": "目标币种"}),
+    _tool("stock_quote", "查询股票实时行情和股价", {"symbol": "股票代码"}),
+    _tool("take_screenshot", "截取当前屏幕截图", {"region": "截图区域"}),
+    _tool("open_application", "打开电脑上的应用程序", {"app_name": "应用名称"}),
+    _tool("git_status", "查看 git 仓库的状态和未提交的修改", {"repo_path": "仓库路径"}),
+    _tool("git_commit", "提交 git 仓库中的修改", {"repo_path": "仓库路径", "message": "提交说明"}),
+    _tool("run_python", "在沙箱中执行 Python 代码", {"code": "Python 代码"}),
+    _tool("query_database", "对 SQL 数据库执行查询语句", {"sql": "SQL 语句", "database": "数据库名"}),
+    _tool("generate_image", "根据文字描述生成图片", {"prompt": "图片描述"}),
+    _tool("text_to_speech", "把文字转换为语音朗读", {"text": "要朗读的文字", "voice": "音色"}),
+    _tool("set_live2d_motion", "控制 Live2D 角色播放动作或表情", {"motion": "动作名称"}),
+    _tool("search_memory", "检索与用户相关的长期记忆", {"query": "检索内容"}),
+    _tool("save_note", "保存一条笔记或备忘录", {"title": "标题", "content": "笔记内容"}),
+    _tool("search_notes", "搜索之前保存的笔记和备忘录", {"query": "关键词"}),
+    _tool("get_news", "获取今日新闻头条", {"category": "新闻分类"}),
+    _tool("map_route", "规划两地之间的出行路线和交通方式", {"origin": "出发地", "destination": "目的地"}),
+    _tool("order_food", "在外卖平台下单点餐", {"restaurant": "餐厅", "items": "菜品"}),
+    _tool("smart_home_control", "控制智能家居设备，如开关灯、空调温度", {"device": "设备名称", "action": "操作"}),
+    _tool("system_info", "查看电脑 CPU、内存、磁盘使用情况", {}),
+    _tool("kill_process", "结束指定的进程", {"pid": "进程号"}),
+    _tool("download_file", "从 URL 下载文件到本地", {"url": "下载地址", "path": "保存路径"}),
+    _tool("compress_files", "把文件或目录压缩成 zip", {"paths": "文件列表", "output": "输出文件"}),
+]
+
+# (问题, 期望至少被选中的工具)
+QUERIES = [
+    ("帮我看看明天北京会不会下雨", ["get_weather"]),
+    ("现在几点了", ["get_current_time"]),
+    ("在终端里跑一下 ls -la", ["run_terminal_command"]),
+    ("读一下 config/core.json 这个文件", ["read_file"]),
+    ("把这段内容写到 notes.txt 里", ["write_file"]),
+    ("搜一下最近有什么关于 AI 的新闻", ["web_search", "get_news"]),
+    ("打开这个网页看看写了什么 https://example.com", ["fetch_webpage"]),
+    ("明天下午三点帮我约个会议", ["create_calendar_event"]),
+    ("我今天有哪些日程安排", ["list_calendar_events"]),
+    ("半小时后提醒我喝水", ["set_reminder"]),
+    ("给老板发封邮件说我请假", ["send_email"]),
+    ("看看有没有新邮件", ["read_emails"]),
+    ("放首周杰伦的歌", ["play_music"]),
+    ("把这句话翻译成英文", ["translate_text"]),
+    ("算一下 123*456 等于多少", ["calculator"]),
+    ("100 美元换成人民币是多少", ["currency_convert"]),
+    ("苹果公司股价现在多少", ["stock_quote"]),
+    ("截个屏给我看看", ["take_screenshot"]),
+    ("帮我打开微信", ["open_application"]),
+    ("看下仓库里有哪些没提交的修改", ["git_status"]),
+    ("把改动提交一下，commit message 写修复登录", ["git_commit"]),
+    ("用 python 帮我算一下斐波那契数列前 20 项", ["run_python"]),
+    ("查一下数据库里昨天的订单数量", ["query_database"]),
+    ("画一只在月亮上的猫", ["generate_image"]),
+    ("把这段话读出来", ["text_to_speech"]),
+    ("做个开心的表情动作", ["set_live2d_motion"]),
+    ("你还记得我上次说过喜欢什么吗", ["search_memory"]),
+    ("记个笔记：周五交周报", ["save_note"]),
+    ("找一下我之前记的关于周报的备忘录", ["search_notes"]),
+    ("从公司到机场怎么走", ["map_route"]),
+    ("帮我点一份外卖", ["order_food"]),
+    ("把客厅的灯关掉", ["smart_home_control"]),
+    ("电脑内存占用多少了", ["system_info"]),
+    ("把进程 1234 杀掉", ["kill_process"]),
+    ("下载这个文件 https://example.com/a.zip", ["download_file"]),
+    ("把 logs 目录打包成 zip", ["compress_files"]),
+    ("list the files in the src directory", ["list_directory"]),
+    ("search files containing TODO", ["search_files"]),
+    ("what's the weather in Tokyo this weekend", ["get_weather"]),
+    ("pause the music", ["pause_music"]),
+]
+
+
+def main(args):
+    from src.context.tool_selector import BM25ToolSelector
+    from src.infrastructure.utils.token_estimator import estimate_tokens
+
+    selector = BM25ToolSelector()
+    start = time.perf_counter()
+    selector.update(CATALOG, version=1)
+    index_ms = (time.perf_counter() - start) * 1000
+
+    hits = 0
+    misses = []
+    full_tokens = estimate_tokens(CATALOG)
+    selected_tokens = 0
+    start = time.perf_counter()
+    for query, expected in QUERIES:
+        selected = selector.select(CATALOG, query, top_k=args.top_k, version=1)
+        names = {t["function"]["name"] for t in selected}
+        selected_tokens += estimate_tokens(selected)
+        if any(name in names for name in expected):
+            hits += 1
+        else:
+            misses.append({"query": query, "expected": expected})
+    select_ms = (time.perf_counter() - start) * 1000 / len(QUERIES)
+
+    # 增量更新：修改一个工具、新增一个工具
+    changed = [dict(t) for t in CATALOG]
+    changed[0] = _tool("run_terminal_command", "在终端执行命令（支持超时参数）", {"command": "命令", "timeout": "超时秒数"})
+    changed.append(_tool("ocr_image", "识别图片中的文字", {"image": "图片路径"}))
+    before = selector.rebuilt_docs
+    selector.update(changed, version=2)
+
+    print(json.dumps({
+        "tools": len(CATALOG),
+        "queries": len(QUERIES),
+        "top_k": args.top_k,
+        "recall": round(hits / len(QUERIES), 3),
+        "full_tool_tokens": full_tokens,
+        "avg_selected_tokens": round(selected_tokens / len(QUERIES), 1),
+        "token_saving": round(1 - selected_tokens / len(QUERIES) / full_tokens, 3),
+        "index_ms": round(index_ms, 2),
+        "select_ms": round(select_ms, 3),
+        "incremental_rebuilt_docs": selector.rebuilt_docs - before,
+    }, ensure_ascii=False))
+    for miss in misses:
+        print(json.dumps({"miss": miss}, ensure_ascii=False))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top-k", type=int, default=5)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,142 @@
+"""
+本地 MCP Hub 替身，实现 MCPHubClient 用到的接口，供基准测试与联调使用
+
+工具均为假实现：
+- echo:   原样返回参数
+- sleep:  等待 arguments.seconds 秒后返回
+- stream: 分 arguments.chunks 段输出，每段间隔 arguments.interval 秒
+
+/mcp_hub/call_batch 并发执行并按完成顺序以 NDJSON 返回，可用 --no-batch 关闭以测试客户端回退
+/mcp_hub/call 与 /mcp_hub/approve 按 Idempotency-Key 去重，重复请求直接返回首次结果
+
+用法:
+    python test/stub_mcp_hub.py --port 19000
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+
+TOOLS = [
+    {"type": "function", "function": {"name": "echo", "description": "echo arguments",
+                                      "parameters": {"type": "object", "properties": {}}}},
+    {"type": "function", "function": {"name": "sleep", "description": "sleep then return",
+                                      "parameters": {"type": "object",
+                                                     "properties": {"seconds": {"type": "number"}}}}},
+    {"type": "function", "function": {"name": "stream", "description": "stream chunks",
+                                      "parameters": {"type": "object",
+                                                     "properties": {"chunks": {"type": "integer"},
+                                                                    "interval": {"type": "number"}}}}},
+]
+TOOLS_ETAG = '"' + hashlib.sha1(json.dumps(TOOLS, sort_keys=True).encode()).hexdigest() + '"'
+
+
+async def run_tool(name: str, arguments: dict) -> dict:
+    if name == "echo":
+        return {"success": True, "result": {"data": json.dumps(arguments, ensure_ascii=False)}}
+    if name == "sleep":
+        await asyncio.sleep(float(arguments.get("seconds", 0.1)))
+        return {"success": True, "result": {"data": "done"}}
+    if name == "stream":
+        return {"success": True, "result": {"data": "use call_stream"}}
+    return {"success": False, "error": f"unknown tool: {name}"}
+
+
+def create_app(batch: bool = True):
+    from fastapi import FastAPI, Request, Response
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+    # idempotency key -> 首次执行的 Task（并发的重复请求等待同一次执行）
+    executed = {}
+
+    def run_once(key, name: str, arguments: dict):
+        if not key:
+            return run_tool(name, arguments)
+        if key not in executed:
+            executed[key] = asyncio.ensure_future(run_tool(name, arguments))
+        return asyncio.shield(executed[key])
+
+    @app.get("/mcp_hub/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/mcp_hub/servers")
+    async def servers():
+        return [{"name": "stub", "enabled": True}]
+
+    @app.get("/mcp_hub/tools")
+    async def tools(request: Request):
+        if request.headers.get("if-none-match") == TOOLS_ETAG:
+            return Response(status_code=304)
+        return Response(
+            content=json.dumps({"tools": TOOLS}),
+            media_type="application/json",
+            headers={"ETag": TOOLS_ETAG},
+        )
+
+    @app.post("/mcp_hub/call")
+    async def call(body: dict, request: Request):
+        function = body.get("function", {})
+        key = request.headers.get("idempotency-key") or body.get("idempotency_key")
+        return await run_once(key, function.get("name", ""), function.get("arguments") or {})
+
+    @app.post("/mcp_hub/approve")
+    async def approve(body: dict, request: Request):
+        key = request.headers.get("idempotency-key") or body.get("idempotency_key")
+        return await run_once(key, body.get("tool", ""), body.get("arguments") or {})
+
+    @app.post("/mcp_hub/call_stream")
+    async def call_stream(body: dict):
+        function = body.get("function", {})
+        arguments = function.get("arguments") or {}
+
+        async def gen():
+            if function.get("name") != "stream":
+                result = await run_tool(function.get("name", ""), arguments)
+                yield json.dumps({"delta": str(result.get("result", {}).get("data", ""))}) + "\n"
+                return
+            for i in range(int(arguments.get("chunks", 5))):
+                yield json.dumps({"delta": f"chunk {i}\n"}) + "\n"
+                await asyncio.sleep(float(arguments.get("interval", 0)))
+
+        return StreamingResponse(gen(), media_type="application/x-ndjson")
+
+    @app.post("/mcp_hub/call_batch")
+    async def call_batch(body: dict):
+        if not batch:
+            return Response(status_code=404)
+        calls = body.get("calls") or []
+
+        async def one(index: int, call: dict):
+            function = call.get("function", {})
+            try:
+                result = await run_once(call.get("idempotency_key"), function.get("name", ""),
+                                        function.get("arguments") or {})
+                return {"index": index, "id": call.get("id"), "result": result}
+            except Exception as e:
+                return {"index": index, "id": call.get("id"), "error": str(e)}
+
+        async def gen():
+            # 按完成顺序逐行返回
+            for fut in asyncio.as_completed([one(i, c) for i, c in enumerate(calls)]):
+                yield json.dumps(await fut, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(gen(), media_type="application/x-ndjson")
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=19000)
+    parser.add_argument("--no-batch", action="store_true", help="不提供 /mcp_hub/call_batch")
+    args = parser.parse_args()
+    uvicorn.run(create_app(batch=not args.no_batch), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+最小 MCP server 替身（JSON-RPC），供直连客户端联调与基准测试
+
+- HTTP 模式：POST /mcp（streamable HTTP，返回 application/json，带 Mcp-Session-Id）
+- stdio 模式：按行读写 JSON-RPC
+
+工具：
+- echo:  原样返回参数
+- sleep: 等待 arguments.seconds 秒后返回
+- fail:  返回 isError 结果
+
+用法:
+    python test/stub_mcp_server.py --port 19100
+    python test/stub_mcp_server.py --stdio
+"""
+import argparse
+import asyncio
+import json
+import sys
+import uuid
+
+TOOLS = [
+    {"name": "echo", "description": "echo arguments", "inputSchema": {"type": "object", "properties": {}},
+     "annotations": {"readOnlyHint": True}},
+    {"name": "sleep", "description": "sleep then return",
+     "inputSchema": {"type": "object", "properties": {"seconds": {"type": "number"}}}},
+    {"name": "fail", "description": "always fails", "inputSchema": {"type": "object", "properties": {}}},
+]
+
+
+async def handle(message: dict):
+    """处理一条 JSON-RPC 消息，通知返回 None"""
+    method = message.get("method")
+    params = message.get("params") or {}
+    if "id" not in message:
+        return None
+    if method == "initialize":
+        result = {
+            "protocolVersion": params.get("protocolVersion", "2025-03-26"),
+            "capabilities": {"tools": {}},
+            "serverInfo": {"name": "stub-mcp", "version": "0.1"},
+        }
+    elif method == "tools/list":
+        result = {"tools": TOOLS}
+    elif method == "tools/call":
+        name = params.get("name")
+        arguments = params.get("arguments") or {}
+        if name == "echo":
+            result = {"content": [{"type": "text", "text": json.dumps(arguments, ensure_ascii=False)}]}
+        elif name == "sleep":
+            await asyncio.sleep(float(arguments.get("seconds", 0.1)))
+            result = {"content": [{"type": "text", "text": "done"}]}
+        elif name == "fail":
+            result = {"content": [{"type": "text", "text": "failed on purpose"}], "isError": True}
+        else:
+            return {"jsonrpc": "2.0", "id": message["id"],
+                    "error": {"code": -32602, "message": f"unknown tool: {name}"}}
+    elif method == "ping":
+        result = {}
+    else:
+        return {"jsonrpc": "2.0", "id": message["id"],
+                "error": {"code": -32601, "message": f"method not found: {method}"}}
+    return {"jsonrpc": "2.0", "id": message["id"], "result": result}
+
+
+def create_app():
+    from fastapi import FastAPI, Request, Response
+
+    app = FastAPI()
+    sessions = set()
+
+    @app.post("/mcp")
+    async def mcp(request: Request):
+        message = await request.json()
+        session_id = request.headers.get("mcp-session-id")
+        headers = {}
+        if message.get("method") == "initialize":
+            session_id = uuid.uuid4().hex
+            sessions.add(session_id)
+            headers["Mcp-Session-Id"] = session_id
+        elif session_id not in sessions:
+            return Response(status_code=404)
+        response = await handle(message)
+        if response is None:
+            return Response(status_code=202)
+        return Response(content=json.dumps(response, ensure_ascii=False), media_type="application/json",
+                        headers=headers)
+
+    @app.delete("/mcp")
+    async def close(request: Request):
+        sessions.discard(request.headers.get("mcp-session-id"))
+        return Response(status_code=200)
+
+    return app
+
+
+async def run_stdio():
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    async def respond(message: dict):
+        response = await handle(message)
+        if response is not None:
+            sys.stdout.write(json.dumps(response, ensure_ascii=False) + "\n")
+            sys.stdout.flush()
+
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        # 并发处理，响应按完成顺序写回
+        asyncio.create_task(respond(message))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=19100)
+    parser.add_argument("--stdio", action="store_true")
+    args = parser.parse_args()
+    if args.stdio:
+        asyncio.run(run_stdio())
+        return
+    import uvicorn
+
+    uvicorn.run(create_app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+本地 PE 服务替身：/ws/build_prompt
+
+每条请求在独立任务中处理，延迟 --delay-ms 后回复，响应带回 request_id，
+因此同一连接上的响应顺序与请求顺序无关。
+
+用法:
+    python test/stub_pe_server.py --port 8765 --delay-ms 20
+"""
+import argparse
+import asyncio
+import json
+import random
+
+import websockets
+
+
+def make_handler(delay: float, jitter: float):
+    async def handle(websocket):
+        if websocket.request.path != "/ws/build_prompt":
+            await websocket.close(code=1008)
+            return
+
+        send_lock = asyncio.Lock()
+
+        async def reply(req):
+            await asyncio.sleep(delay + random.uniform(0, jitter))
+            data = req.get("data", {})
+            resp = {
+                "request_id": req.get("request_id"),
+                "status": "success",
+                "data": {
+                    "session_id": data.get("session_id"),
+                    "system_prompt": f"你是测试助手。\n\n用户问题：{data.get('user_query')}",
+                },
+            }
+            async with send_lock:
+                await websocket.send(json.dumps(resp, ensure_ascii=False))
+
+        tasks = set()
+        try:
+            async for raw in websocket:
+                task = asyncio.create_task(reply(json.loads(raw)))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return handle
+
+
+async def serve(host: str, port: int, delay: float, jitter: float):
+    async with websockets.serve(make_handler(delay, jitter), host, port):
+        await asyncio.Future()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    asyncio.run(serve(args.host, args.port, args.delay_ms / 1000, args.jitter_ms / 1000))
@@ -1,7 +1,18 @@
 from .prompt_baker import PromptBaker
 from .cache import Cache
+from .template_registry import TemplateRegistry, get_template_registry
 
-__all__ = ['PromptBaker', 'Cache']
+__all__ = ['PromptBaker', 'Cache', 'TemplateRegistry', 'get_template_registry']
+
+_default_baker = None
+
+
+def get_default_baker():
+    """获取便捷API共用的PromptBaker实例"""
+    global _default_baker
+    if _default_baker is None:
+        _default_baker = PromptBaker()
+    return _default_baker
 
 # 提供便捷的API函数
 def bake_system_prompt(session_id, agent_profile):
@@ -14,8 +25,7 @@ def bake_system_prompt(session_id, agent_profile):
     Returns:
         烘焙后的systemPrompt
     """
-    baker = PromptBaker()
-    return baker.bake_system_prompt(session_id, agent_profile)
+    return get_default_baker().bake_system_prompt(session_id, agent_profile)
 
 def get_cached_prompt(session_id):
     """获取缓存的prompt
@@ -26,8 +36,7 @@ def get_cached_prompt(session_id):
     Returns:
         缓存的systemPrompt，如果不存在则返回None
     """
-    baker = PromptBaker()
-    return baker.get_cached_prompt(session_id)
+    return get_default_baker().get_cached_prompt(session_id)
 
 def clear_cache(session_id):
     """清理指定session的缓存
@@ -35,5 +44,4 @@ def clear_cache(session_id):
     Args:
         session_id: 会话ID
     """
-    baker = PromptBaker()
-    baker.clear_cache(session_id)
+    get_default_baker().clear_cache(session_id)
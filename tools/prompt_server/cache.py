@@ -1,50 +1,84 @@
+from collections import OrderedDict
+
+
 class Cache:
-    """内存级缓存实现
-    
-    用于按session_id缓存烘焙后的systemPrompt
+    """内存级 LRU 缓存实现
+
+    超过 max_size 时淘汰最久未使用的项目
     """
-    
-    def __init__(self):
-        """初始化缓存"""
-        self._cache = {}
-    
-    def get(self, session_id):
-        """获取缓存的prompt
-        
+
+    def __init__(self, max_size=256):
+        """初始化缓存
+
         Args:
-            session_id: 会话ID
-        
+            max_size: 最多保存的项目数量
+        """
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """获取缓存的值
+
+        Args:
+            key: 缓存键
+
         Returns:
-            缓存的systemPrompt，如果不存在则返回None
+            缓存的值，如果不存在则返回None
         """
-        return self._cache.get(session_id)
-    
-    def set(self, session_id, prompt):
-        """设置缓存的prompt
-        
+        if key not in self._cache:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._cache.move_to_end(key)
+        return self._cache[key]
+
+    def set(self, key, value):
+        """设置缓存的值
+
         Args:
-            session_id: 会话ID
-            prompt: 烘焙后的systemPrompt
+            key: 缓存键
+            value: 缓存的值
         """
-        self._cache[session_id] = prompt
-    
-    def delete(self, session_id):
-        """删除指定session的缓存
-        
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key):
+        """删除指定的缓存
+
         Args:
-            session_id: 会话ID
+            key: 缓存键
         """
-        if session_id in self._cache:
-            del self._cache[session_id]
-    
+        if key in self._cache:
+            del self._cache[key]
+
     def clear(self):
         """清空所有缓存"""
         self._cache.clear()
-    
+
     def size(self):
         """获取缓存大小
-        
+
         Returns:
             缓存中的项目数量
         """
         return len(self._cache)
+
+    def stats(self):
+        """获取命中统计
+
+        Returns:
+            包含 size / hits / misses / evictions 的字典
+        """
+        return {
+            "size": len(self._cache),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -1,22 +1,38 @@
+import hashlib
+import json
 import os
-from jinja2 import Environment, FileSystemLoader, TemplateNotFound
 from .cache import Cache
+from .template_registry import DEFAULT_CACHE_DIR, get_template_registry
 
 class PromptBaker:
     """SystemPrompt烘焙器
-    
+
     用于根据AgentProfile烘焙systemPrompt
+
+    烘焙结果按 (template_id, prompt_config 内容哈希) 缓存，内容相同的 profile 在所有会话间共享；
+    会话专属的补充内容（overlay）单独保存，在返回时拼接到共享的 prompt 之后。
     """
-    
-    def __init__(self, template_dir=None):
+
+    def __init__(self, template_dir=None, max_cache_size=256, max_sessions=4096,
+                 bytecode_cache_dir=DEFAULT_CACHE_DIR, auto_reload=False):
         """初始化PromptBaker
-        
+
         Args:
             template_dir: 模板目录路径，如果为None则使用默认目录
+            max_cache_size: 共享 prompt 缓存的最大条目数
+            max_sessions: 会话 overlay 与会话最近 prompt 记录的最大条目数
+            bytecode_cache_dir: Jinja2 字节码缓存目录（模板目录首次注册时生效）
+            auto_reload: 模板修改后自动重新加载，仅开发模式开启（模板目录首次注册时生效）
         """
-        # 初始化缓存
-        self.cache = Cache()
-        
+        # 共享缓存：(template_id, prompt_config 哈希) -> systemPrompt
+        self.cache = Cache(max_cache_size)
+        # 会话 -> overlay 文本
+        self.overlays = Cache(max_sessions)
+        # 会话 -> 最近一次使用的缓存键
+        self.session_keys = Cache(max_sessions)
+        # agent_id -> 该 agent 烘焙过的缓存键，profile 更新时据此失效
+        self._agent_keys = {}
+
         # 设置模板目录
         if template_dir is None:
             # 获取当前文件所在目录的templates子目录
@@ -24,33 +40,40 @@ class PromptBaker:
             self.template_dir = os.path.join(current_dir, 'templates')
         else:
             self.template_dir = template_dir
-        
-        # 初始化Jinja2环境
-        self.env = Environment(
-            loader=FileSystemLoader(self.template_dir),
-            autoescape=False
+
+        # 同一模板目录在进程内共享一个已编译的Jinja2环境
+        self.templates = get_template_registry(
+            self.template_dir, cache_dir=bytecode_cache_dir, auto_reload=auto_reload
         )
-    
-    async def bake_system_prompt(self, session_id, agent_profile):
-        """烘焙systemPrompt
-        
+        self.env = self.templates.env
+
+    def warmup(self):
+        """预编译全部模板
+
+        Returns:
+            预编译的模板数量
+        """
+        return self.templates.warmup()
+
+    @staticmethod
+    def cache_key(prompt_config):
+        """计算 prompt_config 的缓存键
+
         Args:
-            session_id: 会话ID
-            agent_profile: Agent配置文件
-        
+            prompt_config: AgentProfile 中的 prompt_config
+
         Returns:
-            烘焙后的systemPrompt
+            (template_id, 内容哈希)
         """
-        # 首先检查缓存
-        cached_prompt = self.cache.get(session_id)
-        if cached_prompt:
-            return cached_prompt
-        
-        # 提取prompt_config
-        prompt_config = agent_profile.get('prompt_config', {})
+        template_id = prompt_config.get('template_id') or 'default'
+        digest = hashlib.sha256(
+            json.dumps(prompt_config, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+        ).hexdigest()
+        return template_id, digest
 
+    def _render(self, prompt_config):
         template_id = prompt_config.get('template_id')
-        
+
         # 准备模板数据
         template_data = {
             'role': prompt_config.get('role', ''),
@@ -62,49 +85,115 @@ class PromptBaker:
             'extra': prompt_config.get('extra', [])
         }
 
-        template = self.env.get_template('default.j2')
-
         # 加载并渲染模板
-        if template_id is not "":
-            try:
-                template = self.env.get_template(template_id + '.j2')
-            except TemplateNotFound :
-                template = self.env.get_template('default.j2')
-
-        system_prompt = template.render(**template_data)
-        
-        # 缓存结果
-        self.cache.set(session_id, system_prompt)
-        
+        return self.templates.get(template_id).render(**template_data)
+
+    async def bake_system_prompt(self, session_id, agent_profile):
+        """烘焙systemPrompt
+
+        Args:
+            session_id: 会话ID
+            agent_profile: Agent配置文件
+
+        Returns:
+            烘焙后的systemPrompt（含该会话的 overlay）
+        """
+        # 提取prompt_config
+        prompt_config = agent_profile.get('prompt_config', {}) or {}
+        key = self.cache_key(prompt_config)
+
+        # 首先检查缓存
+        system_prompt = self.cache.get(key)
+        if system_prompt is None:
+            system_prompt = self._render(prompt_config)
+            # 缓存结果
+            self.cache.set(key, system_prompt)
+
+        agent_id = agent_profile.get('agent_id')
+        if agent_id:
+            self._agent_keys.setdefault(agent_id, set()).add(key)
+        if session_id:
+            self.session_keys.set(session_id, key)
+
+        return self._with_overlay(session_id, system_prompt)
+
+    def _with_overlay(self, session_id, system_prompt):
+        overlay = self.overlays.get(session_id) if session_id else None
+        if overlay:
+            return f"{system_prompt}\n\n{overlay}"
         return system_prompt
-    
+
+    def set_session_overlay(self, session_id, overlay):
+        """设置会话专属的补充内容，追加在共享 prompt 之后
+
+        Args:
+            session_id: 会话ID
+            overlay: 补充文本，为空时清除
+        """
+        if overlay:
+            self.overlays.set(session_id, overlay)
+        else:
+            self.overlays.delete(session_id)
+
+    def invalidate_agent(self, agent_id):
+        """AgentProfile 更新后失效该 agent 烘焙过的 prompt
+
+        Args:
+            agent_id: Agent ID
+        """
+        for key in self._agent_keys.pop(agent_id, ()):
+            self.cache.delete(key)
+
     def get_cached_prompt(self, session_id):
         """获取缓存的prompt
-        
+
         Args:
             session_id: 会话ID
-        
+
         Returns:
-            缓存的systemPrompt，如果不存在则返回None
+            该会话最近使用的systemPrompt，如果不存在则返回None
         """
-        return self.cache.get(session_id)
-    
+        key = self.session_keys.get(session_id)
+        if key is None:
+            return None
+        system_prompt = self.cache.get(key)
+        if system_prompt is None:
+            return None
+        return self._with_overlay(session_id, system_prompt)
+
     def clear_cache(self, session_id):
         """清理指定session的缓存
-        
+
         Args:
             session_id: 会话ID
         """
-        self.cache.delete(session_id)
-    
+        self.session_keys.delete(session_id)
+        self.overlays.delete(session_id)
+
     def clear_all_cache(self):
         """清空所有缓存"""
         self.cache.clear()
-    
+        self.session_keys.clear()
+        self.overlays.clear()
+        self._agent_keys.clear()
+
     def get_cache_size(self):
         """获取缓存大小
-        
+
         Returns:
             缓存中的项目数量
         """
         return self.cache.size()
+
+    def get_stats(self):
+        """获取缓存统计
+
+        Returns:
+            共享缓存命中统计与会话数量
+        """
+        return {
+            **self.cache.stats(),
+            "sessions": self.session_keys.size(),
+            "overlays": self.overlays.size(),
+            "templates_warmup_ms": self.templates.warmup_ms,
+        }
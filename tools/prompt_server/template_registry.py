@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, TemplateNotFound
+
+DEFAULT_TEMPLATE = 'default.j2'
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 按项目根目录解析，与进程启动目录无关
+DEFAULT_CACHE_DIR = os.path.join(PROJECT_ROOT, 'data', 'jinja_cache')
+
+
+class TemplateRegistry:
+    """进程级模板注册表
+
+    同一模板目录只创建一个 Jinja2 Environment，编译结果写入磁盘字节码缓存，
+    进程重启后无需重新编译；auto_reload 只在开发模式下开启。
+    """
+
+    def __init__(self, template_dir, cache_dir=DEFAULT_CACHE_DIR, auto_reload=False):
+        """初始化模板注册表
+
+        Args:
+            template_dir: 模板目录路径
+            cache_dir: 字节码缓存目录，为None时不使用磁盘缓存
+            auto_reload: 模板文件修改后是否自动重新加载（开发模式）
+        """
+        self.template_dir = template_dir
+        self.auto_reload = auto_reload
+        bytecode_cache = None
+        if cache_dir:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(cache_dir)
+            except OSError:
+                bytecode_cache = None
+        self.cache_dir = cache_dir if bytecode_cache else None
+        self.env = Environment(
+            loader=FileSystemLoader(template_dir),
+            autoescape=False,
+            auto_reload=auto_reload,
+            bytecode_cache=bytecode_cache,
+            cache_size=-1,
+        )
+        self.warmup_ms = None
+
+    def warmup(self):
+        """预编译模板目录下的全部 .j2 模板
+
+        Returns:
+            预编译的模板数量
+        """
+        start = time.perf_counter()
+        names = [name for name in self.env.list_templates() if name.endswith('.j2')]
+        for name in names:
+            self.env.get_template(name)
+        self.warmup_ms = round((time.perf_counter() - start) * 1000, 2)
+        return len(names)
+
+    def get(self, template_id=None):
+        """按 template_id 取模板，不存在时返回默认模板
+
+        Args:
+            template_id: 模板ID（不含 .j2 后缀）
+
+        Returns:
+            jinja2 Template
+        """
+        if template_id:
+            try:
+                return self.env.get_template(template_id + '.j2')
+            except TemplateNotFound:
+                pass
+        return self.env.get_template(DEFAULT_TEMPLATE)
+
+
+_registries = {}
+_lock = threading.Lock()
+
+
+def get_template_registry(template_dir, cache_dir=DEFAULT_CACHE_DIR, auto_reload=False):
+    """获取模板目录对应的进程级注册表，首次调用时创建
+
+    Args:
+        template_dir: 模板目录路径
+        cache_dir: 字节码缓存目录
+        auto_reload: 是否自动重新加载修改过的模板
+
+    Returns:
+        TemplateRegistry
+    """
+    key = os.path.abspath(template_dir)
+    registry = _registries.get(key)
+    if registry is None:
+        with _lock:
+            registry = _registries.get(key)
+            if registry is None:
+                registry = TemplateRegistry(template_dir, cache_dir=cache_dir, auto_reload=auto_reload)
+                _registries[key] = registry
+    return registry